@@ -22,7 +22,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.analytics.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'app.analytics.middleware.GZipMiddleware',
+    'app.analytics.middleware.BrotliMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,3 +79,12 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Upper bound on parsed frames kept in memory by each API worker.
+FRAME_CACHE_MAX_BYTES = int(os.environ.get('FRAME_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Keep cached frames as float32/categorical with lag columns computed on
+# demand (roughly 2.5x less memory; values match within float32 precision).
+FRAME_CACHE_COMPACT = os.environ.get('FRAME_CACHE_COMPACT', '0').lower() in ('1', 'true', 'yes')
+
+# Events buffered per live-stream subscriber before the oldest are dropped.
+SSE_BUFFER_SIZE = int(os.environ.get('SSE_BUFFER_SIZE', 256))
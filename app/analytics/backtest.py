@@ -0,0 +1,203 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from app.analytics import storage
+from app.analytics.signals import compile_rules
+
+# Sweeps evaluate threshold combinations in chunks whose (combos x bars x
+# tickers) working arrays stay under roughly this many bytes.
+SWEEP_CHUNK_BYTES = 64 * 1024 * 1024
+
+def backtest_settings(config=None):
+    config = config or storage.load_config()
+    settings = config['pipeline'].get('backtest', {})
+    _, labels, default_label = compile_rules(config['pipeline']['signals'])
+    positions = settings.get('positions', {})
+    return {
+        "labels": labels,
+        "positions": positions,
+        "default_position": float(positions.get(default_label, 0.0)),
+        "cost_bps": float(settings.get('cost_bps', 0.0)),
+        "hold_bars": int(settings.get('hold_bars', 1)),
+        "sweep": settings.get('sweep', {}),
+    }
+
+def load_panel(tickers=None, config=None):
+    """
+    Loads processed frames into an aligned (bars x tickers) panel.
+
+    Returns {'index', 'tickers', 'returns', 'scores', 'active'}. Each
+    asset's return is taken between its own consecutive bars, so a market
+    closed overnight or at weekends books its gap on the next bar it trades;
+    bars where an asset did not trade (`active` False) have a zero return
+    and carry its last score forward.
+    """
+    if tickers is None:
+        tickers = storage.list_tickers('processed', config)
+    closes, scores = {}, {}
+    for ticker in tickers:
+        df = storage.read_frame(ticker, 'processed', columns=['Close', 'Signal_Score'], config=config)
+        closes[ticker] = df['Close'].pct_change()
+        scores[ticker] = df['Signal_Score']
+    returns = pd.concat(closes, axis=1).sort_index()
+    scores = pd.concat(scores, axis=1).reindex(returns.index).ffill()
+    return {
+        "index": returns.index,
+        "tickers": list(returns.columns),
+        "returns": returns.fillna(0.0).to_numpy(),
+        "scores": scores.to_numpy(),
+        "active": returns.notna().to_numpy(),
+    }
+
+def label_positions(scores, thresholds, positions, default_position=0.0):
+    """
+    Target positions from scores, matching labels in order like
+    `signals.label_scores`. `thresholds` holds one threshold per label,
+    each a scalar or an array broadcastable against `scores` (e.g. shape
+    (combos, 1, 1) for a sweep); `positions` the matching position sizes.
+    """
+    masks = [op(scores, threshold) for op, threshold in thresholds]
+    shape = np.broadcast_shapes(scores.shape, *(m.shape for m in masks))
+    # NaN scores (before an asset's first bar) compare False: flat.
+    return np.select([np.broadcast_to(m, shape) for m in masks], positions, default=default_position)
+
+def hold(target, hold_bars):
+    """
+    Keeps each non-flat position for at least hold_bars bars (time is the
+    second-to-last axis) unless another non-flat signal replaces it.
+    """
+    if hold_bars <= 1:
+        return target
+    t = np.arange(target.shape[-2]).reshape(-1, 1)
+    last = np.maximum.accumulate(np.where(target != 0, t, -1), axis=-2)
+    held = np.take_along_axis(target, np.maximum(last, 0), axis=-2)
+    return np.where((last >= 0) & (t - last < hold_bars), held, target)
+
+def hold_codes(codes, nonflat, hold_bars):
+    """
+    `hold` on score codes: the code whose position is in force at each bar,
+    given which codes map to a non-flat position.
+    """
+    if hold_bars <= 1:
+        return codes
+    t = np.arange(codes.shape[0]).reshape(-1, 1)
+    last = np.maximum.accumulate(np.where(nonflat[codes], t, -1), axis=0)
+    held = np.take_along_axis(codes, np.maximum(last, 0), axis=0)
+    return np.where((last >= 0) & (t - last < hold_bars), held, codes)
+
+def simulate(returns, position, cost_bps, active=True):
+    """
+    Equal-weighted portfolio returns for positions decided at each bar's
+    close and applied to the next bar's return, net of costs on position
+    changes. Returns (net returns, turnover, exposed), one value per bar;
+    a bar is exposed if a held asset traded on it.
+    """
+    previous = np.concatenate([np.zeros_like(position[..., :1, :]), position[..., :-1, :]], axis=-2)
+    traded = np.abs(position - previous)
+    asset_net = previous * returns - traded * (cost_bps / 1e4)
+    return asset_net.mean(axis=-1), traded.mean(axis=-1), ((previous != 0) & active).any(axis=-1)
+
+def metrics(net, turnover, exposed):
+    """
+    Total return, max drawdown, hit rate (share of bars with a position
+    that made money), mean turnover per bar and share of bars with a
+    position, over the last (time) axis.
+    """
+    equity = np.cumprod(1 + net, axis=-1)
+    # Peaks include the starting equity of 1, so losses from the first bar count.
+    drawdown = equity / np.maximum.accumulate(np.maximum(equity, 1.0), axis=-1) - 1
+    wins = ((net > 0) & exposed).sum(axis=-1)
+    bars = exposed.sum(axis=-1)
+    return {
+        "total_return": equity[..., -1] - 1,
+        "max_drawdown": drawdown.min(axis=-1),
+        "hit_rate": np.where(bars > 0, wins / np.maximum(bars, 1), np.nan),
+        "turnover": turnover.mean(axis=-1),
+        "exposure": exposed.mean(axis=-1),
+    }
+
+def _positions(settings, labels):
+    return [float(settings['positions'].get(label, settings['default_position'])) for label in labels]
+
+def run_backtest(panel, settings):
+    """
+    Backtests the configured labels over the panel. Returns a DataFrame with
+    one row per ticker plus a 'PORTFOLIO' row.
+    """
+    thresholds = [(op, threshold) for op, threshold, _ in settings['labels']]
+    sizes = _positions(settings, [label for *_, label in settings['labels']])
+    target = hold(label_positions(panel['scores'], thresholds, sizes, settings['default_position']),
+                  settings['hold_bars'])
+
+    # Each ticker alone (a one-asset portfolio), then all of them together.
+    per_asset = simulate(panel['returns'].T[:, :, None], target.T[:, :, None], settings['cost_bps'],
+                         panel['active'].T[:, :, None])
+    rows = pd.DataFrame(metrics(*per_asset), index=panel['tickers'])
+    net, turnover, exposed = simulate(panel['returns'], target, settings['cost_bps'], panel['active'])
+    rows.loc['PORTFOLIO'] = pd.Series({k: float(v) for k, v in metrics(net, turnover, exposed).items()})
+    return rows
+
+def _code_sums(codes, weights, n_codes):
+    """
+    (n_codes x bars) sums of weights per code and bar.
+    """
+    t = np.broadcast_to(np.arange(codes.shape[0])[:, None], codes.shape)
+    flat = (codes * codes.shape[0] + t).ravel()
+    return np.bincount(flat, weights=np.broadcast_to(weights, codes.shape).ravel(),
+                       minlength=n_codes * codes.shape[0]).reshape(n_codes, codes.shape[0])
+
+def sweep(panel, settings, grid=None, top=None):
+    """
+    Backtests every combination of label thresholds in `grid`
+    ({label: [thresholds]}, default `backtest.sweep`); labels not in the
+    grid keep their configured threshold. Returns a DataFrame of thresholds
+    and portfolio metrics, best total return first.
+
+    Scores take few distinct values, so each combination reduces to a
+    position table over score codes. Combinations with the same set of
+    non-flat codes share their hold-rule path; for those, portfolio returns
+    and traded volume are matrix products of the tables with per-code bar
+    sums, evaluated in chunks of combinations to bound memory.
+    """
+    grid = grid or settings['sweep']
+    labels = [label for *_, label in settings['labels']]
+    axes = [grid.get(label, [threshold]) for _, threshold, label in settings['labels']]
+    combos = np.array(list(itertools.product(*axes)), dtype=np.float64)
+    sizes = _positions(settings, labels)
+    returns = panel['returns']
+    bars, n_assets = returns.shape
+
+    values, codes = np.unique(panel['scores'], return_inverse=True)
+    codes = codes.reshape(bars, n_assets)
+    flat_code = len(values)  # "no position yet", before the first bar
+    thresholds = [(op, combos[:, i:i + 1]) for i, (op, *_) in enumerate(settings['labels'])]
+    table = label_positions(values, thresholds, sizes, settings['default_position'])
+    table = np.hstack([table, np.zeros((len(combos), 1))])
+
+    groups, group_of = np.unique(table[:, :-1] != 0, axis=0, return_inverse=True)
+    columns = {key: np.empty(len(combos)) for key in ('total_return', 'max_drawdown', 'hit_rate',
+                                                       'turnover', 'exposure')}
+    chunk = max(1, SWEEP_CHUNK_BYTES // (bars * 8 * 4))
+    for g, nonflat in enumerate(groups):
+        held = hold_codes(codes, np.append(nonflat, False), settings['hold_bars'])
+        previous = np.vstack([np.full((1, n_assets), flat_code), held[:-1]])
+        exposed = (np.append(nonflat, False)[previous] & panel['active']).any(axis=1)
+        carried = _code_sums(previous, returns, flat_code + 1)
+
+        pairs, pair_codes = np.unique(previous * (flat_code + 1) + held, return_inverse=True)
+        changes = _code_sums(pair_codes.reshape(bars, n_assets), 1.0, len(pairs))
+        before, after = np.divmod(pairs, flat_code + 1)
+
+        members = np.flatnonzero(group_of == g)
+        for start in range(0, len(members), chunk):
+            rows = members[start:start + chunk]
+            traded = np.abs(table[rows][:, after] - table[rows][:, before]) @ changes / n_assets
+            net = table[rows] @ carried / n_assets - traded * (settings['cost_bps'] / 1e4)
+            for key, value in metrics(net, traded, exposed).items():
+                columns[key][rows] = value
+
+    result = pd.DataFrame(combos, columns=labels).assign(**columns)
+    result = result.sort_values('total_return', ascending=False, ignore_index=True)
+    return result.head(top) if top else result
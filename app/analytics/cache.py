@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from app.analytics import compact, storage
+
+class FrameCache:
+    """
+    Thread-safe, byte-bounded LRU cache of parsed frames for the API views.
+
+    Entries are validated against the file's version (see
+    `storage.path_version`) on every lookup, so a pipeline write is picked
+    up on the next request. Concurrent misses for
+    the same key share a single load. Cached frames are shared between
+    requests and must be treated as read-only.
+
+    With `compact`, whole-frame entries are stored in the compact layout
+    (see compact.py); read them through `queries`, which expands rows on
+    demand.
+    """
+    def __init__(self, max_bytes, compact=False):
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = self.coalesced = 0
+
+    def get(self, ticker, kind='processed', columns=None, rows=None):
+        """
+        Returns storage.read_frame(ticker, kind, columns, rows), cached.
+        Raises FileNotFoundError if the ticker has no stored frame.
+        """
+        path = storage.frame_path(ticker, kind)
+        key = (ticker, kind, tuple(columns) if columns else None, (rows.start, rows.stop) if rows else None)
+        version = (path, storage.path_version(path))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._drop(key)
+                self.invalidations += 1
+
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            # Keyed by the version seen before loading: if the file changes
+            # mid-read the next lookup sees a newer version and reloads.
+            frame = storage.read_frame(ticker, kind, columns, rows)
+            if self.compact and columns is None and rows is None:
+                frame = compact.compact(frame)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            self._store(key, version, frame, ticker)
+        future.set_result(frame)
+        return frame
+
+    def _store(self, key, version, frame, ticker):
+        nbytes = compact.frame_bytes(frame)
+        if nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (version, frame, nbytes, ticker)
+        self.bytes += nbytes
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, _, nbytes, _ = self._entries.pop(key)
+        self.bytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def ticker_bytes(self):
+        """
+        {ticker: bytes held}, over all cached entries of each ticker.
+        """
+        with self._lock:
+            totals = {}
+            for _, _, nbytes, ticker in self._entries.values():
+                totals[ticker] = totals.get(ticker, 0) + nbytes
+            return totals
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalesced": self.coalesced,
+            }
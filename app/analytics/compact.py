@@ -0,0 +1,170 @@
+"""
+Compact in-memory layout for processed frames held by the API workers.
+
+`compact()` keeps floats as float32 where the round trip stays within RTOL,
+integers in the smallest type that fits and Signal_Label as a categorical
+(int8 codes), and drops lag columns (`Close_Lag_1`, ...) that are plain
+shifts of another stored column; only their first values are kept. The
+original layout is recorded as a `Layout` in `df.attrs`.
+
+`expand()` rebuilds any row range in the original layout (columns, order
+and dtypes), computing lags on demand, so queries see the same frame as
+without compaction within float32 precision.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from app.analytics import storage
+from app.analytics.indicators import build_outputs
+
+ATTR = 'compact'
+RTOL = 1e-6
+# float32 carries ~7 significant decimal digits; widening rounds to them so
+# 187.45 comes back as 187.45 rather than 187.4499969482422.
+SIGNIFICANT_DIGITS = 7
+
+class Layout:
+    """
+    Original columns and dtypes, stored dtypes and lag heads of a compact
+    frame. Immutable: pandas deep-copies attrs on every column access, so
+    copies share it.
+    """
+    def __init__(self, columns, dtypes, stored, lags):
+        self.columns, self.dtypes, self.stored, self.lags = columns, dtypes, stored, lags
+
+    def __deepcopy__(self, memo):
+        return self
+
+def lag_columns(config=None):
+    """
+    {column: (source column, periods)} for outputs that shift a stored column.
+    """
+    config = config or storage.load_config()
+    outputs = build_outputs(config['pipeline']['features'])
+    return {column: (node[1], node[2]) for column, node in outputs.items()
+            if node[0] == 'shift' and isinstance(node[1], str)}
+
+def _is_shift(values, source, periods):
+    shifted, base = values[periods:], source[:len(source) - periods]
+    both_nan = pd.isna(shifted) & pd.isna(base)
+    return bool(np.all((shifted == base) | both_nan))
+
+def _narrow(s):
+    if s.dtype == np.float64:
+        narrow = s.to_numpy().astype(np.float32)
+        if np.allclose(narrow, s.to_numpy(), rtol=RTOL, atol=0, equal_nan=True):
+            return pd.Series(narrow, index=s.index, name=s.name)
+    elif s.dtype.kind == 'i':
+        return pd.to_numeric(s, downcast='integer')
+    elif s.dtype.kind == 'u':
+        return pd.to_numeric(s, downcast='unsigned')
+    elif pd.api.types.is_string_dtype(s.dtype):
+        return s.astype('category')
+    return s
+
+def compact(df, config=None):
+    """
+    Returns a compact copy of a processed frame (see module docstring).
+    """
+    lags = {}
+    for column, (source, periods) in lag_columns(config).items():
+        if column in df and source in df and 0 < periods < len(df):
+            values = df[column].to_numpy()
+            if _is_shift(values, df[source].to_numpy(), periods):
+                lags[column] = (source, periods, values[:periods].copy())
+
+    out = pd.DataFrame({c: _narrow(df[c]) for c in df.columns if c not in lags}, index=df.index)
+    out.attrs[ATTR] = Layout(list(df.columns), df.dtypes.to_dict(), out.dtypes.to_dict(), lags)
+    return out
+
+def is_compact(df):
+    return ATTR in df.attrs
+
+def columns(df):
+    """
+    Columns of the original layout, lags included.
+    """
+    return df.attrs[ATTR].columns if is_compact(df) else list(df.columns)
+
+def widen(values):
+    """
+    float32 array -> float64, rounded to SIGNIFICANT_DIGITS.
+    """
+    wide = values.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = 10.0 ** (SIGNIFICANT_DIGITS - 1 - np.floor(np.log10(np.abs(wide))))
+        rounded = np.round(wide * scale) / scale
+    return np.where(np.isfinite(rounded), rounded, wide)
+
+def _restore(values, dtype):
+    if dtype == np.float64 and values.dtype == np.float32:
+        return widen(values)
+    return values.astype(dtype)
+
+def expand(df, lo=0, hi=None, columns=None):
+    """
+    Rows lo:hi (positions) of a frame in its original layout, projected to
+    `columns`. Accepts uncompacted frames too. Must be given the whole
+    compact frame: lag heads refer to its first rows.
+    """
+    hi = len(df) if hi is None else min(hi, len(df))
+    layout = df.attrs.get(ATTR)
+    if layout is None:
+        page = df.iloc[lo:hi]
+        return page if columns is None else page[columns]
+
+    lo = min(lo, hi)
+    wanted = layout.columns if columns is None else columns
+    page = df.iloc[lo:hi]
+    # Widen float32 columns together, in one pass over a 2D block.
+    narrow = [c for c in wanted if c not in layout.lags and layout.stored[c] == np.float32
+              and layout.dtypes[c] == np.float64]
+    wide = widen(page[narrow].to_numpy()) if narrow else None
+    out = {c: wide[:, i] for i, c in enumerate(narrow)}
+
+    for c in wanted:
+        if c in out:
+            continue
+        dtype = layout.dtypes[c]
+        if c in layout.lags:
+            source, periods, head = layout.lags[c]
+            # Row i of the lag is row i - periods of the source; the first
+            # `periods` rows come from the stored head.
+            n_head = max(0, min(hi, periods) - lo)
+            values = np.empty(hi - lo, dtype=dtype)
+            values[:n_head] = head[lo:lo + n_head]
+            values[n_head:] = _restore(df[source].to_numpy()[lo + n_head - periods:hi - periods], dtype)
+            out[c] = values
+        elif isinstance(layout.stored[c], pd.CategoricalDtype):
+            out[c] = page[c].astype(dtype).array
+        else:
+            out[c] = page[c].to_numpy().astype(dtype)
+    return pd.DataFrame({c: out[c] for c in wanted}, index=page.index)
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def memory_report(tickers=None, config=None):
+    """
+    {ticker: {'rows', 'bytes', 'compact_bytes'}} for stored processed frames.
+    """
+    config = config or storage.load_config()
+    report = {}
+    for ticker in tickers or storage.list_tickers('processed', config):
+        df = storage.read_frame(ticker, 'processed', config=config)
+        report[ticker] = {'rows': len(df), 'bytes': frame_bytes(df), 'compact_bytes': frame_bytes(compact(df, config))}
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report in-memory size of processed frames, plain and compact.")
+    parser.add_argument("tickers", nargs="*", help="Defaults to every processed ticker")
+    args = parser.parse_args()
+
+    report = memory_report(args.tickers)
+    print(f"{'ticker':>10} {'rows':>8} {'MiB':>8} {'compact':>8} {'B/bar':>7} {'compact':>8}")
+    for ticker, entry in report.items():
+        rows = max(entry['rows'], 1)
+        print(f"{ticker:>10} {entry['rows']:>8} {entry['bytes'] / 2**20:>8.2f} {entry['compact_bytes'] / 2**20:>8.2f}"
+              f" {entry['bytes'] / rows:>7.0f} {entry['compact_bytes'] / rows:>8.0f}")
@@ -1,48 +1,167 @@
-import yfinance as yf
+import numpy as np
 import pandas as pd
 import os
-import yaml
 from pathlib import Path
 
+from app.analytics import metrics, storage
+from app.analytics.providers import get_provider, interval_freq, period_offset
+
 # Load Configuration
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config', 'pipeline_config.yaml')
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Data', 'data')
 
 def load_config():
-    with open(CONFIG_PATH, "r") as f:
-        return yaml.safe_load(f)
+    # Parsed once per config change (see storage.load_config); read-only.
+    return storage.load_config()
 
-def fetch_data(ticker, period=None, interval=None):
+def stored_tail(ticker, bars, config):
     """
-    Fetches historical market data from Yahoo Finance.
-    Supports config-driven defaults.
+    Last `bars` stored raw bars, or None if there is no usable stored data
+    (missing, unreadable, empty or out of order).
     """
-    config = load_config()
-    period = period or config['pipeline']['data']['period']
-    interval = interval or config['pipeline']['data']['interval']
-    
-    print(f"Fetching {ticker} (Period: {period}, Interval: {interval})...")
-    
+    if not storage.exists(ticker, 'raw', config):
+        return None
     try:
-        df = yf.download(ticker, period=period, interval=interval, progress=False)
-        
-        if df.empty:
-            print(f"Warning: No data found for {ticker}")
-            return None
-
-        
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)
-            
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
-        file_path = os.path.join(DATA_DIR, f"{ticker}_raw.csv")
-        df.to_csv(file_path)
-        return df
-        
+        tail = storage.read_frame(ticker, 'raw', rows=slice(-bars, None), config=config)
     except Exception as e:
-        print(f"Error fetching data for {ticker}: {e}")
+        print(f"Stored data for {ticker} is unreadable, refetching in full: {e}")
         return None
+    if tail.empty or not tail.index.is_monotonic_increasing:
+        return None
+    return tail
+
+def closed_bars(df, interval, now):
+    """
+    The bars of df that have closed by `now`. Providers also return the bar
+    in progress, whose values keep changing until it closes; storing it
+    would make the next refresh see a revision and rewrite everything.
+    """
+    if df is None or df.empty:
+        return df
+    local_now = now if df.index.tz is not None else now.tz_convert(None)
+    return df[df.index + interval_freq(interval) <= local_now]
+
+def merge_delta(ticker, tail, new, config):
+    """
+    Merges a delta download into stored raw data and returns the bars newer
+    than what was stored.
+
+    New bars are appended. If a re-downloaded overlap bar was revised by the
+    provider, the stored frame is rewritten with the revised values.
+    """
+    new = new[new.index >= tail.index[0]]
+    overlap = new[new.index <= tail.index[-1]]
+    fresh = new[new.index > tail.index[-1]]
+
+    stored = tail.reindex(overlap.index)
+    unchanged = np.allclose(stored.to_numpy(dtype=float), overlap[stored.columns].to_numpy(dtype=float),
+                            rtol=1e-12, atol=0)
+    if unchanged:
+        if not fresh.empty:
+            storage.append_frame(fresh, ticker, 'raw', config)
+    else:
+        print(f"Revised bars detected for {ticker}, rewriting stored data.")
+        merged = pd.concat([storage.read_frame(ticker, 'raw', config=config), new])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        storage.write_frame(merged, ticker, 'raw', config)
+    return fresh
+
+def delta_groups(tails, interval, overlap_bars):
+    """
+    Splits delta tickers into [(start, tickers)] groups fetched with one
+    round trip each, from the group's oldest overlap bar. Tickers join a
+    group when their tail starts at most `overlap_bars` bars after it, so
+    a stale ticker gets its own request instead of making the whole batch
+    re-download its gap.
+    """
+    slack = interval_freq(interval) * overlap_bars
+    groups = []
+    for ticker, tail in sorted(tails.items(), key=lambda item: item[1].index[0]):
+        if groups and tail.index[0] - groups[-1][0] <= slack:
+            groups[-1][1].append(ticker)
+        else:
+            groups.append((tail.index[0], [ticker]))
+    return groups
+
+def _download(provider, tickers, **kwargs):
+    try:
+        with metrics.stage('fetch') as timer:
+            frames = provider.download(tickers, **kwargs)
+            timer.rows = sum(len(df) for df in frames.values() if df is not None)
+        return frames
+    except Exception as e:
+        print(f"Error fetching batch {', '.join(tickers)}: {e}")
+        return {}
+
+def fetch_batch(tickers, period=None, interval=None, provider=None, batch_size=None, config=None, delta=None):
+    """
+    Fetches many tickers with one provider round trip per batch and writes
+    each symbol's raw file.
+
+    With `delta` (default `pipeline.data.delta_fetch`), tickers that already
+    have stored data only request bars from their last `overlap_bars` stored
+    bars onwards, one round trip per group of tickers whose data ends at
+    about the same bar (see `delta_groups`); a full-period refetch happens
+    only when nothing usable is stored or the gap exceeds the period.
+
+    Only closed bars are stored: the bar still in progress is left for a
+    later refresh. Returns {ticker: DataFrame or None}: the downloaded bars
+    (only the new ones for delta fetches). A symbol that fails (no data, bad frame, write
+    error) is reported as None without failing the batch.
+    """
+    config = config or load_config()
+    data = config['pipeline']['data']
+    period = period or data['period']
+    interval = interval or data['interval']
+    batch_size = batch_size or data.get('batch_size', 20)
+    delta = data.get('delta_fetch', False) if delta is None else delta
+    overlap_bars = data.get('overlap_bars', 3)
+    provider = provider or get_provider(config)
+
+    results = {}
+    for i in range(0, len(tickers), batch_size):
+        batch = list(tickers[i:i + batch_size])
+        now = provider.current_time()
+        tails = {}
+        for ticker in batch if delta else []:
+            tail = stored_tail(ticker, overlap_bars, config)
+            if tail is not None:
+                tail_now = now if tail.index.tz is not None else now.tz_convert(None)
+                if tail_now - period_offset(period) <= tail.index[-1]:
+                    tails[ticker] = tail
+
+        full = [t for t in batch if t not in tails]
+        frames = {}
+        if full:
+            print(f"Fetching {', '.join(full)} (Period: {period}, Interval: {interval})...")
+            frames.update(_download(provider, full, period=period, interval=interval))
+        for start, group in delta_groups(tails, interval, overlap_bars):
+            print(f"Fetching {', '.join(group)} since {start} (Interval: {interval})...")
+            frames.update(_download(provider, group, start=start, interval=interval))
+
+        for ticker in batch:
+            df = closed_bars(frames.get(ticker), interval, now)
+            if df is None or df.empty:
+                print(f"Warning: No data found for {ticker}")
+                results[ticker] = None
+                continue
+            try:
+                if ticker in tails:
+                    results[ticker] = merge_delta(ticker, tails[ticker], df, config)
+                else:
+                    storage.write_frame(df, ticker, 'raw', config)
+                    results[ticker] = df
+            except Exception as e:
+                print(f"Error saving data for {ticker}: {e}")
+                results[ticker] = None
+    return results
+
+def fetch_data(ticker, period=None, interval=None, provider=None):
+    """
+    Fetches historical market data from Yahoo Finance.
+    Supports config-driven defaults.
+    """
+    return fetch_batch([ticker], period, interval, provider).get(ticker)
 
 if __name__ == "__main__":
-    fetch_data("AAPL")
\ No newline at end of file
+    fetch_data("AAPL")
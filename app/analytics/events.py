@@ -0,0 +1,233 @@
+import contextlib
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from app.analytics import storage
+
+EVENTS_FILE = 'events.ndjson'
+# The log is rotated once it grows past this; subscribers only need the tail.
+EVENTS_MAX_BYTES = 16 * 1024 * 1024
+
+def events_path():
+    return os.path.join(storage.DATA_DIR, EVENTS_FILE)
+
+@contextlib.contextmanager
+def _log_lock(path, operation):
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _rotate(path):
+    # Appends hold the lock shared, so once the exclusive lock is granted
+    # nothing can still be writing into the file being rotated away; the
+    # size is re-checked in case another publisher rotated first.
+    with _log_lock(path, fcntl.LOCK_EX):
+        try:
+            if os.path.getsize(path) > EVENTS_MAX_BYTES:
+                os.replace(path, f"{path}.1")
+        except FileNotFoundError:
+            pass
+
+def publish(event_type, ticker, data):
+    """
+    Appends an event to the shared log. Each event is a single O_APPEND
+    write, so pipeline worker processes can publish concurrently.
+    """
+    path = events_path()
+    try:
+        if os.path.getsize(path) > EVENTS_MAX_BYTES:
+            _rotate(path)
+    except FileNotFoundError:
+        pass
+    event = {"type": event_type, "ticker": ticker, "time": pd.Timestamp.now(tz='UTC').isoformat(), "data": data}
+    line = (json.dumps(event) + "\n").encode()
+    with _log_lock(path, fcntl.LOCK_SH):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+def publish_latest(ticker, record, previous=None):
+    """
+    Publishes a new latest bar, plus a signal event if its label changed
+    from the previous latest-bar record.
+    """
+    publish('bar', ticker, record)
+    label = record.get('Signal_Label')
+    if previous is not None and previous.get('Signal_Label') != label:
+        publish('signal', ticker, {
+            "from": previous.get('Signal_Label'),
+            "to": label,
+            "score": record.get('Signal_Score'),
+            "timestamp": record.get('Datetime', record.get('Date')),
+        })
+
+class Subscription:
+    """
+    A subscriber's bounded buffer. When the subscriber falls behind, the
+    oldest events are discarded and counted in `dropped`.
+    """
+    def __init__(self, tickers, maxsize):
+        self.tickers = set(tickers) if tickers else None
+        self.buffer = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def wants(self, event):
+        return self.tickers is None or event.get('ticker') in self.tickers
+
+    def put(self, event_id, event):
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append((event_id, event))
+            self.condition.notify()
+
+    def get(self, timeout):
+        """
+        Returns the next (event_id, event), or None after timeout seconds.
+        """
+        with self.condition:
+            if not self.buffer:
+                self.condition.wait(timeout)
+            return self.buffer.popleft() if self.buffer else None
+
+class Broker:
+    """
+    Fans events from the log out to in-process subscribers.
+
+    A daemon thread tails the log (started by the first subscriber); event
+    ids are byte offsets into the current log file. When the log has been
+    rotated, the rest of the rotated file is read before the new one, so
+    nothing is lost unless it rotates twice between polls. Publishing into
+    a Broker directly (`dispatch`) skips the file, e.g. for tests.
+    """
+    def __init__(self, buffer_size=256, poll_interval=0.25):
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._path = self._inode = None
+        self._offset = 0
+
+    def subscribe(self, tickers=None):
+        subscription = Subscription(tickers, self.buffer_size)
+        with self._lock:
+            self._attach()
+            self.subscribers.add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-tailer', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    def dispatch(self, event_id, event):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            if subscription.wants(event):
+                subscription.put(event_id, event)
+
+    def _attach(self):
+        # Follow the log from its current end; earlier events are history.
+        path = events_path()
+        if path != self._path:
+            self._path = path
+            self._inode, self._offset = self._stat(path)
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def _read(self, path, size):
+        # Returns (start offset, complete lines) and advances past them; a
+        # trailing partial line is left for the next read.
+        if size <= self._offset:
+            return self._offset, b''
+        with open(path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        start = self._offset
+        self._offset += len(complete)
+        return start, complete
+
+    def poll(self):
+        """
+        Reads complete events appended since the last poll and dispatches them.
+        """
+        batches = []
+        with self._lock:
+            self._attach()
+            path = self._path
+            inode, size = self._stat(path)
+            if inode != self._inode:
+                # Rotated: finish the old file (now `.1`) before switching.
+                rotated_inode, rotated_size = self._stat(f"{path}.1")
+                if self._inode is not None and rotated_inode == self._inode:
+                    batches.append(self._read(f"{path}.1", rotated_size))
+                self._inode, self._offset = inode, 0
+            elif size < self._offset:
+                # Truncated: the file is read from the start.
+                self._offset = 0
+            batches.append(self._read(path, size))
+
+        count = 0
+        for start, complete in batches:
+            for line in complete.splitlines(keepends=True):
+                event_id = start
+                start += len(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                self.dispatch(event_id, event)
+                count += 1
+        return count
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Event tailer error: {e}")
+            time.sleep(self.poll_interval)
+
+def format_sse(event_id, event):
+    return f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def sse_stream(broker, tickers=None, heartbeat=15.0):
+    """
+    Generator of Server-Sent Event frames for one client. Sends a comment
+    line every `heartbeat` seconds of silence and a `dropped` event if the
+    client's buffer overflowed. Unsubscribes when the client goes away.
+    """
+    subscription = broker.subscribe(tickers)
+    try:
+        yield ": connected\n\n"
+        reported = 0
+        while True:
+            item = subscription.get(heartbeat)
+            if subscription.dropped > reported:
+                yield f"event: dropped\ndata: {json.dumps({'count': subscription.dropped - reported})}\n\n"
+                reported = subscription.dropped
+            yield ": keep-alive\n\n" if item is None else format_sse(*item)
+    finally:
+        broker.unsubscribe(subscription)
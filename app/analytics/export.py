@@ -0,0 +1,67 @@
+import io
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from app.analytics import storage
+from app.analytics.queries import parse_time
+
+def iter_range(chunks, start=None, end=None):
+    """
+    Trims a stream of time-ordered chunks to start <= t <= end, stopping
+    as soon as a chunk passes end.
+    """
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        tz = getattr(chunk.index, 'tz', None)
+        lo, hi = 0, len(chunk)
+        if start is not None:
+            lo = chunk.index.searchsorted(parse_time(start, tz), side='left')
+        if end is not None:
+            hi = chunk.index.searchsorted(parse_time(end, tz), side='right')
+        if lo < hi:
+            yield chunk.iloc[lo:hi]
+        if hi < len(chunk):
+            return
+
+def ndjson_chunks(chunks):
+    """
+    One JSON object per row, encoded like the JSON endpoints: floats use
+    their shortest round-tripping repr (pandas' to_json stops at 15
+    digits), timestamps are ISO 8601 and missing values are null.
+    """
+    encoder = JSONEncoder(separators=(',', ':'))
+    for chunk in chunks:
+        frame = chunk.reset_index()
+        frame = frame.astype(object).where(frame.notna(), None)
+        yield ''.join(encoder.encode(row) + '\n' for row in frame.to_dict(orient='records'))
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+def arrow_chunks(chunks):
+    """
+    Arrow IPC stream: one record batch per chunk, cast to the first chunk's
+    schema so the stream stays valid if a later chunk infers other types.
+    """
+    pa = storage._arrow()
+    sink = io.BytesIO()
+    writer = schema = None
+    for chunk in chunks:
+        frame = chunk.reset_index()
+        if writer is None:
+            schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+        yield _drain(sink)
+    if writer is not None:
+        writer.close()
+        yield _drain(sink)
+
+FORMATS = {
+    'ndjson': (ndjson_chunks, 'application/x-ndjson'),
+    'arrow': (arrow_chunks, 'application/vnd.apache.arrow.stream'),
+}
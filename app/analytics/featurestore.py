@@ -0,0 +1,257 @@
+"""
+Memory-mapped feature store shared by the API workers.
+
+Next to its processed frame, the pipeline publishes each ticker's features
+as `{ticker}_features.bin`, a fixed binary layout:
+
+    b'MIFEAT01' | header length (uint64, little endian) | JSON header
+    | timestamps (int64, in the index's unit) | one array per column
+
+Every array starts on a 64-byte boundary at the offset given in the
+header, so the data is column-major and each column is contiguous. String
+columns (Signal_Label) are stored as int16 codes into a category list kept
+in the header. Files are written to a temporary name and renamed into
+place, or published as a new version with the processed frame (see
+`storage.publishing`). A reader that has a file mapped keeps the old
+version until it reopens, so it never sees a half-written file.
+
+API workers map the files read-only (`MappedFrame`). All workers share the
+same page-cache pages, and a time range is located by binary search on the
+mapped timestamps. Only the requested rows are copied into a DataFrame.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app.analytics import storage
+
+MAGIC = b'MIFEAT01'
+ALIGN = 64
+
+def enabled(config=None):
+    return (config or storage.load_config())['pipeline'].get('storage', {}).get('feature_store', False)
+
+def feature_filename(ticker):
+    return f"{ticker}_features.bin"
+
+def feature_path(ticker):
+    return storage.current_path(ticker, 'features', feature_filename(ticker))
+
+def _pad(n):
+    return -n % ALIGN
+
+def _columns(df, categories=None):
+    """
+    [(name, stored array, original dtype, categories or None)] for df.
+    """
+    categories = categories or {}
+    out = []
+    for name in df.columns:
+        s = df[name]
+        if pd.api.types.is_string_dtype(s.dtype):
+            cats = list(categories.get(name, []))
+            cats += sorted(set(s.dropna().unique()) - set(cats))
+            codes = pd.Categorical(s, categories=cats).codes.astype(np.int16)
+            out.append((name, codes, str(s.dtype), cats))
+        else:
+            out.append((name, s.to_numpy(), str(s.dtype), None))
+    return out
+
+def _write(path, index, columns):
+    """
+    Writes the binary layout to a temporary file and renames it over path.
+    """
+    timestamps = index.asi8
+    arrays = [timestamps] + [values for _, values, _, _ in columns]
+
+    # Offsets depend on the header length, which depends on the offsets;
+    # reserve space for the header first, then lay out the arrays.
+    entries = [{"name": name, "dtype": np.asarray(values).dtype.str, "pandas_dtype": dtype,
+                **({"categories": cats} if cats is not None else {})}
+               for name, values, dtype, cats in columns]
+    header = {"rows": len(index), "columns": entries,
+              "index": {"name": index.name, "tz": str(index.tz) if index.tz else None, "unit": index.unit}}
+    reserve = len(json.dumps({**header, "offsets": [2**62] * len(arrays)}).encode())
+    start = len(MAGIC) + 8 + reserve
+    offset = start + _pad(start)
+    offsets = []
+    for values in arrays:
+        offsets.append(offset)
+        offset += np.asarray(values).nbytes
+        offset += _pad(offset)
+    blob = json.dumps({**header, "offsets": offsets}).encode().ljust(reserve)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(reserve).tobytes())
+        f.write(blob)
+        for target, values in zip(offsets, arrays):
+            f.write(b'\0' * (target - f.tell()))
+            f.write(np.ascontiguousarray(values).tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+def write(ticker, df, config=None):
+    """
+    Publishes a processed frame, replacing the ticker's file atomically.
+    """
+    with storage.publishing(ticker, config):
+        path = storage.output_path(ticker, 'features', feature_filename(ticker), config)
+        return _write(path, df.index, _columns(df))
+
+def append(ticker, df, config=None):
+    """
+    Publishes the current file plus df's rows, which were just appended to
+    the processed frame. The existing data is copied from the mapping, not
+    parsed. If there is no published file, or it does not end at the bar
+    before df, the whole processed frame is written instead.
+    """
+    path = feature_path(ticker)
+    mapped = MappedFrame(path) if os.path.exists(path) else None
+    if mapped is not None and len(mapped):
+        before = storage.read_frame(ticker, 'processed', rows=slice(-(len(df) + 1), None), config=config)
+        if len(before) <= len(df) or before.index[0] != mapped.index[len(mapped) - 1]:
+            mapped = None
+    if mapped is None:
+        return write(ticker, storage.read_frame(ticker, 'processed', config=config), config)
+    new = {name: (values, dtype, cats) for name, values, dtype, cats in _columns(df, mapped.categories)}
+    columns = [(name, np.concatenate([mapped.values[name], new[name][0].astype(mapped.values[name].dtype)]),
+                mapped.dtypes[name], new[name][2]) for name in mapped.columns]
+    timestamps = np.concatenate([mapped.index.values, df.index.as_unit(mapped.index.unit).asi8])
+    with storage.publishing(ticker, config):
+        path = storage.output_path(ticker, 'features', feature_filename(ticker), config)
+        return _write(path, mapped.index.wrap(timestamps), columns)
+
+class MappedIndex:
+    """
+    The timestamps of a MappedFrame: the subset of DatetimeIndex used by
+    `queries` (searchsorted, item access, tz), served from the mapping.
+    """
+    def __init__(self, values, tz, name, unit):
+        self.values, self.tz, self.name, self.unit = values, tz, name, unit
+
+    def __len__(self):
+        return len(self.values)
+
+    def searchsorted(self, ts, side='left'):
+        return int(np.searchsorted(self.values, pd.Timestamp(ts).as_unit(self.unit).asm8.view('i8'), side=side))
+
+    def __getitem__(self, i):
+        return self.wrap(self.values[i:i + 1])[0]
+
+    def wrap(self, values):
+        """
+        DatetimeIndex (a copy) of raw int64 timestamps in this index's unit.
+        """
+        index = pd.DatetimeIndex(np.array(values).view(f'M8[{self.unit}]'), name=self.name)
+        return index.tz_localize('UTC').tz_convert(self.tz) if self.tz else index
+
+    def slice(self, lo, hi):
+        return self.wrap(self.values[lo:hi])
+
+class MappedFrame:
+    """
+    Read-only view of a published feature file.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a feature store file")
+            size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            header = json.loads(f.read(size))
+        rows = header['rows']
+        buffer = np.memmap(path, mode='r')
+
+        def array(offset, dtype):
+            dtype = np.dtype(dtype)
+            return buffer[offset:offset + rows * dtype.itemsize].view(dtype)
+
+        offsets = header['offsets']
+        self.path = path
+        index = header['index']
+        self.index = MappedIndex(array(offsets[0], '<i8'), index['tz'], index['name'], index['unit'])
+        self.columns = [c['name'] for c in header['columns']]
+        self.values = {c['name']: array(o, c['dtype']) for c, o in zip(header['columns'], offsets[1:])}
+        self.dtypes = {c['name']: c['pandas_dtype'] for c in header['columns']}
+        self.categories = {c['name']: c['categories'] for c in header['columns'] if 'categories' in c}
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows(self, lo=0, hi=None, columns=None):
+        """
+        Rows lo:hi (positions) as a DataFrame, projected to `columns`.
+        """
+        hi = len(self) if hi is None else min(hi, len(self))
+        lo = min(lo, hi)
+        out = {}
+        for name in self.columns if columns is None else columns:
+            values = self.values[name][lo:hi]
+            if name in self.categories:
+                # Code -1 (missing) picks the trailing None.
+                cats = np.asarray(self.categories[name] + [None], dtype=object)
+                out[name] = pd.array(cats[values], dtype=self.dtypes[name])
+            else:
+                out[name] = np.array(values)
+        return pd.DataFrame(out, index=self.index.slice(lo, hi), columns=self.columns if columns is None else columns)
+
+class MappedStore:
+    """
+    Per-process registry of mapped feature files, reopened when a file is
+    replaced. Mappings cost address space, not memory: the pages belong to
+    the OS page cache and are shared by every worker.
+    """
+    def __init__(self):
+        self._maps = {}
+        self._lock = threading.Lock()
+        self.opens = 0
+
+    def path(self, ticker):
+        """
+        The feature file to serve for ticker, or None if the store is off or
+        the file is missing or older than the processed frame.
+        """
+        if not enabled():
+            return None
+        path = feature_path(ticker)
+        try:
+            version = storage.path_version(path)
+            processed = storage.path_version(storage.frame_path(ticker, 'processed'))
+        except FileNotFoundError:
+            return None
+        return path if version[0] >= processed[0] else None
+
+    def get(self, ticker):
+        """
+        MappedFrame for ticker, or None (see `path`).
+        """
+        path = self.path(ticker)
+        if path is None:
+            return None
+        try:
+            version = (path, storage.path_version(path))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            entry = self._maps.get(ticker)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        try:
+            mapped = MappedFrame(path)
+        except FileNotFoundError:
+            # Collected after newer versions were published; the caller
+            # falls back to the processed frame for this request.
+            return None
+        with self._lock:
+            # Replacing the entry drops the old mapping once no request uses it.
+            self._maps[ticker] = (version, mapped)
+            self.opens += 1
+        return mapped
+
+    def stats(self):
+        with self._lock:
+            return {"mapped": len(self._maps), "opens": self.opens}
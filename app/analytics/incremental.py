@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from app.analytics.indicators import build_outputs, lookback
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Data', 'data')
+
+STATE_VERSION = 1
+
+def state_path(ticker):
+    return os.path.join(DATA_DIR, f"{ticker}_state.json")
+
+def config_key(config):
+    """
+    Fingerprint of everything that shapes processed output; a state saved
+    under a different key cannot be continued.
+    """
+    relevant = {k: config['pipeline'][k] for k in ('features', 'signals')}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+def required_lookback(config):
+    """
+    Raw bars to keep as warm-up so every indicator is exact on the next bar,
+    or None if the configured DAG cannot be updated incrementally.
+    """
+    windows = [lookback(node) for node in build_outputs(config['pipeline']['features']).values()]
+    if None in windows:
+        return None
+    return max(windows, default=0)
+
+def build_state(raw, ewm_state, config):
+    """
+    Captures what the next incremental run needs: the raw tail covering the
+    longest lookback, each EWM node's last value and the last timestamp.
+    """
+    tail = raw.iloc[max(len(raw) - required_lookback(config), 0):]
+    return {
+        'version': STATE_VERSION,
+        'config_key': config_key(config),
+        'last_timestamp': raw.index[-1].isoformat(),
+        'ewm': ewm_state,
+        'tail': {
+            'index_name': raw.index.name,
+            'index': [ts.isoformat() for ts in tail.index],
+            'columns': {col: tail[col].tolist() for col in tail.columns},
+        },
+    }
+
+def tail_frame(state):
+    tail = state['tail']
+    index = pd.DatetimeIndex(pd.to_datetime(tail['index']), name=tail['index_name'])
+    return pd.DataFrame(tail['columns'], index=index)
+
+def load_state(ticker, config):
+    """
+    Returns the persisted state for ticker, or None if it is missing, stale
+    or was produced by a different feature configuration.
+    """
+    path = state_path(ticker)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if state.get('version') != STATE_VERSION or state.get('config_key') != config_key(config):
+        return None
+    return state
+
+def save_state(ticker, state):
+    path = state_path(ticker)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def split_new_bars(raw, state):
+    """
+    Returns the raw bars after the state's last timestamp, or None if the
+    stored warm-up tail no longer matches raw (revised or missing bars).
+    """
+    tail = tail_frame(state)
+    if len(tail):
+        if not tail.index.isin(raw.index).all():
+            return None
+        current = raw.loc[tail.index, tail.columns]
+        if not current.equals(tail.astype(current.dtypes.to_dict())):
+            return None
+    return raw[raw.index > pd.Timestamp(state['last_timestamp'])]
@@ -0,0 +1,204 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# Primitive operations. Every node in the graph is a tuple `(op, *args)`;
+# string args naming a column or tuple args naming another node are resolved
+# to Series before the op runs, so each op only times its own work.
+PRIMITIVES = {
+    'rolling_mean': lambda s, window: s.rolling(window=window).mean(),
+    'rolling_std': lambda s, window: s.rolling(window=window).std(),
+    'ewm_mean': lambda s, span: s.ewm(span=span, adjust=False).mean(),
+    'diff': lambda s, periods: s.diff(periods),
+    'shift': lambda s, periods: s.shift(periods),
+    'ratio': lambda a, b: a / b,
+    'sub': lambda a, b: a - b,
+    'gain': lambda s: s.where(s > 0, 0),
+    'loss': lambda s: -s.where(s < 0, 0),
+    'rsi': lambda gain, loss: 100 - (100 / (1 + gain / loss)),
+    'band': lambda mid, std, k: mid + (std * k) if k >= 0 else mid - (std * -k),
+    'log': lambda s: np.log(s),
+    'minus_one': lambda s: s - 1,
+}
+
+# Ops that look back over previous bars, with the arg holding the lookback.
+WINDOW_OPS = {'rolling_mean', 'rolling_std'}
+PERIOD_OPS = {'diff', 'shift'}
+
+class IndicatorGraph:
+    """
+    Memoizing DAG of indicator primitives over a single price frame.
+
+    Identical sub-computations (e.g. the 20-bar rolling mean behind both
+    SMA_20 and BB_Middle) share one node and are computed once.
+
+    With `start` > 0 the first `start` rows are warm-up history: EWM nodes are
+    continued from `ewm_state` (last value per node) over rows from `start`
+    on and are NaN before it.
+    """
+    def __init__(self, df, start=0, ewm_state=None):
+        self.df = df
+        self.start = start
+        self.ewm_state = ewm_state if ewm_state is not None else {}
+        self.cache = {}
+        self.timings = {}
+
+    def resolve(self, ref):
+        if isinstance(ref, str):
+            return self.df[ref]
+        if isinstance(ref, tuple):
+            return self.compute(ref)
+        return ref
+
+    def compute(self, node):
+        if node in self.cache:
+            return self.cache[node]
+
+        op, *args = node
+        inputs = [self.resolve(arg) for arg in args]
+        start = time.perf_counter()
+        if op == 'ewm_mean':
+            result = self._ewm(node, *inputs)
+        else:
+            result = PRIMITIVES[op](*inputs)
+        self.timings[describe(node)] = time.perf_counter() - start
+
+        self.cache[node] = result
+        return result
+
+    def _ewm(self, node, series, span):
+        key = describe(node)
+        if self.start:
+            # Prepending the previous value continues the adjust=False
+            # recursion exactly where the last run stopped.
+            tail = series.iloc[self.start:]
+            seeded = pd.concat([pd.Series([self.ewm_state[key]]), tail], ignore_index=True)
+            values = seeded.ewm(span=span, adjust=False).mean().to_numpy()[1:]
+            result = pd.Series(np.nan, index=series.index)
+            result.iloc[self.start:] = values
+        else:
+            result = PRIMITIVES['ewm_mean'](series, span)
+        # Panels (DataFrame nodes) collect per-symbol state themselves.
+        if len(result) and result.ndim == 1:
+            self.ewm_state[key] = float(result.iloc[-1])
+        return result
+
+def lookback(node):
+    """
+    Number of prior bars a node needs to be exact on a new bar, or None if it
+    cannot be continued incrementally (a window over an EWM output).
+    """
+    if not isinstance(node, tuple):
+        return 0
+    op, *args = node
+    deps = [lookback(arg) for arg in args]
+    if None in deps:
+        return None
+    needed = max(deps, default=0)
+    if op in WINDOW_OPS or op in PERIOD_OPS:
+        if _uses_ewm(args[0]):
+            return None
+        return needed + args[1] - (1 if op in WINDOW_OPS else 0)
+    return needed
+
+def _uses_ewm(node):
+    if not isinstance(node, tuple):
+        return False
+    return node[0] == 'ewm_mean' or any(_uses_ewm(arg) for arg in node[1:])
+
+def describe(node):
+    op, *args = node
+    return f"{op}({', '.join(describe(a) if isinstance(a, tuple) else str(a) for a in args)})"
+
+# Indicator builders map a config entry to {output column: node}.
+def _sma(spec):
+    return {f'SMA_{w}': ('rolling_mean', 'Close', w) for w in spec['windows']}
+
+def _rsi(spec):
+    delta = ('diff', 'Close', 1)
+    gain = ('rolling_mean', ('gain', delta), spec['window'])
+    loss = ('rolling_mean', ('loss', delta), spec['window'])
+    return {'RSI': ('rsi', gain, loss)}
+
+def _macd(spec):
+    macd = ('sub', ('ewm_mean', 'Close', spec['fast']), ('ewm_mean', 'Close', spec['slow']))
+    return {'MACD': macd, 'MACD_Signal': ('ewm_mean', macd, spec['signal'])}
+
+def _bollinger(spec):
+    middle = ('rolling_mean', 'Close', spec['window'])
+    std = ('rolling_std', 'Close', spec['window'])
+    return {
+        'BB_Middle': middle,
+        'BB_Std': std,
+        'BB_Upper': ('band', middle, std, spec['std_dev']),
+        'BB_Lower': ('band', middle, std, -spec['std_dev']),
+    }
+
+def _volatility(spec):
+    return {'Volatility': ('rolling_std', 'Close', spec['window'])}
+
+def _log_return(spec):
+    return {'Log_Return': ('log', ('ratio', 'Close', ('shift', 'Close', 1)))}
+
+def _lagged_features(spec):
+    outputs = {}
+    for lag in spec.get('lags', [1, 2, 3]):
+        outputs[f'Close_Lag_{lag}'] = ('shift', 'Close', lag)
+        outputs[f'Vol_Lag_{lag}'] = ('shift', 'Volume', lag)
+    return outputs
+
+def _momentum(spec):
+    # Same arithmetic as Series.pct_change, sharing the shift with the lags.
+    return {
+        f'Momentum_{p}d': ('minus_one', ('ratio', 'Close', ('shift', 'Close', p)))
+        for p in spec.get('periods', [1, 5])
+    }
+
+INDICATORS = {
+    'SMA': _sma,
+    'RSI': _rsi,
+    'MACD': _macd,
+    'BollingerBands': _bollinger,
+    'Volatility': _volatility,
+}
+
+TRANSFORMATIONS = {
+    'log_return': _log_return,
+    'lagged_features': _lagged_features,
+    'momentum': _momentum,
+}
+
+def build_outputs(features):
+    """
+    Expands `pipeline.features` into an ordered {column: node} mapping.
+    """
+    outputs = {}
+    for spec in features.get('technical_indicators', []):
+        if spec['name'] not in INDICATORS:
+            raise ValueError(f"Unknown technical indicator '{spec['name']}'")
+        outputs.update(INDICATORS[spec['name']](spec))
+
+    for spec in features.get('transformations', []):
+        # Transformations may be a bare name or a mapping with parameters.
+        spec = {'name': spec} if isinstance(spec, str) else spec
+        if spec['name'] not in TRANSFORMATIONS:
+            raise ValueError(f"Unknown transformation '{spec['name']}'")
+        outputs.update(TRANSFORMATIONS[spec['name']](spec))
+    return outputs
+
+def compute_indicators(df, features, timings=None, start=0, ewm_state=None):
+    """
+    Adds every configured indicator column to df in place.
+
+    If a `timings` dict is given it is filled with per-node seconds. If an
+    `ewm_state` dict is given it seeds EWM nodes when `start` > 0 and is
+    updated with each EWM node's last value.
+    """
+    graph = IndicatorGraph(df, start, ewm_state)
+    for column, node in build_outputs(features).items():
+        df[column] = graph.compute(node)
+
+    if timings is not None:
+        timings.update(graph.timings)
+    return df
@@ -0,0 +1,224 @@
+"""
+Low-overhead instrumentation for the pipeline and the API.
+
+Pipeline code wraps its stages in `stage(name)`; timings, rows and bytes go
+to the stats of the enclosing `collect()` call (one per fetch batch or
+ticker, also inside process-pool workers) and cost one context-variable
+lookup when nothing is collecting. The API process keeps its own counters
+and histograms in `REGISTRY`, rendered in the Prometheus text format.
+"""
+import bisect
+import contextvars
+import cProfile
+import math
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_stats = contextvars.ContextVar('pipeline_stats', default=None)
+
+def new_stats():
+    return {'stages': {}, 'indicators': {}}
+
+def record(name, seconds, rows=0, nbytes=0):
+    """
+    Adds one timed call of a stage to the active stats, if any.
+    """
+    stats = _stats.get()
+    if stats is None:
+        return
+    entry = stats['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0, 'bytes': 0})
+    entry['seconds'] += seconds
+    entry['calls'] += 1
+    entry['rows'] += rows
+    entry['bytes'] += nbytes
+
+def record_indicators(timings):
+    """
+    Adds per-node indicator seconds (an IndicatorGraph's timings).
+    """
+    stats = _stats.get()
+    if stats is None:
+        return
+    for node, seconds in timings.items():
+        stats['indicators'][node] = stats['indicators'].get(node, 0.0) + seconds
+
+@contextmanager
+def stage(name):
+    """
+    Times the block as one call of stage `name`; set `.rows` and `.bytes`
+    on the yielded object to count what it processed. `.seconds` is set on
+    exit.
+    """
+    timer = SimpleNamespace(rows=0, bytes=0, seconds=0.0)
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.seconds = time.perf_counter() - start
+        record(name, timer.seconds, timer.rows, timer.bytes)
+
+def collect(fn, *args, **kwargs):
+    """
+    Runs fn with fresh stats. Returns (result, seconds, stats). Module-level
+    so it can be shipped to process-pool workers.
+    """
+    stats = new_stats()
+    token = _stats.set(stats)
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        _stats.reset(token)
+    return result, seconds, stats
+
+def merge(total, stats):
+    """
+    Adds `stats` into `total` in place and returns it.
+    """
+    for name, entry in stats['stages'].items():
+        target = total['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0, 'bytes': 0})
+        for key, value in entry.items():
+            target[key] += value
+    for node, seconds in stats['indicators'].items():
+        total['indicators'][node] = total['indicators'].get(node, 0.0) + seconds
+    return total
+
+def profile(fn, *args, path=None, top=25, **kwargs):
+    """
+    Runs fn under cProfile and prints the `top` entries by cumulative time;
+    with `path` the raw stats are also saved for snakeviz/pstats.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    stats = pstats.Stats(profiler).sort_stats('cumulative')
+    if path:
+        stats.dump_stats(path)
+        print(f"Profile saved to {path}")
+    stats.print_stats(top)
+    return result
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        rows = []
+        for key, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                rows.append((f'{self.name}_bucket', key + (_number(bound),), cumulative))
+            rows.append((f'{self.name}_sum', key, total))
+            rows.append((f'{self.name}_count', key, count))
+        return rows
+
+class Registry:
+    """
+    Metrics of this process plus collectors called at scrape time. A
+    collector returns (name, kind, help, [(labels dict, value)]) families.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, *args, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def register(self, collector):
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines += [f'# HELP {metric.name} {metric.help}', f'# TYPE {metric.name} {metric.kind}']
+            for name, key, value in metric.samples():
+                names = metric.labels + (('le',) if name.endswith('_bucket') else ())
+                lines.append(f'{name}{_labels(names, key)} {_number(value)}')
+        for collector in self.collectors:
+            for name, kind, help, samples in collector():
+                lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+def stats_collector(prefix, stats, counters=()):
+    """
+    Collector exporting a stats() dict of numbers as `{prefix}_{key}`
+    gauges, or `{prefix}_{key}_total` counters for keys in `counters`.
+    """
+    def collect_stats():
+        for key, value in stats().items():
+            if key in counters:
+                yield f'{prefix}_{key}_total', 'counter', f'{key} since start', [({}, value)]
+            else:
+                yield f'{prefix}_{key}', 'gauge', f'Current {key}', [({}, value)]
+    return collect_stats
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram(
+    'market_http_request_duration_seconds', 'API request latency until the response is returned',
+    labels=('view', 'method', 'status'))
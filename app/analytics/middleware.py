@@ -0,0 +1,81 @@
+import re
+import time
+
+from django.middleware import gzip
+from django.utils.cache import patch_vary_headers
+
+from app.analytics import metrics
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+class BrotliMiddleware:
+    """
+    Brotli-compresses responses for clients that accept it, when the optional
+    `brotli` package is installed. Must sit below GZipMiddleware, which then
+    leaves already-encoded responses alone and serves gzip to everyone else.
+    """
+    min_length = 200
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.brotli = _brotli()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (self.brotli is None or response.streaming or len(response.content) < self.min_length
+                or response.has_header('Content-Encoding')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return response
+
+        compressed = self.brotli.compress(response.content, quality=5)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # Encoded bodies are no longer byte-identical to the strong ETag's.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+class GZipMiddleware(gzip.GZipMiddleware):
+    """
+    Django's GZipMiddleware, except for Server-Sent Events: its streaming
+    compressor does not flush per chunk, which would hold events back.
+    """
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        return super().process_response(request, response)
+
+class MetricsMiddleware:
+    """
+    Records each request's latency per URL name, method and status in the
+    metrics registry. Outermost, so compression is included; for streaming
+    responses it measures the time to the first byte.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            view=(match.url_name if match else None) or 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
+        return response
@@ -0,0 +1,170 @@
+"""
+Panel-mode feature engine: computes `calculate_features` for many symbols at
+once on (bars x symbols) frames instead of one pandas call chain per file.
+
+Symbols are aligned on the union of their timestamps, a (time x symbol)
+panel with NaN where a symbol has no bar: nights and weekends for equities,
+nothing for 24/7 crypto. Indicator windows count a symbol's own bars, as
+per-file processing does, so before computing each symbol's bars are packed
+to the top of its column; the indicator graph then runs unchanged, since
+every primitive works column-wise on DataFrames. Results are unpacked into
+one long frame, scored in a single pass and written back per symbol.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.analytics import featurestore, metrics, storage
+from app.analytics.incremental import build_state, required_lookback, save_state
+from app.analytics.indicators import IndicatorGraph, build_outputs, describe
+from app.analytics.processor import load_config, publish_latest
+from app.analytics.signals import apply_signals
+
+# Symbols computed together; bounds the panel to roughly
+# PANEL_SYMBOLS x bars x (fields + outputs) floats.
+PANEL_SYMBOLS = 256
+MIN_ROWS = 50
+
+def align(frames):
+    """
+    Aligns {symbol: raw frame} on the union of their timestamps. Returns
+    {'index', 'symbols', 'present', 'fields', 'dtypes'}: `present` marks the
+    (time x symbol) cells where a symbol has a bar and `fields` maps each
+    column to a (time x symbol) float array, NaN elsewhere.
+    """
+    symbols = list(frames)
+    indexes = [df.index for df in frames.values()]
+    index = indexes[0].append(indexes[1:]).unique().sort_values()
+    columns = list(dict.fromkeys(c for df in frames.values() for c in df.columns))
+
+    present = np.zeros((len(index), len(symbols)), dtype=bool)
+    fields = {c: np.full((len(index), len(symbols)), np.nan) for c in columns}
+    for j, df in enumerate(frames.values()):
+        rows = index.get_indexer(df.index)
+        present[rows, j] = True
+        for c in df.columns:
+            fields[c][rows, j] = df[c].to_numpy(dtype=np.float64, na_value=np.nan)
+    dtypes = {c: np.result_type(*(df[c].dtype for df in frames.values() if c in df)) for c in columns}
+    return {"index": index, "symbols": symbols, "present": present, "fields": fields, "dtypes": dtypes}
+
+def pack(panel):
+    """
+    Moves each symbol's bars to the top of its column, in time order.
+    Returns (positions, counts): symbol j's i-th bar is panel row
+    positions[i, j] for i < counts[j]; rows below are padding.
+    """
+    present = panel['present']
+    counts = present.sum(axis=0)
+    positions = np.argsort(~present, axis=0, kind='stable')[:counts.max(initial=0)]
+    return positions, counts
+
+def compute_panel(panel, config=None, timings=None):
+    """
+    Runs the configured indicators and signals over an aligned panel.
+
+    Returns (processed, ewm_state): {symbol: frame} shaped exactly like
+    `calculate_features` output for that symbol's raw frame, and
+    {symbol: {ewm node: last value}} for incremental updates.
+    """
+    config = config or load_config()
+    positions, counts = pack(panel)
+    packed = {c: pd.DataFrame(np.take_along_axis(v, positions, axis=0)) for c, v in panel['fields'].items()}
+
+    graph = IndicatorGraph(packed)
+    with metrics.stage('features') as timer:
+        outputs = {column: graph.compute(node)
+                   for column, node in build_outputs(config['pipeline']['features']).items()}
+        timer.rows = int(counts.sum())
+    metrics.record_indicators(graph.timings)
+
+    # Long layout, symbol by symbol: bars past a symbol's count are padding.
+    valid = (np.arange(len(positions))[:, None] < counts).T
+    long = {c: v.to_numpy().T[valid] for c, v in {**packed, **outputs}.items()}
+    index = panel['index'][positions.T[valid]]
+    codes = np.repeat(np.arange(len(counts)), counts)
+
+    df = pd.DataFrame(long, index=index)
+    keep = df.notna().all(axis=1).to_numpy()
+    df, codes = df[keep], codes[keep]
+    for c, dtype in panel['dtypes'].items():
+        if dtype.kind in 'iub':
+            df[c] = df[c].astype(dtype)
+
+    with metrics.stage('signals') as timer:
+        apply_signals(df, config['pipeline']['signals'])
+        timer.rows = len(df)
+    if timings is not None:
+        timings.update(graph.timings)
+        timings['signals'] = timer.seconds
+
+    bounds = np.searchsorted(codes, np.arange(len(counts) + 1))
+    last = np.maximum(counts - 1, 0)
+    ewm = {describe(node): result.to_numpy()[last, np.arange(len(counts))]
+           for node, result in graph.cache.items() if node[0] == 'ewm_mean'}
+    processed, ewm_state = {}, {}
+    for j, symbol in enumerate(panel['symbols']):
+        processed[symbol] = df.iloc[bounds[j]:bounds[j + 1]]
+        ewm_state[symbol] = {key: float(values[j]) for key, values in ewm.items()}
+    return processed, ewm_state
+
+def process_panel(tickers, config=None, batch_size=None):
+    """
+    Panel counterpart of `process_file` (full recompute) for many tickers:
+    reads each raw file, computes `batch_size` symbols per panel and writes
+    processed frames, latest-bar records and incremental state per symbol.
+    Returns {'success': [...], 'failed': [...], 'timings': {...}} like
+    `runner.run_concurrent`.
+    """
+    config = config or load_config()
+    batch_size = batch_size or config['pipeline'].get('concurrency', {}).get('panel_symbols', PANEL_SYMBOLS)
+    stateful = required_lookback(config) is not None
+    timings = {ticker: {} for ticker in tickers}
+    failed = set()
+    start = time.perf_counter()
+
+    for i in range(0, len(tickers), batch_size):
+        batch_start = time.perf_counter()
+        frames = {}
+        for ticker in tickers[i:i + batch_size]:
+            try:
+                df = storage.read_frame(ticker, 'raw', config=config)
+            except FileNotFoundError:
+                print(f"Raw data for {ticker} not found.")
+                failed.add(ticker)
+                continue
+            if len(df) < MIN_ROWS:
+                print(f"Not enough data to process {ticker} (need > {MIN_ROWS} rows)")
+                failed.add(ticker)
+                continue
+            frames[ticker] = df
+        if not frames:
+            continue
+
+        panel = align(frames)
+        processed, ewm_state = compute_panel(panel, config)
+        for ticker, df in processed.items():
+            try:
+                with storage.publishing(ticker, config):
+                    storage.write_frame(df, ticker, 'processed', config)
+                    if featurestore.enabled(config):
+                        featurestore.write(ticker, df, config)
+                if not df.empty:
+                    publish_latest(ticker, df)
+                if stateful:
+                    save_state(ticker, build_state(frames[ticker], ewm_state[ticker], config))
+            except Exception as e:
+                print(f"Error writing {ticker}: {e}")
+                failed.add(ticker)
+        # A panel is one computation; its time is shared by its symbols.
+        seconds = time.perf_counter() - batch_start
+        for ticker in frames:
+            timings[ticker]['process'] = seconds / len(frames)
+        print(f"Panel of {len(frames)} symbols x {len(panel['index'])} timestamps processed in {seconds:.2f}s")
+
+    timings['_wall'] = time.perf_counter() - start
+    return {
+        'success': [t for t in tickers if t not in failed],
+        'failed': [t for t in tickers if t in failed],
+        'timings': timings,
+    }
@@ -1,137 +1,150 @@
 import pandas as pd
-import numpy as np
 import os
-import yaml
+
+from app.analytics import events, featurestore, metrics, storage
+from app.analytics.incremental import (
+    build_state, load_state, required_lookback, save_state, split_new_bars, tail_frame,
+)
+from app.analytics.indicators import compute_indicators
+from app.analytics.signals import apply_signals
 
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config', 'pipeline_config.yaml')
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Data', 'data')
 
 def load_config():
-    with open(CONFIG_PATH, "r") as f:
-        return yaml.safe_load(f)
+    # Parsed once per config change (see storage.load_config); read-only.
+    return storage.load_config()
 
-def calculate_features(df):
+def calculate_features(df, config=None, timings=None, start=0, ewm_state=None):
     """
     Calculates robust technical indicators and features for ML.
+
+    Indicators and transformations come from `pipeline.features`; pass a
+    `timings` dict to collect per-node compute seconds. `start` and
+    `ewm_state` are used by incremental updates (see `incremental.py`).
     """
     if df is None or df.empty:
         return None
     
-    config = load_config()
+    config = config or load_config()
     features = config['pipeline']['features']
     
     df = df.copy()
     
-    # 1. Technical Indicators
+    # 1. Technical Indicators & 2. Transformations (ML Features)
     # -----------------------------------------
-    
-    # SMA
-    for window in [20, 50, 200]:
-        df[f'SMA_{window}'] = df['Close'].rolling(window=window).mean()
-        
-    # RSI
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-    
-    # MACD
-    exp1 = df['Close'].ewm(span=12, adjust=False).mean()
-    exp2 = df['Close'].ewm(span=26, adjust=False).mean()
-    df['MACD'] = exp1 - exp2
-    df['MACD_Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-    
-    # Bollinger Bands
-    window = 20
-    std_dev = 2
-    df['BB_Middle'] = df['Close'].rolling(window=window).mean()
-    df['BB_Std'] = df['Close'].rolling(window=window).std()
-    df['BB_Upper'] = df['BB_Middle'] + (df['BB_Std'] * std_dev)
-    df['BB_Lower'] = df['BB_Middle'] - (df['BB_Std'] * std_dev)
-    
-    # Volatility (Rolling Std Dev)
-    df['Volatility'] = df['Close'].rolling(window=20).std()
-
-    # 2. Transformations (ML Features)
-    # -----------------------------------------
-    
-    # Log Returns
-    df['Log_Return'] = np.log(df['Close'] / df['Close'].shift(1))
-    
-    # Lagged Features (for time-series prediction)
-    for lag in [1, 2, 3]:
-        df[f'Close_Lag_{lag}'] = df['Close'].shift(lag)
-        df[f'Vol_Lag_{lag}'] = df['Volume'].shift(lag)
-
-    # Momentum
-    df['Momentum_1d'] = df['Close'].pct_change(1)
-    df['Momentum_5d'] = df['Close'].pct_change(5)
+    node_timings = {}
+    with metrics.stage('features') as timer:
+        compute_indicators(df, features, node_timings, start, ewm_state)
+        timer.rows = len(df)
+    metrics.record_indicators(node_timings)
+    if timings is not None:
+        timings.update(node_timings)
 
     df_clean = df.dropna().copy()
     
     # 3. Predictive Signal Engine (Heuristic)
     # -----------------------------------------
-    def get_signal(row):
-        score = 0
-        
-        # RSI Logic
-        if row['RSI'] < 30: score += 2      # Oversold -> Bullish
-        elif row['RSI'] > 70: score -= 2    # Overbought -> Bearish
-        elif row['RSI'] < 45: score += 0.5  # Slight Bullish bias
-        elif row['RSI'] > 55: score -= 0.5  # Slight Bearish bias
-        
-        # MACD Logic
-        if row['MACD'] > row['MACD_Signal']: score += 1.5
-        else: score -= 1.5
-        
-        # SMA Trend Logic
-        if row['Close'] > row['SMA_50']: score += 1
-        else: score -= 1
-        
-        if row['SMA_20'] > row['SMA_50']: score += 1
-        else: score -= 1
-        
-        # Bollinger Bands Logic
-        if row['Close'] < row['BB_Lower']: score += 2      # Price below lower band -> Bounce likely
-        elif row['Close'] > row['BB_Upper']: score -= 2    # Price above upper band -> Pullback likely
-        
-        return score
-
-    df_clean['Signal_Score'] = df_clean.apply(get_signal, axis=1)
-    
-    # Determine Label
-    def get_label(score):
-        if score >= 3: return "STRONG BUY"
-        elif score >= 1: return "BUY"
-        elif score <= -3: return "STRONG SELL"
-        elif score <= -1: return "SELL"
-        else: return "NEUTRAL"
-        
-    df_clean['Signal_Label'] = df_clean['Signal_Score'].apply(get_label)
+    # Rules live in `pipeline.signals` and are evaluated as whole-column masks.
+    with metrics.stage('signals') as timer:
+        apply_signals(df_clean, config['pipeline']['signals'])
+        timer.rows = len(df_clean)
+    if timings is not None:
+        timings['signals'] = timer.seconds
     
     return df_clean
 
-def process_file(ticker):
+def update_features(new_bars, state, config=None):
+    """
+    Computes processed rows for new_bars only, continuing from a persisted
+    incremental state. Returns (processed rows, new state).
+
+    Cost is O(lookback + new bars) instead of O(history).
+    """
+    config = config or load_config()
+    tail = tail_frame(state)
+    window = pd.concat([tail, new_bars[tail.columns]])
+    ewm_state = dict(state['ewm'])
+
+    processed = calculate_features(window, config, start=len(tail), ewm_state=ewm_state)
+    processed = processed[processed.index > pd.Timestamp(state['last_timestamp'])]
+    return processed, build_state(window, ewm_state, config)
+
+def read_raw_window(ticker, state, config, margin=16):
+    """
+    The stored raw bars an incremental update needs: the state's warm-up
+    tail and everything after it. Reads the last rows only, growing the
+    read until it reaches back to the tail, so cost follows lookback + new
+    bars rather than the length of the history.
+    """
+    tail = state['tail']['index']
+    first = pd.Timestamp(tail[0] if tail else state['last_timestamp'])
+    rows = len(tail) + margin
+    while True:
+        raw = storage.read_frame(ticker, 'raw', rows=slice(-rows, None), config=config)
+        if len(raw) < rows or raw.index[0] <= first:
+            return raw
+        rows *= 4
+
+def publish_latest(ticker, df):
+    """
+    Updates the latest-bar record and announces it to live subscribers.
+    """
+    with metrics.stage('publish'):
+        previous = storage.read_latest(ticker)
+        events.publish_latest(ticker, storage.write_latest(ticker, df), previous)
+
+def process_file(ticker, incremental=False):
     """
     Reads raw data, calculates advanced features, and saves.
+
+    With `incremental`, only bars newer than the persisted state are computed
+    and appended; it falls back to a full recompute when there is no usable
+    state or stored bars were revised. Appends are O(new bars) only with
+    `storage.versions` off; a versioned append copies the current file.
     """
-    raw_path = os.path.join(DATA_DIR, f"{ticker}_raw.csv")
-    if not os.path.exists(raw_path):
+    config = load_config()
+    if not storage.exists(ticker, 'raw', config):
         print(f"Raw data for {ticker} not found.")
         return False
         
     try:
-        df = pd.read_csv(raw_path, index_col=0, parse_dates=True)
-        
+        if incremental and storage.exists(ticker, 'processed', config) and required_lookback(config) is not None:
+            state = load_state(ticker, config)
+            new_bars = split_new_bars(read_raw_window(ticker, state, config), state) if state else None
+            if new_bars is not None:
+                if new_bars.empty:
+                    print(f"{ticker} is up to date.")
+                    return True
+                df_new, state = update_features(new_bars, state, config)
+                with storage.publishing(ticker, config):
+                    processed_path = storage.append_frame(df_new, ticker, 'processed', config)
+                    if featurestore.enabled(config) and not df_new.empty:
+                        featurestore.append(ticker, df_new, config)
+                if not df_new.empty:
+                    publish_latest(ticker, df_new)
+                save_state(ticker, state)
+                print(f"Appended {len(df_new)} new bars for {ticker} to {processed_path}")
+                return True
+            print(f"No usable incremental state for {ticker}, recomputing in full.")
+
+        df = storage.read_frame(ticker, 'raw', config=config)
         if len(df) < 50: 
             print(f"Not enough data to process {ticker} (need > 50 rows)")
             return False
 
-        df_processed = calculate_features(df)
+        ewm_state = {}
+        df_processed = calculate_features(df, config, ewm_state=ewm_state)
         
-        processed_path = os.path.join(DATA_DIR, f"{ticker}_processed.csv")
-        df_processed.to_csv(processed_path)
+        # The processed frame and its feature file become visible together.
+        with storage.publishing(ticker, config):
+            processed_path = storage.write_frame(df_processed, ticker, 'processed', config)
+            if featurestore.enabled(config):
+                featurestore.write(ticker, df_processed, config)
+        if not df_processed.empty:
+            publish_latest(ticker, df_processed)
+        if required_lookback(config) is not None:
+            save_state(ticker, build_state(df, ewm_state, config))
         print(f"Feature engineering complete for {ticker}. Saved to {processed_path}")
         return True
         
@@ -0,0 +1,163 @@
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+RAW_COLUMNS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+def normalize_raw(df):
+    """
+    Puts a single-symbol frame into the `{ticker}_raw` layout: OHLCV columns in
+    the stored order, rows with no data dropped and integer volume.
+    """
+    df = df.dropna(how='all')
+    df = df[[c for c in RAW_COLUMNS if c in df.columns] + [c for c in df.columns if c not in RAW_COLUMNS]]
+    if 'Volume' in df.columns and not df['Volume'].isna().any():
+        df = df.astype({'Volume': 'int64'})
+    return df.rename_axis('Datetime').rename_axis(None, axis=1)
+
+def split_symbols(df, tickers):
+    """
+    Splits a combined multi-symbol download into {ticker: frame}.
+
+    Handles both (Ticker, Price) and (Price, Ticker) column layouts as well as
+    a flat single-symbol frame.
+    """
+    if not isinstance(df.columns, pd.MultiIndex):
+        return {tickers[0]: normalize_raw(df)} if len(tickers) == 1 else {}
+
+    level = next((i for i in range(df.columns.nlevels)
+                  if set(df.columns.get_level_values(i)) & set(tickers)), None)
+    if level is None:
+        return {}
+    present = set(df.columns.get_level_values(level))
+    return {t: normalize_raw(df.xs(t, axis=1, level=level)) for t in tickers if t in present}
+
+class YahooProvider:
+    """
+    Yahoo Finance via yfinance; one HTTP round trip per batch of symbols.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def current_time(self):
+        return pd.Timestamp.now(tz='UTC')
+
+    def download(self, tickers, period=None, interval=None, start=None):
+        import yfinance as yf
+
+        self.calls += 1
+        df = yf.download(list(tickers), period=None if start is not None else period, start=start,
+                         interval=interval, group_by='ticker', progress=False, threads=True)
+        if df is None or df.empty:
+            return {}
+        return split_symbols(df, list(tickers))
+
+# yfinance-style period suffixes understood by the fake provider.
+PERIODS = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+def period_offset(period):
+    for suffix in sorted(PERIODS, key=len, reverse=True):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return pd.DateOffset(**{PERIODS[suffix]: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period '{period}'")
+
+def interval_freq(interval):
+    return pd.Timedelta(interval.replace('m', 'min') if interval.endswith('m') else interval)
+
+class FakeProvider:
+    """
+    Offline stand-in for Yahoo used by tests and benchmarks.
+
+    Bars lie on a fixed grid and each closed bar's values depend only on the
+    ticker and its timestamp, so overlapping requests return identical bars.
+    Like Yahoo, the last bar is the one in progress: it moves from its open
+    towards its final values as `now` advances and only settles when the
+    bar closes.
+    `latency` simulates the per-round-trip network cost, `calls` counts round
+    trips and `bars_served` the bars returned. Set `now` to drive it from a
+    fake clock and `revisions` ({ticker: {timestamp: scale}}) to revise bars.
+    """
+    EPOCH = pd.Timestamp('2020-01-01', tz='UTC')
+
+    def __init__(self, now=None, latency=0.0, missing=()):
+        self.now = now
+        self.latency = latency
+        self.missing = set(missing)
+        self.revisions = {}
+        self.calls = 0
+        self.bars_served = 0
+
+    def current_time(self):
+        return self.now if self.now is not None else pd.Timestamp.now(tz='UTC')
+
+    def download(self, tickers, period=None, interval=None, start=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        freq = interval_freq(interval or '1h')
+        now = self.current_time()
+        end = now.floor(freq)
+        begin = pd.Timestamp(start) if start is not None else end - period_offset(period or '6mo')
+        first = int(np.ceil((begin - self.EPOCH) / freq))
+        last = int((end - self.EPOCH) // freq)
+        positions = np.arange(max(first, 0), last + 1)
+        index = pd.DatetimeIndex(self.EPOCH + positions * freq, name='Datetime')
+
+        frames = {t: self.bars(t, positions, index) for t in tickers if t not in self.missing}
+        for df in frames.values():
+            if len(df) and df.index[-1] == end:
+                self.in_progress(df, (now - end) / freq)
+        self.bars_served += sum(len(df) for df in frames.values())
+        return frames
+
+    def bars(self, ticker, positions, index):
+        seed = zlib.crc32(ticker.encode())
+        phase = (seed % 1000) / 100
+
+        def noise(salt):
+            # Cheap stateless hash -> [0, 1), so any bar can be regenerated alone.
+            mixed = (positions.astype(np.uint64) * np.uint64(2654435761) + np.uint64(seed + salt)) % np.uint64(2**32)
+            return mixed.astype(np.float64) / 2**32
+
+        base = 50 + seed % 500
+        close = base * np.exp(0.2 * np.sin(positions / 400 + phase) + 0.03 * np.sin(positions / 9) + 0.004 * noise(1))
+        open_ = close * (1 + 0.004 * (noise(2) - 0.5))
+        df = pd.DataFrame({
+            'Close': close,
+            'High': np.maximum(close, open_) * (1 + 0.003 * noise(3)),
+            'Low': np.minimum(close, open_) * (1 - 0.003 * noise(4)),
+            'Open': open_,
+            'Volume': (1_000 + noise(5) * 5_000_000).astype(np.int64),
+        }, index=index)
+        for ts, scale in self.revisions.get(ticker, {}).items():
+            if ts in df.index:
+                df.loc[ts, ['Close', 'High', 'Low', 'Open']] *= scale
+        return df
+
+    @staticmethod
+    def in_progress(df, progress):
+        """
+        Turns the last bar of df into a partial one, `progress` (0-1) of the
+        way from its open to its final values.
+        """
+        ts = df.index[-1]
+        open_, close = df.at[ts, 'Open'], df.at[ts, 'Close']
+        partial = open_ + (close - open_) * progress
+        df.at[ts, 'Close'] = partial
+        df.at[ts, 'High'] = max(open_, partial) + (df.at[ts, 'High'] - max(open_, close)) * progress
+        df.at[ts, 'Low'] = min(open_, partial) - (min(open_, close) - df.at[ts, 'Low']) * progress
+        df.at[ts, 'Volume'] = int(df.at[ts, 'Volume'] * progress)
+
+PROVIDERS = {
+    'yahoo': YahooProvider,
+    'fake': FakeProvider,
+}
+
+def get_provider(config):
+    name = config['pipeline']['data'].get('provider', 'yahoo')
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown data provider '{name}'")
+    return PROVIDERS[name]()
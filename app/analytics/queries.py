@@ -0,0 +1,148 @@
+import pandas as pd
+
+from app.analytics import compact, featurestore, resample
+
+class QueryError(ValueError):
+    """
+    Raised for malformed history query parameters; views turn it into a 400.
+    """
+
+def parse_time(value, tz=None):
+    """
+    Parses an ISO timestamp, interpreting naive values in the index timezone.
+    """
+    try:
+        ts = pd.Timestamp(value)
+    except ValueError as exc:
+        raise QueryError(f"Invalid timestamp '{value}'") from exc
+    if ts is pd.NaT:
+        # pd.Timestamp('') and pd.Timestamp('NaT') parse as NaT, which
+        # would silently select nothing.
+        raise QueryError(f"Invalid timestamp '{value}'")
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert(None)
+    return ts
+
+def time_param(params, name):
+    """
+    A timestamp query parameter, or None when it is missing or empty
+    (`?start=`): an empty bound means no bound.
+    """
+    return params.get(name) or None
+
+def parse_columns(value, available):
+    """
+    Parses a comma-separated `columns=` value (or a list of names); None
+    means every column.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    columns = [c.strip() for c in value if c.strip()]
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise QueryError(f"Unknown columns: {', '.join(unknown)}")
+    return columns
+
+def columns_of(df):
+    """
+    Column names of a frame, compact frame or mapped feature file.
+    """
+    if isinstance(df, featurestore.MappedFrame):
+        return df.columns
+    return compact.columns(df)
+
+def parse_limit(value):
+    if value in (None, ''):
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError) as exc:
+        raise QueryError(f"Invalid limit '{value}'") from exc
+    if limit <= 0:
+        raise QueryError("limit must be positive")
+    return limit
+
+def select_range(df, start=None, end=None, columns=None, limit=None, cursor=None, since=None):
+    """
+    Rows of a time-indexed frame with start <= t <= end, projected to columns.
+
+    Bounds are located by binary search on the sorted index. `cursor` is the
+    timestamp of the first row to return (a previous page's next_cursor) and
+    `limit` caps the page size. `since` keeps only rows strictly newer than
+    a timestamp the client already has. Compact frames and mapped feature
+    files are materialized for the selected rows only. Returns (frame,
+    next_cursor or None).
+    """
+    tz = getattr(df.index, 'tz', None)
+    lo, hi = 0, len(df)
+    if start is not None:
+        lo = df.index.searchsorted(parse_time(start, tz), side='left')
+    if since is not None:
+        lo = max(lo, df.index.searchsorted(parse_time(since, tz), side='right'))
+    if cursor is not None:
+        lo = max(lo, df.index.searchsorted(parse_time(cursor, tz), side='left'))
+    if end is not None:
+        hi = df.index.searchsorted(parse_time(end, tz), side='right')
+    hi = max(lo, hi)
+
+    next_cursor = None
+    if limit is not None and hi - lo > limit:
+        next_cursor = df.index[lo + limit].isoformat()
+        hi = lo + limit
+
+    if isinstance(df, featurestore.MappedFrame):
+        return df.rows(lo, hi, columns), next_cursor
+    return compact.expand(df, lo, hi, columns), next_cursor
+
+def chart_frame(df, params):
+    """
+    Applies a chart query to a time-indexed frame: `start`/`end`, `since`,
+    `columns`, `interval` (resampling) and `max_points` (LTTB decimation on
+    `y`, default Close). `params` is any mapping, e.g. request.query_params.
+
+    With an interval, `since` is the label of the client's last bin; that
+    bin is returned again because it may have been partial.
+    """
+    interval = params.get('interval')
+    y = params.get('y', 'Close')
+    available = columns_of(df)
+    columns = parse_columns(params.get('columns'), available)
+    if interval is not None and interval not in resample.INTERVALS:
+        raise QueryError(f"interval must be one of: {', '.join(resample.INTERVALS)}")
+    if y not in available:
+        raise QueryError(f"Unknown column '{y}'")
+    max_points = parse_limit(params.get('max_points'))
+    if max_points is not None and max_points < 3:
+        raise QueryError("max_points must be at least 3")
+
+    since = time_param(params, 'since')
+    start = time_param(params, 'start')
+    if since is not None and interval is not None:
+        # Bins are labelled by their first bar, so the last bin starts at since.
+        since_ts = parse_time(since, getattr(df.index, 'tz', None))
+        start = since_ts if start is None else max(parse_time(start, since_ts.tz), since_ts)
+        since = None
+    df, _ = select_range(df, start=start, end=time_param(params, 'end'), since=since,
+                         columns=None if columns is None else list(dict.fromkeys(columns + [y])))
+    if interval is not None:
+        df = resample.resample_ohlcv(df, interval)
+    if max_points is not None:
+        df = resample.decimate(df, max_points, y)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+def to_columns(df):
+    """
+    Compact columnar shape: {column: [values]} including the index column.
+    """
+    return df.reset_index().to_dict(orient='list')
+
+ORIENTS = {
+    'records': lambda df: df.reset_index().to_dict(orient='records'),
+    'columns': to_columns,
+}
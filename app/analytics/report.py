@@ -0,0 +1,76 @@
+import json
+import os
+
+import pandas as pd
+
+from app.analytics import metrics, storage
+
+REPORT_FILE = 'pipeline_report.json'
+
+def report_path():
+    return os.path.join(storage.DATA_DIR, REPORT_FILE)
+
+def build_report(results, mode, started_at):
+    """
+    Run report from a pipeline results dict: outcome, wall time, totals per
+    stage and indicator, and per-ticker timings and stage stats.
+    """
+    stats = results.get('stats', {})
+    totals = metrics.new_stats()
+    for entry in stats.values():
+        metrics.merge(totals, entry)
+    timings = results['timings']
+    return {
+        "started_at": started_at.isoformat(),
+        "finished_at": pd.Timestamp.now(tz='UTC').isoformat(),
+        "mode": mode,
+        "wall_seconds": timings.get('_wall'),
+        "success": len(results['success']),
+        "failed": results['failed'],
+        "stages": totals['stages'],
+        "indicators": dict(sorted(totals['indicators'].items(), key=lambda item: -item[1])),
+        "tickers": {
+            ticker: {**stages, "stages": stats.get(ticker, {}).get('stages', {})}
+            for ticker, stages in timings.items() if not ticker.startswith('_')
+        },
+    }
+
+def write_report(report):
+    path = report_path()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+def read_report():
+    """
+    Returns the last run report, or None if the pipeline has not run.
+    """
+    try:
+        with open(report_path(), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def report_metrics():
+    """
+    Registry collector exporting the last run report as gauges.
+    """
+    report = read_report()
+    if report is None:
+        return
+    finished = pd.Timestamp(report['finished_at']).timestamp()
+    yield ('market_pipeline_last_run_timestamp_seconds', 'gauge', 'When the last pipeline run finished',
+           [({}, finished)])
+    yield ('market_pipeline_last_run_wall_seconds', 'gauge', 'Wall-clock seconds of the last pipeline run',
+           [({}, report['wall_seconds'] or 0.0)])
+    yield ('market_pipeline_last_run_tickers', 'gauge', 'Tickers by outcome in the last pipeline run',
+           [({'status': 'success'}, report['success']), ({'status': 'failed'}, len(report['failed']))])
+    stages = report['stages']
+    for key, help in (('seconds', 'Seconds spent'), ('calls', 'Calls'), ('rows', 'Rows processed'),
+                      ('bytes', 'Bytes read or written')):
+        yield (f'market_pipeline_stage_{key}', 'gauge', f'{help} per stage in the last pipeline run',
+               [({'stage': name}, entry[key]) for name, entry in stages.items()])
+    yield ('market_pipeline_indicator_seconds', 'gauge', 'Seconds per indicator node in the last pipeline run',
+           [({'indicator': node}, seconds) for node, seconds in report['indicators'].items()])
@@ -0,0 +1,75 @@
+import numpy as np
+
+# Chart intervals -> pandas rules. Bins are labelled by their start.
+INTERVALS = {
+    '1h': '1h',
+    '4h': '4h',
+    '1d': '1D',
+    '1w': 'W-MON',
+}
+
+OHLCV_AGG = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+def resample_ohlcv(df, interval):
+    """
+    Aggregates bars to a coarser interval: first open, max high, min low,
+    last close, summed volume. Every other column (indicators, signals)
+    takes its last value in the bin. Bins without bars are dropped.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported interval '{interval}'")
+    agg = {c: OHLCV_AGG.get(c, 'last') for c in df.columns}
+    resampled = df.resample(INTERVALS[interval], closed='left', label='left').agg(agg)
+    counts = df.iloc[:, 0].resample(INTERVALS[interval], closed='left', label='left').size()
+    return resampled[counts.to_numpy() > 0]
+
+def lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling; returns the indices of the
+    kept points, always including the first and last.
+
+    Bucket averages come from prefix sums and each bucket is scored with one
+    numpy expression; only the walk across buckets, which depends on the
+    previously selected point, is a Python loop (max_points iterations).
+    """
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3")
+
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x[0]
+    y = np.asarray(y, dtype=np.float64)
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+
+    # max_points - 2 buckets over the points between the fixed endpoints.
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi, next_hi = edges[i], edges[i + 1], edges[i + 2]
+        avg_x = (cx[next_hi] - cx[hi]) / (next_hi - hi)
+        avg_y = (cy[next_hi] - cy[hi]) / (next_hi - hi)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+def decimate(df, max_points, column='Close'):
+    """
+    Keeps at most max_points rows, chosen by LTTB on `column` over time.
+    """
+    if len(df) <= max_points:
+        return df
+    return df.iloc[lttb(df.index.asi8, df[column].to_numpy(), max_points)]
@@ -0,0 +1,129 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from app.analytics import incremental, metrics, storage
+from app.analytics.data_fetcher import fetch_data
+from app.analytics.processor import process_file
+
+def timed(fn, *args):
+    """
+    Runs fn(*args) and returns (result, seconds). Module-level so it can be
+    shipped to process-pool workers.
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def use_data_dir(data_dir):
+    """
+    Process-pool initializer: points a spawned worker at the parent's data
+    directory, which module-level settings do not carry across spawn.
+    """
+    storage.DATA_DIR = incremental.DATA_DIR = data_dir
+
+def run_concurrent(tickers, fetch=fetch_data, process=process_file, fetch_workers=4, process_workers=None,
+                   fetch_many=None, batch_size=1, data_dir=None):
+    """
+    Fetches tickers on a bounded thread pool and hands each one to a process
+    pool for feature engineering as soon as its download finishes, so I/O
+    and CPU work overlap.
+
+    `fetch(ticker)` returns a frame or None. Alternatively `fetch_many(batch)`
+    returns {ticker: frame or None} for batches of `batch_size` tickers.
+    `process` must be picklable (a module-level function or partial). With
+    `process_workers=0` processing runs inline on the fetch threads.
+    Worker processes use `data_dir` (default: this process's
+    `storage.DATA_DIR`).
+    Returns {'success': [...], 'failed': [...], 'timings': {...}, 'stats':
+    {...}}; stats hold per-ticker stage metrics and '_fetch' the downloads.
+    """
+    if fetch_many is None:
+        fetch_many, batch_size = (lambda batch: {t: fetch(t) for t in batch}), 1
+    batches = [list(tickers[i:i + batch_size]) for i in range(0, len(tickers), batch_size)]
+
+    timings = {ticker: {} for ticker in tickers}
+    stats = {'_fetch': metrics.new_stats()}
+    failed = set()
+    stats_lock = threading.Lock()
+    start = time.perf_counter()
+
+    def fetch_and_maybe_process(batch):
+        frames, seconds, fetch_stats = metrics.collect(fetch_many, batch)
+        with stats_lock:
+            metrics.merge(stats['_fetch'], fetch_stats)
+        ready = []
+        for ticker in batch:
+            # A batch is one round trip; its time is shared by its tickers.
+            timings[ticker]['fetch'] = seconds / len(batch)
+            if frames.get(ticker) is None:
+                failed.add(ticker)
+            elif process_workers == 0:
+                ok, timings[ticker]['process'], stats[ticker] = metrics.collect(process, ticker)
+                if not ok:
+                    failed.add(ticker)
+            else:
+                ready.append(ticker)
+        return ready
+
+    # Spawned workers avoid forking while fetch threads hold locks.
+    process_pool = None
+    if process_workers != 0:
+        process_pool = ProcessPoolExecutor(max_workers=process_workers,
+                                           mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=use_data_dir, initargs=(data_dir or storage.DATA_DIR,))
+    try:
+        process_futures = {}
+        with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+            fetch_futures = {fetch_pool.submit(fetch_and_maybe_process, b): b for b in batches}
+            for future in as_completed(fetch_futures):
+                try:
+                    ready = future.result()
+                except Exception as e:
+                    print(f"Critical failure on {', '.join(fetch_futures[future])}: {e}")
+                    failed.update(fetch_futures[future])
+                    continue
+                for ticker in ready:
+                    process_futures[process_pool.submit(metrics.collect, process, ticker)] = ticker
+
+        for future in as_completed(process_futures):
+            ticker = process_futures[future]
+            try:
+                ok, timings[ticker]['process'], stats[ticker] = future.result()
+            except Exception as e:
+                print(f"Critical failure on {ticker}: {e}")
+                ok = False
+            if not ok:
+                failed.add(ticker)
+    finally:
+        if process_pool is not None:
+            process_pool.shutdown()
+
+    timings['_wall'] = time.perf_counter() - start
+    return {
+        'success': [t for t in tickers if t not in failed],
+        'failed': [t for t in tickers if t in failed],
+        'timings': timings,
+        'stats': stats,
+    }
+
+def print_timings(timings):
+    """
+    Prints per-ticker stage times and the speedup over running them serially.
+    """
+    print("\nTiming breakdown:")
+    fetch_total = process_total = 0.0
+    for ticker, stages in timings.items():
+        if ticker.startswith('_'):
+            continue
+        fetch_total += stages.get('fetch', 0.0)
+        process_total += stages.get('process', 0.0)
+        parts = [f"{stage} {secs:.2f}s" for stage, secs in stages.items()]
+        print(f"  {ticker:<10} {' | '.join(parts)}")
+
+    wall = timings['_wall']
+    serial = fetch_total + process_total
+    print(f"Wall clock: {wall:.2f}s | Serial estimate: {serial:.2f}s "
+          f"(fetch {fetch_total:.2f}s + process {process_total:.2f}s) | "
+          f"Speedup: {serial / wall if wall else 0:.1f}x")
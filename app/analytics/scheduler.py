@@ -0,0 +1,220 @@
+"""
+Long-running refresh loop behind `pipeline.py --daemon`.
+
+The process stays warm (imports, config, processing inline) and refreshes
+each ticker only once the bar after its last stored one has closed, plus
+`grace` (only closed bars are stored, see `fetch_batch`). Equities wait for
+the next session when that bar falls outside `market_hours`; `always_open`
+symbols (crypto) run 24/7.
+Due tickers are delta-fetched in batches and processed incrementally when
+`live_mode` is set. Failures back off exponentially and every due time gets
+random jitter so requests spread out. SIGINT/SIGTERM finish the current
+cycle and exit.
+"""
+import datetime
+import random
+import threading
+from functools import partial
+
+import pandas as pd
+
+from app.analytics import storage
+from app.analytics.data_fetcher import fetch_batch
+from app.analytics.processor import load_config, process_file
+from app.analytics.providers import get_provider, interval_freq
+from app.analytics.report import build_report, write_report
+from app.analytics.runner import run_concurrent
+from app.analytics.summary import write_summary
+
+class SystemClock:
+    def __init__(self):
+        self._wake = threading.Event()
+
+    def now(self):
+        return pd.Timestamp.now(tz='UTC')
+
+    def sleep(self, seconds):
+        self._wake.wait(seconds)
+
+    def wake(self):
+        self._wake.set()
+
+class FakeClock:
+    """
+    Clock for tests: sleep() advances time instantly and moves the `now` of
+    attached FakeProviders along with it.
+    """
+    def __init__(self, now, providers=()):
+        self.current = pd.Timestamp(now)
+        self.providers = list(providers)
+        self._sync()
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.current += pd.Timedelta(seconds=seconds)
+        self._sync()
+
+    def wake(self):
+        pass
+
+    def _sync(self):
+        for provider in self.providers:
+            provider.now = self.current
+
+class MarketHours:
+    """
+    Weekly trading session in a market timezone (exchange holidays are not
+    modelled; a holiday refresh simply finds no new bars).
+    """
+    def __init__(self, spec):
+        self.tz = spec.get('timezone', 'America/New_York')
+        self.open = datetime.time.fromisoformat(spec.get('open', '09:30'))
+        self.close = datetime.time.fromisoformat(spec.get('close', '16:00'))
+        self.weekdays = set(spec.get('weekdays', [0, 1, 2, 3, 4]))
+        if not self.weekdays:
+            raise ValueError("market_hours needs at least one trading weekday")
+
+    def is_open(self, ts):
+        local = ts.tz_convert(self.tz)
+        return local.weekday() in self.weekdays and self.open <= local.time() < self.close
+
+    def next_open(self, ts):
+        """
+        `ts` itself during a session, otherwise the start of the next one.
+        """
+        if self.is_open(ts):
+            return ts
+        day = ts.tz_convert(self.tz).date()
+        while True:
+            start = pd.Timestamp(datetime.datetime.combine(day, self.open)).tz_localize(self.tz)
+            if start >= ts and day.weekday() in self.weekdays:
+                return start.tz_convert('UTC')
+            day += datetime.timedelta(days=1)
+
+class Scheduler:
+    """
+    Per-ticker refresh schedule. `clock` (default SystemClock), `provider`
+    and `rng` are injectable so the loop can run against FakeClock and
+    FakeProvider.
+    """
+    def __init__(self, tickers=None, config=None, provider=None, clock=None, rng=None):
+        self.config = config or load_config()
+        pipeline = self.config['pipeline']
+        spec = pipeline.get('schedule', {})
+        self.tickers = list(tickers or pipeline['tickers'])
+        self.freq = interval_freq(pipeline['data']['interval'])
+        self.incremental = pipeline['data'].get('live_mode', False)
+        self.provider = provider or get_provider(self.config)
+        self.clock = clock or SystemClock()
+        self.rng = rng or random.Random()
+
+        self.hours = MarketHours(spec.get('market_hours', {}))
+        self.always_open = set(spec.get('always_open', []))
+        self.grace = pd.Timedelta(spec.get('grace', '2min'))
+        self.recheck = pd.Timedelta(spec.get('recheck', '5min'))
+        self.jitter = pd.Timedelta(spec.get('jitter', '30s'))
+        self.backoff = pd.Timedelta(spec.get('backoff', '30s'))
+        self.max_backoff = pd.Timedelta(spec.get('max_backoff', '30min'))
+        self.max_sleep = float(spec.get('max_sleep', 60))
+
+        self.last_bar = {}
+        self.failures = {}
+        self.next_due = {}
+        self.stopping = False
+
+    def stop(self, *args):
+        """
+        Ends the loop after the current cycle; usable as a signal handler.
+        """
+        self.stopping = True
+        self.clock.wake()
+
+    def _stored_last_bar(self, ticker):
+        try:
+            tail = storage.read_frame(ticker, 'raw', rows=slice(-1, None), config=self.config)
+        except FileNotFoundError:
+            return None
+        return tail.index[-1] if len(tail) else None
+
+    def bar_due(self, ticker, last):
+        """
+        When the bar after `last` should have closed: it starts one interval
+        later (at the next session open for tickers with market hours) and
+        closes one interval after that.
+        """
+        start = last + self.freq
+        if ticker not in self.always_open:
+            start = self.hours.next_open(start)
+        return start + self.freq + self.grace
+
+    def schedule(self, ticker, now, ok=True):
+        """
+        Sets a ticker's next due time after a refresh attempt at `now`.
+        """
+        if not ok:
+            self.failures[ticker] = self.failures.get(ticker, 0) + 1
+            delay = min(self.backoff * 2 ** (self.failures[ticker] - 1), self.max_backoff)
+            due = now + delay
+        else:
+            self.failures.pop(ticker, None)
+            last = self.last_bar[ticker] = self._stored_last_bar(ticker)
+            due = now if last is None else self.bar_due(ticker, last)
+            if due <= now:
+                # Still stale after refreshing: the provider has no newer bar yet.
+                due = now + self.recheck
+        self.next_due[ticker] = due + self.jitter * self.rng.random()
+
+    def start(self, now):
+        """
+        Initial schedule from the stored data: tickers without data are due
+        now, stale ones (a newer bar was due in the past) are already due.
+        """
+        for ticker in self.tickers:
+            last = self.last_bar[ticker] = self._stored_last_bar(ticker)
+            self.next_due[ticker] = now if last is None else self.bar_due(ticker, last)
+
+    def run_once(self, now):
+        """
+        Refreshes the tickers due at `now`. Returns the pipeline results, or
+        None if nothing was due.
+        """
+        due = [t for t in self.tickers if self.next_due[t] <= now]
+        if not due:
+            return None
+        data = self.config['pipeline']['data']
+        results = run_concurrent(
+            due,
+            fetch_many=partial(fetch_batch, provider=self.provider, config=self.config, delta=True),
+            batch_size=data.get('batch_size', 20),
+            process=partial(process_file, incremental=self.incremental),
+            fetch_workers=self.config['pipeline'].get('concurrency', {}).get('fetch_workers', 4),
+            process_workers=0,
+        )
+        for ticker in due:
+            self.schedule(ticker, now, ticker in results['success'])
+        write_summary()
+        write_report(build_report(results, 'daemon', now))
+        upcoming = min(self.next_due.values())
+        print(f"[{now}] refreshed {len(results['success'])}/{len(due)} due tickers"
+              f"{' | failed: ' + ', '.join(results['failed']) if results['failed'] else ''}"
+              f" | next at {upcoming}")
+        return results
+
+    def run(self, until=None):
+        """
+        Runs refresh cycles until stopped (or the clock reaches `until`).
+        """
+        self.start(self.clock.now())
+        while not self.stopping:
+            now = self.clock.now()
+            if until is not None and now >= until:
+                break
+            self.run_once(now)
+            if self.stopping:
+                break
+            wait = (min(self.next_due.values()) - self.clock.now()).total_seconds()
+            if until is not None:
+                wait = min(wait, (until - self.clock.now()).total_seconds())
+            self.clock.sleep(min(max(wait, 0.0), self.max_sleep))
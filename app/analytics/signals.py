@@ -0,0 +1,75 @@
+import operator
+
+import numpy as np
+import pandas as pd
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+def compile_rules(spec):
+    """
+    Compiles the declarative signal spec from `pipeline.signals` into
+    (rules, labels) that can be evaluated over whole columns.
+
+    Each rule is an ordered list of cases evaluated like an if/elif chain:
+    the first matching case contributes its score, otherwise `default` (0).
+    Each label is matched in order on `min` (score >= min) or `max`
+    (score <= max); unmatched scores get `default_label`.
+    """
+    rules = []
+    for rule in spec['rules']:
+        cases = []
+        for case in rule['cases']:
+            op = case['op']
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported operator '{op}' in signal rule '{rule['name']}'")
+            cases.append((case['left'], OPERATORS[op], case['right'], float(case['score'])))
+        rules.append((rule['name'], cases, float(rule.get('default', 0))))
+
+    labels = []
+    for label in spec['labels']:
+        if 'min' in label:
+            labels.append((operator.ge, float(label['min']), label['label']))
+        elif 'max' in label:
+            labels.append((operator.le, float(label['max']), label['label']))
+        else:
+            raise ValueError(f"Label '{label['label']}' needs a 'min' or 'max' threshold")
+
+    return rules, labels, spec.get('default_label', 'NEUTRAL')
+
+def _operand(df, value):
+    if isinstance(value, str):
+        return df[value].to_numpy()
+    return value
+
+def score_signals(df, rules):
+    """
+    Evaluates compiled rules as vectorized masks and returns the summed score.
+    """
+    score = np.zeros(len(df), dtype=np.float64)
+    for _, cases, default in rules:
+        masks = [op(_operand(df, left), _operand(df, right)) for left, op, right, _ in cases]
+        score += np.select(masks, [s for *_, s in cases], default=default)
+    return pd.Series(score, index=df.index)
+
+def label_scores(scores, labels, default_label='NEUTRAL'):
+    """
+    Maps scores to labels using the compiled threshold table.
+    """
+    values = scores.to_numpy()
+    masks = [op(values, threshold) for op, threshold, _ in labels]
+    return pd.Series(np.select(masks, [label for *_, label in labels], default=default_label),
+                     index=scores.index)
+
+def apply_signals(df, spec):
+    """
+    Adds Signal_Score and Signal_Label columns to df in place.
+    """
+    rules, labels, default_label = compile_rules(spec)
+    df['Signal_Score'] = score_signals(df, rules)
+    df['Signal_Label'] = label_scores(df['Signal_Score'], labels, default_label)
+    return df
@@ -0,0 +1,47 @@
+"""
+Drives the pipeline from the offline FakeProvider so live updates can be
+exercised end to end without network access. Each step advances a fake
+clock by one bar interval, delta-fetches and incrementally processes the
+tickers, which publishes bar/signal events for the API's /stream/.
+
+    python -m app.analytics.simulate --tickers SIM-EQ SIM-FX --delay 1
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from app.analytics.data_fetcher import fetch_batch
+from app.analytics.processor import load_config, process_file
+from app.analytics.providers import FakeProvider, interval_freq
+
+def step(tickers, provider, config):
+    frames = fetch_batch(tickers, provider=provider, config=config, delta=True)
+    return [t for t in tickers if frames.get(t) is not None and process_file(t, incremental=True)]
+
+def simulate(tickers, steps=None, delay=1.0, provider=None, config=None):
+    """
+    Runs `steps` simulated bars (forever if None), `delay` seconds apart.
+    """
+    config = config or load_config()
+    freq = interval_freq(config['pipeline']['data']['interval'])
+    if provider is None:
+        provider = FakeProvider(now=pd.Timestamp.now(tz='UTC').floor(freq))
+
+    step(tickers, provider, config)
+    done = 0
+    while steps is None or done < steps:
+        time.sleep(delay)
+        provider.now += freq
+        updated = step(tickers, provider, config)
+        done += 1
+        print(f"[{provider.now}] published {len(updated)}/{len(tickers)} tickers")
+    return provider
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", nargs="+", default=["SIM-EQ", "SIM-FX"])
+    parser.add_argument("--steps", type=int, help="Number of bars to simulate (default: run forever)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds between simulated bars")
+    args = parser.parse_args()
+    simulate(args.tickers, args.steps, args.delay)
@@ -0,0 +1,616 @@
+import argparse
+import contextlib
+import fcntl
+import functools
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from app.analytics import metrics
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config', 'pipeline_config.yaml')
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Data', 'data')
+
+# Parquet files are written in row groups of this size so tail/range reads
+# only decode the groups they touch.
+ROW_GROUP_SIZE = 10_000
+
+CSV_SUFFIXES = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+
+# Symbols as providers spell them (AAPL, BTC-USD, BRK.B, ^GSPC, EURUSD=X);
+# nothing that could change the directory of a `{ticker}_{kind}` path.
+TICKER_PATTERN = re.compile(r'[A-Za-z0-9^][A-Za-z0-9.=^-]{0,31}')
+
+MANIFEST_FILE = 'manifest.json'
+VERSIONS_DIR = 'versions'
+
+def load_config():
+    """
+    Returns the pipeline config, re-parsed only when the file changes so
+    per-request path lookups stay cheap. Treat the result as read-only.
+    """
+    return _load_config(os.stat(CONFIG_PATH).st_mtime_ns)
+
+@functools.lru_cache(maxsize=1)
+def _load_config(mtime_ns):
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise ImportError("Parquet/Feather storage requires pyarrow (pip install pyarrow).") from exc
+    return pyarrow
+
+def _replace(backend, df, path, compression):
+    """
+    Writes to a temporary file and renames it over path, so readers (including
+    memory-mapped ones) never observe a partially written file.
+    """
+    tmp_path = f"{path}.tmp"
+    backend.write(df, tmp_path, compression)
+    os.replace(tmp_path, path)
+
+def _row_bounds(rows, total):
+    if rows is None:
+        return 0, total
+    start, stop, step = rows.indices(total)
+    if step != 1:
+        raise ValueError("Row ranges must be contiguous")
+    return start, max(start, stop)
+
+class CsvBackend:
+    extension = '.csv'
+
+    def suffix(self, compression):
+        return self.extension + CSV_SUFFIXES.get(compression, '')
+
+    def write(self, df, path, compression):
+        df.to_csv(path, compression=compression)
+
+    def append(self, df, path, compression):
+        if compression:
+            _replace(self, pd.concat([self.read(path), df]), path, compression)
+        else:
+            df.to_csv(path, mode='a', header=False)
+
+    def read(self, path, columns=None, rows=None):
+        names = list(pd.read_csv(path, nrows=0).columns)
+        usecols = None if columns is None else [names[0]] + list(columns)
+
+        if rows is None:
+            return pd.read_csv(path, index_col=0, usecols=usecols, parse_dates=True)
+        if not path.endswith(self.extension):
+            # Compressed streams cannot be seeked; parse and slice instead.
+            return self.read(path, columns).iloc[rows]
+
+        # Locate the requested rows by scanning bytes for newlines, then
+        # parse only those rows.
+        with open(path, 'rb') as f:
+            offset, nrows = self._locate(f, rows)
+            empty = nrows == 0
+            if empty:
+                # Parse the first row anyway so an empty range keeps the dtypes.
+                offset, nrows = self._header_end(f), 1
+            f.seek(offset)
+            df = pd.read_csv(f, header=None, names=names, index_col=0, usecols=usecols,
+                             parse_dates=True, nrows=nrows)
+        return df.iloc[:0] if empty else df
+
+    def iter_read(self, path, columns, chunk_rows):
+        names = list(pd.read_csv(path, nrows=0).columns)
+        usecols = None if columns is None else [names[0]] + list(columns)
+        with pd.read_csv(path, index_col=0, usecols=usecols, parse_dates=True, chunksize=chunk_rows) as reader:
+            yield from reader
+
+    def _locate(self, f, rows):
+        if rows.start is not None and rows.start < 0 and rows.stop is None and rows.step in (None, 1):
+            return self._tail_offset(f, -rows.start), None
+
+        data = np.frombuffer(f.read(), dtype=np.uint8)
+        line_ends = np.flatnonzero(data == ord('\n'))
+        if len(data) and data[-1] != ord('\n'):
+            line_ends = np.append(line_ends, len(data))
+        # Line 0 is the header; row i starts right after line_ends[i].
+        start, stop = _row_bounds(rows, len(line_ends) - 1)
+        offset = line_ends[start] + 1 if start < len(line_ends) else len(data)
+        return int(offset), stop - start
+
+    def _tail_offset(self, f, n, block=1 << 16):
+        """
+        Byte offset of the last n rows, reading backwards from the end.
+        """
+        pos = f.seek(0, os.SEEK_END)
+        chunks = b''
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            chunks = f.read(step) + chunks
+            # Ignoring a trailing newline, n newlines bound the last n rows.
+            if chunks.count(b'\n', 0, len(chunks.rstrip(b'\n'))) >= n:
+                break
+        cut = len(chunks.rstrip(b'\n'))
+        for _ in range(n):
+            cut = chunks.rfind(b'\n', 0, cut)
+            if cut < 0:
+                break
+        return max(pos + cut + 1, self._header_end(f))
+
+    def _header_end(self, f):
+        f.seek(0)
+        return len(f.readline())
+
+class ParquetBackend:
+    extension = '.parquet'
+
+    def suffix(self, compression):
+        return self.extension
+
+    def write(self, df, path, compression):
+        pa = _arrow()
+        table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+        pa.parquet.write_table(table, path, compression=compression or 'none',
+                               row_group_size=ROW_GROUP_SIZE)
+
+    def append(self, df, path, compression):
+        _replace(self, pd.concat([self.read(path), df]), path, compression)
+
+    def read(self, path, columns=None, rows=None):
+        pa = _arrow()
+        pf = pa.parquet.ParquetFile(path)
+        index_name = pf.schema_arrow.names[0]
+        names = None if columns is None else [index_name] + list(columns)
+
+        start, stop = _row_bounds(rows, pf.metadata.num_rows)
+        groups, offset, first = [], 0, None
+        for i in range(pf.metadata.num_row_groups):
+            size = pf.metadata.row_group(i).num_rows
+            if offset < stop and offset + size > start:
+                groups.append(i)
+                first = offset if first is None else first
+            offset += size
+
+        if not groups:
+            table = pf.schema_arrow.empty_table().select(names or pf.schema_arrow.names)
+        else:
+            table = pf.read_row_groups(groups, columns=names).slice(start - first, stop - start)
+        return table.to_pandas().set_index(index_name)
+
+    def iter_read(self, path, columns, chunk_rows):
+        pa = _arrow()
+        pf = pa.parquet.ParquetFile(path)
+        index_name = pf.schema_arrow.names[0]
+        names = None if columns is None else [index_name] + list(columns)
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=names):
+            yield batch.to_pandas().set_index(index_name)
+
+class FeatherBackend:
+    extension = '.feather'
+
+    def suffix(self, compression):
+        return self.extension
+
+    def write(self, df, path, compression):
+        pa = _arrow()
+        table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+        pa.feather.write_feather(table, path, compression=compression or 'uncompressed')
+
+    def append(self, df, path, compression):
+        _replace(self, pd.concat([self.read(path), df]), path, compression)
+
+    def read(self, path, columns=None, rows=None):
+        pa = _arrow()
+        # Memory-mapped read: projection and slicing are zero-copy for
+        # uncompressed files, so only the selected values are materialized.
+        table = pa.feather.read_table(path, memory_map=True)
+        index_name = table.schema.names[0]
+        if columns is not None:
+            table = table.select([index_name] + list(columns))
+        start, stop = _row_bounds(rows, table.num_rows)
+        return table.slice(start, stop - start).to_pandas().set_index(index_name)
+
+    def iter_read(self, path, columns, chunk_rows):
+        pa = _arrow()
+        table = pa.feather.read_table(path, memory_map=True)
+        index_name = table.schema.names[0]
+        if columns is not None:
+            table = table.select([index_name] + list(columns))
+        for offset in range(0, table.num_rows, chunk_rows):
+            yield table.slice(offset, chunk_rows).to_pandas().set_index(index_name)
+
+BACKENDS = {
+    'csv': CsvBackend(),
+    'parquet': ParquetBackend(),
+    'feather': FeatherBackend(),
+}
+
+def storage_settings(config=None):
+    storage = (config or load_config())['pipeline'].get('storage', {})
+    fmt = storage.get('format', 'csv')
+    if fmt not in BACKENDS:
+        raise ValueError(f"Unsupported storage format '{fmt}'")
+    return fmt, storage.get('compression')
+
+def versions_enabled(config=None):
+    """
+    Whether outputs are written as versions. Versions are immutable, so an
+    append copies the whole current file; unless `storage.versions` says
+    otherwise they are only used when refreshes are not incremental
+    (`data.live_mode` off), where every write rewrites the file anyway.
+    """
+    pipeline = (config or load_config())['pipeline']
+    enabled = pipeline.get('storage', {}).get('versions')
+    return not pipeline.get('data', {}).get('live_mode', False) if enabled is None else enabled
+
+# Versioned outputs
+#
+# With `storage.versions`, every write goes to a new, never modified file
+# under versions/{ticker}/{version}/, and becomes current when
+# manifest.json, which maps each ticker and kind to its current file, is
+# atomically replaced. Readers resolve paths through the manifest without
+# locking: a path they resolved stays valid while the writer publishes the
+# next version. Only publishers take a lock, to serialize manifest updates.
+# Frames written by one `publishing()` block (processed frame and feature
+# file) become visible together. Tickers not in the manifest are read from
+# the flat {ticker}_{kind} files, so existing data keeps working.
+
+_local = threading.local()
+_manifest_cache = (None, {"tickers": {}})
+
+def manifest_path():
+    return os.path.join(DATA_DIR, MANIFEST_FILE)
+
+def version_dir(ticker, version):
+    return os.path.join(DATA_DIR, VERSIONS_DIR, ticker, str(version))
+
+def read_manifest():
+    """
+    The published manifest ({"tickers": {ticker: {kind: relative path}}}),
+    re-parsed only when the file is replaced. Treat the result as read-only.
+    """
+    global _manifest_cache
+    path = manifest_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {"tickers": {}}
+    key = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    cached_key, manifest = _manifest_cache
+    if cached_key != key:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        _manifest_cache = (key, manifest)
+    return manifest
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = {}
+    return _local.pending
+
+def current_path(ticker, kind, filename):
+    """
+    Path of the current version of a ticker's file: staged by an open
+    `publishing()` block of this thread, listed in the manifest, or the flat
+    DATA_DIR/filename. A manifest entry stored under another filename (the
+    storage format changed since) is ignored.
+    """
+    pending = _pending().get(ticker)
+    if pending is not None and kind in pending[1]:
+        return os.path.join(DATA_DIR, pending[1][kind])
+    relative = read_manifest()['tickers'].get(ticker, {}).get(kind)
+    if relative is not None and os.path.basename(relative) == filename:
+        return os.path.join(DATA_DIR, relative)
+    return os.path.join(DATA_DIR, filename)
+
+def path_version(path):
+    """
+    Cache/ETag key of a stored file: (version, 0) for versioned files, read
+    from the path without touching the file, else (mtime_ns, size). Raises
+    FileNotFoundError if an unversioned file is missing. Versions are
+    nanosecond timestamps, so both kinds compare by age.
+    """
+    parent = os.path.dirname(path)
+    if os.path.basename(os.path.dirname(os.path.dirname(parent))) == VERSIONS_DIR:
+        return int(os.path.basename(parent)), 0
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def output_path(ticker, kind, filename, config=None):
+    """
+    Where to write a new version of a ticker's file. With versions enabled
+    it must be called inside `publishing(ticker)`, which publishes it;
+    otherwise the flat path is returned and the caller replaces it
+    atomically.
+    """
+    pending = _pending().get(ticker)
+    if pending is None:
+        if versions_enabled(config):
+            raise RuntimeError(f"{ticker} {kind} written outside of publishing()")
+        return os.path.join(DATA_DIR, filename)
+    version, staged = pending
+    directory = version_dir(ticker, version)
+    os.makedirs(directory, exist_ok=True)
+    staged[kind] = os.path.relpath(os.path.join(directory, filename), DATA_DIR)
+    return os.path.join(DATA_DIR, staged[kind])
+
+def _new_version(ticker):
+    # Nanosecond timestamps keep versions ordered by write time; bump on
+    # the (unlikely) collision with an existing directory.
+    version = time.time_ns()
+    while os.path.exists(version_dir(ticker, version)):
+        version += 1
+    return version
+
+@contextlib.contextmanager
+def publishing(ticker, config=None):
+    """
+    Groups a ticker's writes into one version, published when the block
+    exits and discarded if it raises. Nested blocks for the same ticker
+    join the outer one. A no-op when versions are disabled.
+    """
+    pending = _pending()
+    if ticker in pending or not versions_enabled(config):
+        yield
+        return
+    version = pending[ticker] = (_new_version(ticker), {})
+    try:
+        yield
+        if version[1]:
+            publish(ticker, version[1], config)
+    except BaseException:
+        shutil.rmtree(version_dir(ticker, version[0]), ignore_errors=True)
+        raise
+    finally:
+        del pending[ticker]
+
+@contextlib.contextmanager
+def _manifest_lock():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(os.path.join(DATA_DIR, f"{MANIFEST_FILE}.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def publish(ticker, files, config=None):
+    """
+    Points the manifest entries of ticker at `files` ({kind: path relative
+    to DATA_DIR}) with a single atomic rename, then removes old versions.
+    """
+    keep = (config or load_config())['pipeline'].get('storage', {}).get('keep_versions', 2)
+    with _manifest_lock():
+        path = manifest_path()
+        try:
+            with open(path, "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {"tickers": {}}
+        entry = manifest['tickers'].setdefault(ticker, {})
+        entry.update(files)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+        collect(ticker, entry, keep)
+
+def collect(ticker, entry, keep=2):
+    """
+    Deletes versions of ticker that the manifest entry does not reference,
+    except the `keep` newest versions of each kind (raw, processed,
+    features). Keeping each kind's previous version lets readers that
+    resolved it before the last publish finish their reads, however often
+    the other kinds were published since. Versions newer than the newest
+    referenced one are still being written and are left alone.
+    """
+    root = os.path.join(DATA_DIR, VERSIONS_DIR, ticker)
+    if not os.path.isdir(root):
+        return []
+    referenced = {os.path.basename(os.path.dirname(p)) for p in entry.values()}
+    newest = max((int(v) for v in referenced), default=0)
+    versions = sorted((v for v in os.listdir(root) if v.isdigit()), key=int)
+    holders = {}
+    for version in versions:
+        for name in os.listdir(os.path.join(root, version)):
+            kind = name[len(ticker) + 1:].split('.')[0]
+            holders.setdefault(kind, []).append(version)
+    kept = set(referenced)
+    for held in holders.values():
+        kept.update(held[-keep:])
+    stale = [v for v in versions if v not in kept and int(v) < newest]
+    for version in stale:
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+    return stale
+
+def valid_ticker(ticker):
+    return isinstance(ticker, str) and TICKER_PATTERN.fullmatch(ticker) is not None
+
+def frame_filename(ticker, kind, fmt, compression):
+    return f"{ticker}_{kind}{BACKENDS[fmt].suffix(compression)}"
+
+def frame_path(ticker, kind, fmt=None, compression=None, config=None):
+    """
+    Path of the current `{ticker}_{kind}` frame (kind is 'raw' or 'processed').
+    """
+    if fmt is None:
+        fmt, compression = storage_settings(config)
+    return current_path(ticker, kind, frame_filename(ticker, kind, fmt, compression))
+
+def exists(ticker, kind, config=None):
+    return os.path.exists(frame_path(ticker, kind, config=config))
+
+def write_frame(df, ticker, kind, config=None):
+    """
+    Writes df in the configured format, replacing the file atomically (or
+    publishing it as a new version).
+    """
+    fmt, compression = storage_settings(config)
+    with publishing(ticker, config):
+        path = output_path(ticker, kind, frame_filename(ticker, kind, fmt, compression), config)
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with metrics.stage(f'write_{kind}') as timer:
+            _replace(BACKENDS[fmt], df, path, compression)
+            timer.rows, timer.bytes = len(df), os.path.getsize(path)
+    return path
+
+def append_frame(df, ticker, kind, config=None):
+    fmt, compression = storage_settings(config)
+    with publishing(ticker, config):
+        current = frame_path(ticker, kind, fmt, compression)
+        path = output_path(ticker, kind, frame_filename(ticker, kind, fmt, compression), config)
+        before = os.path.getsize(current) if os.path.exists(current) else 0
+        with metrics.stage(f'append_{kind}') as timer:
+            if path != current and os.path.exists(current):
+                # Versions are immutable: append to a byte copy of the current one.
+                shutil.copyfile(current, path)
+            BACKENDS[fmt].append(df, path, compression)
+            timer.rows, timer.bytes = len(df), os.path.getsize(path) - before
+    return path
+
+def read_frame(ticker, kind, columns=None, rows=None, config=None):
+    """
+    Reads a stored frame indexed by timestamp.
+
+    `columns` projects to a subset of columns and `rows` is a slice such as
+    `slice(-1, None)`; backends avoid parsing anything outside of them.
+    """
+    fmt, compression = storage_settings(config)
+    with metrics.stage(f'read_{kind}') as timer:
+        while True:
+            path = frame_path(ticker, kind, fmt, compression)
+            try:
+                df = BACKENDS[fmt].read(path, columns, rows)
+                # Whole-file reads parse every byte; partial ones are counted in rows only.
+                timer.rows, timer.bytes = len(df), os.path.getsize(path) if rows is None else 0
+                return df
+            except FileNotFoundError:
+                # The version resolved above was collected mid-read, after
+                # newer ones were published; read the current one instead.
+                if frame_path(ticker, kind, fmt, compression) == path:
+                    raise
+
+def iter_frame(ticker, kind, columns=None, chunk_rows=None, config=None):
+    """
+    Yields a stored frame in chunks of at most chunk_rows rows (default
+    ROW_GROUP_SIZE), so memory use does not depend on the length of the file.
+    """
+    fmt, compression = storage_settings(config)
+    path = frame_path(ticker, kind, fmt, compression)
+    yield from BACKENDS[fmt].iter_read(path, columns, chunk_rows or ROW_GROUP_SIZE)
+
+def latest_path(ticker):
+    return os.path.join(DATA_DIR, f"{ticker}_latest.json")
+
+def latest_record(df):
+    """
+    The last row of df as a JSON-ready dict, including its timestamp under
+    the index name (e.g. 'Datetime').
+    """
+    row = df.iloc[-1:].reset_index().to_dict(orient='records')[0]
+    return {k: v.isoformat() if isinstance(v, pd.Timestamp) else v for k, v in row.items()}
+
+def write_latest(ticker, df):
+    """
+    Atomically replaces the compact latest-bar record for ticker and
+    returns it.
+    """
+    record = latest_record(df)
+    path = latest_path(ticker)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path)
+    return record
+
+def read_latest(ticker):
+    """
+    Returns the latest-bar record, or None if the pipeline has not written one.
+    """
+    try:
+        with open(latest_path(ticker), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def list_tickers(kind='processed', config=None):
+    if not os.path.exists(DATA_DIR):
+        return []
+    fmt, compression = storage_settings(config)
+    suffix = f"_{kind}{BACKENDS[fmt].suffix(compression)}"
+    tickers = {f[:-len(suffix)] for f in os.listdir(DATA_DIR) if f.endswith(suffix)}
+    tickers.update(ticker for ticker, entry in read_manifest()['tickers'].items()
+                   if entry.get(kind, '').endswith(suffix))
+    return sorted(tickers)
+
+def _detect(filename):
+    for fmt, backend in BACKENDS.items():
+        for compression in [None, *CSV_SUFFIXES]:
+            for kind in ('raw', 'processed'):
+                suffix = f"_{kind}{backend.suffix(compression)}"
+                if filename.endswith(suffix):
+                    return filename[:-len(suffix)], kind, fmt, compression
+    return None
+
+def migrate(fmt, compression=None, keep_source=False):
+    """
+    Converts every stored frame in DATA_DIR, flat or versioned, to the
+    given format.
+    """
+    target = BACKENDS[fmt]
+    converted = 0
+    for filename in sorted(os.listdir(DATA_DIR)):
+        detected = _detect(filename)
+        if detected is None or detected[2:] == (fmt, compression):
+            continue
+        ticker, kind, src_fmt, _ = detected
+        src_path = os.path.join(DATA_DIR, filename)
+        dst_path = frame_path(ticker, kind, fmt, compression)
+
+        df = BACKENDS[src_fmt].read(src_path)
+        _replace(target, df, dst_path, compression)
+        if len(target.read(dst_path)) != len(df):
+            raise RuntimeError(f"Row count mismatch after converting {filename}")
+        if not keep_source:
+            os.remove(src_path)
+        converted += 1
+        print(f"Converted {filename} -> {os.path.basename(dst_path)}")
+
+    # Versioned frames are converted into a new version of the ticker.
+    for ticker, entry in sorted(read_manifest()['tickers'].items()):
+        for kind, relative in sorted(entry.items()):
+            detected = _detect(os.path.basename(relative))
+            if detected is None or detected[2:] == (fmt, compression):
+                continue
+            df = BACKENDS[detected[2]].read(os.path.join(DATA_DIR, relative))
+            with publishing(ticker):
+                dst_path = output_path(ticker, kind, frame_filename(ticker, kind, fmt, compression))
+                _replace(target, df, dst_path, compression)
+                if len(target.read(dst_path)) != len(df):
+                    raise RuntimeError(f"Row count mismatch after converting {relative}")
+            converted += 1
+            print(f"Converted {relative} -> {os.path.relpath(dst_path, DATA_DIR)}")
+    print(f"Migrated {converted} files to {fmt}.")
+    return converted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored frames to another storage format.")
+    parser.add_argument("--format", choices=sorted(BACKENDS), help="Defaults to pipeline.storage.format")
+    parser.add_argument("--compression", help="Defaults to pipeline.storage.compression")
+    parser.add_argument("--keep-source", action="store_true", help="Keep the original files")
+    args = parser.parse_args()
+
+    fmt, compression = storage_settings()
+    if args.format:
+        fmt, compression = args.format, args.compression
+    migrate(fmt, compression, args.keep_source)
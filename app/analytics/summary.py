@@ -0,0 +1,90 @@
+import json
+import os
+
+import pandas as pd
+
+from app.analytics import storage
+
+SUMMARY_FILE = 'market_summary.json'
+
+def summary_path():
+    return os.path.join(storage.DATA_DIR, SUMMARY_FILE)
+
+def _value(row, column):
+    value = row.get(column)
+    return None if value is None or pd.isna(value) else value
+
+def summarize(ticker, config=None):
+    """
+    Summary entry for one ticker, built from the last two processed bars.
+    Returns None if the ticker has no processed bars.
+    """
+    df = storage.read_frame(ticker, 'processed', rows=slice(-2, None), config=config)
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    prev_close = df['Close'].iloc[-2] if len(df) > 1 else None
+    change = None if prev_close is None else last['Close'] - prev_close
+    return {
+        "ticker": ticker,
+        "date": df.index[-1].isoformat(),
+        "last_close": float(last['Close']),
+        "last_rsi": _value(last, 'RSI'),
+        "last_volatility": _value(last, 'Volatility'),
+        "signal_label": last.get('Signal_Label', 'NEUTRAL'),
+        "signal_score": _value(last, 'Signal_Score'),
+        "prev_close": None if prev_close is None else float(prev_close),
+        "change": None if change is None else float(change),
+        "change_pct": None if change is None or not prev_close else float(change / prev_close * 100),
+    }
+
+def build_summary(tickers=None, config=None):
+    """
+    Summary entries for tickers (default: every ticker with processed data).
+    """
+    if tickers is None:
+        tickers = storage.list_tickers('processed', config)
+    entries = []
+    for ticker in tickers:
+        try:
+            entry = summarize(ticker, config)
+        except FileNotFoundError:
+            continue
+        if entry is not None:
+            entries.append(entry)
+    return entries
+
+def write_summary(tickers=None, config=None):
+    """
+    Builds the market summary and atomically replaces the snapshot file.
+    """
+    snapshot = {
+        "generated_at": pd.Timestamp.now(tz='UTC').isoformat(),
+        "summary": build_summary(tickers, config),
+    }
+    path = summary_path()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+    return snapshot
+
+def read_summary():
+    """
+    Returns the last written snapshot, or None if the pipeline has not run.
+    """
+    try:
+        with open(summary_path(), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def load_summary():
+    """
+    The last snapshot, or one built from the processed files if the
+    pipeline has not written one yet.
+    """
+    snapshot = read_summary()
+    if snapshot is None:
+        return {"summary": build_summary(), "generated_at": None}
+    return snapshot
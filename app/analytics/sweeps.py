@@ -0,0 +1,180 @@
+"""
+Indicator sweeps: one family of rolling indicators over many windows in a
+single pass, as (bars x windows) DataFrames indexed like the input.
+
+Rolling means and standard deviations come from prefix sums, so every window
+costs O(bars) whatever its length. Rows are processed in chunks of
+`chunk_rows` plus the longest window's warm-up, which bounds the working
+memory beyond the output and keeps the running sums small enough to stay
+within float rounding of the pandas results `calculate_features` produces.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from app.analytics import storage
+
+CHUNK_ROWS = 4096
+
+def _chunks(n, chunk_rows, overlap):
+    """
+    (base, lo, hi) per chunk: rows lo:hi are produced from values base:hi.
+    """
+    for lo in range(0, n, chunk_rows):
+        yield max(0, lo - overlap), lo, min(n, lo + chunk_rows)
+
+def rolling_moments(values, windows, chunk_rows=None, std=True):
+    """
+    Rolling means (and sample standard deviations, ddof=1) of a 1-D array
+    for each window, as (bars x windows) arrays. Like pandas, a window with
+    any NaN in it (or fewer than `window` bars) gives NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    windows = np.asarray(windows, dtype=np.int64)
+    if len(windows) and windows.min() < 1:
+        raise ValueError("windows must be positive")
+    chunk_rows = chunk_rows or CHUNK_ROWS
+    n = len(values)
+    # Column-major, so each window's column is written contiguously.
+    means = np.full((n, len(windows)), np.nan, order='F')
+    stds = np.full((n, len(windows)), np.nan, order='F') if std else None
+    if not len(windows):
+        return means, stds
+
+    for base, lo, hi in _chunks(n, chunk_rows, int(windows.max()) - 1):
+        segment = values[base:hi]
+        missing = np.isnan(segment)
+        # Sums run around the chunk's mean and restart every chunk; the
+        # rounding error of a window's sum of squares grows with both.
+        ref = np.nanmean(segment) if not missing.all() else 0.0
+        centered = np.where(missing, 0.0, segment - ref)
+        s1 = np.concatenate([[0.0], np.cumsum(centered)])
+        s2 = np.concatenate([[0.0], np.cumsum(centered * centered)]) if std else None
+        nans = np.concatenate([[0], np.cumsum(missing)]) if missing.any() else None
+
+        for j, w in enumerate(windows):
+            first = max(lo, w - 1)
+            if first >= hi:
+                continue
+            # Prefix positions one past each row and one before its window.
+            e = slice(first - base + 1, hi - base + 1)
+            b = slice(first - base + 1 - w, hi - base + 1 - w)
+            total = s1[e] - s1[b]
+            means[first:hi, j] = total / w + ref
+            if std and w > 1:
+                var = (s2[e] - s2[b] - total * total / w) / (w - 1)
+                stds[first:hi, j] = np.sqrt(np.maximum(var, 0.0))
+            if nans is not None:
+                gap = nans[e] != nans[b]
+                means[first:hi, j][gap] = np.nan
+                if std:
+                    stds[first:hi, j][gap] = np.nan
+    return means, stds
+
+def _frame(matrix, index, columns, names=None):
+    columns = pd.MultiIndex.from_tuples(columns, names=names) if names and len(names) > 1 else \
+        pd.Index(columns, name=names[0] if names else None)
+    return pd.DataFrame(matrix, index=index, columns=columns)
+
+def sma(close, windows, chunk_rows=None):
+    """
+    SMA_{w} for every window: a (bars x windows) DataFrame.
+    """
+    means, _ = rolling_moments(close.to_numpy(dtype=np.float64), windows, chunk_rows, std=False)
+    return _frame(means, close.index, list(windows), ['window'])
+
+def rolling_std(close, windows, chunk_rows=None):
+    """
+    Rolling sample standard deviation (BB_Std, Volatility) for every window.
+    """
+    _, stds = rolling_moments(close.to_numpy(dtype=np.float64), windows, chunk_rows)
+    return _frame(stds, close.index, list(windows), ['window'])
+
+def rsi(close, windows, chunk_rows=None):
+    """
+    RSI for every window, with the same simple-average gains and losses as
+    the indicator graph (the first bar's change counts as zero).
+    """
+    delta = np.diff(close.to_numpy(dtype=np.float64), prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gains, _ = rolling_moments(gain, windows, chunk_rows, std=False)
+    losses, _ = rolling_moments(loss, windows, chunk_rows, std=False)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - (100 / (1 + gains / losses))
+    return _frame(values, close.index, list(windows), ['window'])
+
+def bollinger(close, windows, std_devs, chunk_rows=None):
+    """
+    Bollinger bands for every (window, std_dev) pair. Returns a dict of
+    BB_Middle and BB_Std (columns: window) and BB_Upper and BB_Lower
+    (columns: window, std_dev). Moments are shared across std_devs.
+    """
+    means, stds = rolling_moments(close.to_numpy(dtype=np.float64), windows, chunk_rows)
+    pairs = list(itertools.product(range(len(windows)), std_devs))
+    columns = [j for j, _ in pairs]
+    width = stds[:, columns] * np.array([k for _, k in pairs], dtype=np.float64)
+    labels = [(windows[j], k) for j, k in pairs]
+    return {
+        'BB_Middle': _frame(means, close.index, list(windows), ['window']),
+        'BB_Std': _frame(stds, close.index, list(windows), ['window']),
+        'BB_Upper': _frame(means[:, columns] + width, close.index, labels, ['window', 'std_dev']),
+        'BB_Lower': _frame(means[:, columns] - width, close.index, labels, ['window', 'std_dev']),
+    }
+
+def ewm_means(frame, span, chunk_rows=None):
+    """
+    adjust=False EWM of every column of a DataFrame, in row chunks. Each
+    chunk is seeded with the previous chunk's last row, which continues the
+    recursion exactly (as incremental updates do in `IndicatorGraph`).
+    """
+    chunk_rows = chunk_rows or CHUNK_ROWS
+    out = np.empty(frame.shape)
+    values = frame.to_numpy(dtype=np.float64)
+    for _, lo, hi in _chunks(len(frame), chunk_rows, 0):
+        block = values[lo:hi]
+        if lo:
+            block = np.vstack([out[lo - 1], block])
+        result = pd.DataFrame(block).ewm(span=span, adjust=False).mean().to_numpy()
+        out[lo:hi] = result[1:] if lo else result
+    return pd.DataFrame(out, index=frame.index, columns=frame.columns)
+
+def macd(close, fasts, slows, signals, chunk_rows=None):
+    """
+    MACD for every (fast, slow) pair with fast < slow and MACD_Signal for
+    every (fast, slow, signal). Each distinct span's EWM is computed once;
+    each signal span is one EWM pass over all MACD columns.
+    """
+    frame = close.to_frame()
+    ewms = {span: ewm_means(frame, span, chunk_rows).iloc[:, 0] for span in sorted(set(fasts) | set(slows))}
+    pairs = [(f, s) for f, s in itertools.product(fasts, slows) if f < s]
+    line = pd.DataFrame({pair: ewms[pair[0]] - ewms[pair[1]] for pair in pairs}, index=close.index)
+    line.columns = pd.MultiIndex.from_tuples(pairs, names=['fast', 'slow'])
+    signal = pd.concat({span: ewm_means(line, span, chunk_rows) for span in signals}, axis=1)
+    signal.columns = pd.MultiIndex.from_tuples([(f, s, span) for span, f, s in signal.columns],
+                                               names=['fast', 'slow', 'signal'])
+    return {'MACD': line, 'MACD_Signal': signal}
+
+SWEEPS = {
+    'SMA': lambda close, spec, chunk_rows: {'SMA': sma(close, spec['windows'], chunk_rows)},
+    'RSI': lambda close, spec, chunk_rows: {'RSI': rsi(close, spec['windows'], chunk_rows)},
+    'MACD': lambda close, spec, chunk_rows: macd(close, spec['fast'], spec['slow'], spec['signal'], chunk_rows),
+    'BollingerBands': lambda close, spec, chunk_rows: bollinger(close, spec['windows'], spec['std_dev'], chunk_rows),
+    'Volatility': lambda close, spec, chunk_rows: {'Volatility': rolling_std(close, spec['windows'], chunk_rows)},
+}
+
+def sweep_features(df, grid=None, chunk_rows=None, config=None):
+    """
+    Computes every indicator family in `grid` (default
+    `pipeline.feature_sweep`) over df['Close']. Returns {column: DataFrame}
+    with one column per window or parameter combination.
+    """
+    if grid is None:
+        grid = (config or storage.load_config())['pipeline']['feature_sweep']
+    outputs = {}
+    for name, spec in grid.items():
+        if name not in SWEEPS:
+            raise ValueError(f"Unknown sweep indicator '{name}'")
+        outputs.update(SWEEPS[name](df['Close'], spec, chunk_rows))
+    return outputs
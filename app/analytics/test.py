@@ -0,0 +1,1081 @@
+import copy
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase
+
+from app.analytics import backtest, compact, events, featurestore, incremental, indicators, metrics, panel, report, storage, sweeps, views
+from app.analytics.cache import FrameCache
+from app.analytics.incremental import build_state
+from app.analytics.data_fetcher import fetch_batch
+from app.analytics.processor import calculate_features, load_config, process_file, update_features
+from app.analytics.providers import FakeProvider
+from app.analytics.runner import run_concurrent
+from app.analytics.scheduler import FakeClock, Scheduler
+from app.analytics.signals import apply_signals
+from app.analytics.simulate import simulate
+from app.analytics.summary import read_summary, write_summary
+from app.analytics.testing import legacy_signals, synthetic_ohlcv, synthetic_universe
+
+
+class SignalEngineTests(SimpleTestCase):
+    def test_vectorized_signals_match_row_wise_reference(self):
+        features = calculate_features(synthetic_ohlcv(5_000)).drop(columns=['Signal_Score', 'Signal_Label'])
+
+        expected = legacy_signals(features.copy())
+        actual = apply_signals(features.copy(), load_config()['pipeline']['signals'])
+
+        pd.testing.assert_series_equal(actual['Signal_Score'], expected['Signal_Score'], check_exact=True)
+        pd.testing.assert_series_equal(actual['Signal_Label'], expected['Signal_Label'], check_exact=True)
+
+
+class IndicatorGraphTests(SimpleTestCase):
+    def test_shared_rolling_windows_are_computed_once(self):
+        calls = []
+        rolling_mean = indicators.PRIMITIVES['rolling_mean']
+        rolling_std = indicators.PRIMITIVES['rolling_std']
+
+        def counted(name, fn):
+            return lambda s, window: calls.append((name, window)) or fn(s, window)
+
+        with mock.patch.dict(indicators.PRIMITIVES, {
+            'rolling_mean': counted('mean', rolling_mean),
+            'rolling_std': counted('std', rolling_std),
+        }):
+            df = calculate_features(synthetic_ohlcv(1_000))
+
+        self.assertEqual(calls.count(('mean', 20)), 1)
+        self.assertEqual(calls.count(('std', 20)), 1)
+        pd.testing.assert_series_equal(df['BB_Middle'], df['SMA_20'], check_names=False)
+        pd.testing.assert_series_equal(df['Volatility'], df['BB_Std'], check_names=False)
+
+
+class IncrementalFeatureTests(SimpleTestCase):
+    def test_incremental_updates_match_full_recompute(self):
+        config = load_config()
+        raw = synthetic_ohlcv(1_200)
+
+        ewm_state = {}
+        parts = [calculate_features(raw.iloc[:800], config, ewm_state=ewm_state)]
+        state = build_state(raw.iloc[:800], ewm_state, config)
+        for start, end in [(800, 801), (801, 950), (950, 1_200)]:
+            rows, state = update_features(raw.iloc[start:end], state, config)
+            parts.append(rows)
+
+        incremental = pd.concat(parts)
+        full = calculate_features(raw, config)
+
+        pd.testing.assert_index_equal(incremental.index, full.index)
+        pd.testing.assert_frame_equal(
+            incremental.drop(columns='Signal_Label'), full.drop(columns='Signal_Label'),
+            check_exact=False, rtol=1e-9, atol=1e-9, check_freq=False)
+        pd.testing.assert_series_equal(incremental['Signal_Label'], full['Signal_Label'], check_freq=False)
+
+
+
+class TempDataDirMixin:
+    def setUp(self):
+        data_dir = tempfile.mkdtemp()
+        for module in (storage, incremental):
+            patcher = mock.patch.object(module, 'DATA_DIR', data_dir)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class IncrementalProcessTests(TempDataDirMixin, SimpleTestCase):
+    def test_refresh_reads_only_the_raw_tail(self):
+        raw = synthetic_ohlcv(2_000)
+        storage.write_frame(raw.iloc[:1_500], 'AAA', 'raw')
+        with mock.patch('builtins.print'):
+            process_file('AAA')
+
+        for end in (1_501, 1_700, 2_000):
+            storage.write_frame(raw.iloc[:end], 'AAA', 'raw')
+            with mock.patch.object(storage, 'read_frame', wraps=storage.read_frame) as reads, \
+                    mock.patch('builtins.print'):
+                self.assertTrue(process_file('AAA', incremental=True))
+            raw_reads = [c for c in reads.call_args_list if c.args[1] == 'raw']
+            self.assertTrue(raw_reads)
+            self.assertTrue(all(c.kwargs['rows'].start < 0 for c in raw_reads))
+
+        pd.testing.assert_frame_equal(storage.read_frame('AAA', 'processed'), calculate_features(raw),
+                                      check_exact=False, rtol=1e-9, check_freq=False)
+
+
+class StorageBackendTests(TempDataDirMixin, SimpleTestCase):
+    def reference(self, df):
+        path = os.path.join(storage.DATA_DIR, 'reference.csv')
+        df.to_csv(path)
+        return pd.read_csv(path, index_col=0, parse_dates=True)
+
+    def assert_same(self, actual, expected):
+        pd.testing.assert_frame_equal(actual, expected, check_freq=False, check_index_type=False)
+        self.assertTrue(actual.index.equals(expected.index))
+
+    def test_backends_round_trip_slice_project_and_append(self):
+        # Over 64 KiB, so CSV tail reads scan back across several blocks.
+        df = synthetic_ohlcv(3_000)
+        expected = self.reference(df)
+        for fmt, compression in [('csv', None), ('csv', 'gzip'), ('parquet', 'zstd'), ('feather', None)]:
+            with self.subTest(fmt=fmt, compression=compression):
+                backend = storage.BACKENDS[fmt]
+                path = os.path.join(storage.DATA_DIR, f"AAA{backend.suffix(compression)}")
+                backend.write(df.iloc[:2_000], path, compression)
+                self.assert_same(backend.read(path), expected.iloc[:2_000])
+
+                for rows in [slice(-1, None), slice(-1_500, None), slice(-5_000, None), slice(10, 20),
+                             slice(1_990, 2_500), slice(2_500, None)]:
+                    self.assert_same(backend.read(path, rows=rows), expected.iloc[:2_000].iloc[rows])
+                self.assert_same(backend.read(path, ['Close', 'Volume'], slice(-3, None)),
+                                 expected.iloc[1_997:2_000][['Close', 'Volume']])
+
+                backend.append(df.iloc[2_000:], path, compression)
+                self.assert_same(backend.read(path), expected)
+                self.assert_same(pd.concat(backend.iter_read(path, ['Open'], 700)), expected[['Open']])
+
+    def test_csv_tail_without_trailing_newline(self):
+        df = synthetic_ohlcv(50)
+        path = os.path.join(storage.DATA_DIR, 'AAA.csv')
+        with open(path, 'w') as f:
+            f.write(df.to_csv().rstrip('\n'))
+        expected = self.reference(df)
+        for n in (1, 2, 49, 50, 80):
+            self.assert_same(storage.CsvBackend().read(path, rows=slice(-n, None)), expected.iloc[-n:])
+
+    def test_migrate_converts_flat_and_versioned_frames(self):
+        df = synthetic_ohlcv(500)
+        expected = self.reference(df)
+        storage.BACKENDS['csv'].write(df, os.path.join(storage.DATA_DIR, 'AAA_raw.csv'), None)
+        storage.write_frame(df, 'BBB', 'processed')
+
+        with mock.patch('builtins.print'):
+            self.assertEqual(storage.migrate('parquet'), 2)
+        self.assertFalse(os.path.exists(os.path.join(storage.DATA_DIR, 'AAA_raw.csv')))
+        self.assert_same(storage.ParquetBackend().read(storage.frame_path('AAA', 'raw', 'parquet')), expected)
+        self.assert_same(storage.ParquetBackend().read(storage.frame_path('BBB', 'processed', 'parquet')), expected)
+
+        with mock.patch('builtins.print'):
+            self.assertEqual(storage.migrate('csv', 'gzip'), 2)
+        for ticker, kind in [('AAA', 'raw'), ('BBB', 'processed')]:
+            path = storage.frame_path(ticker, kind, 'csv', 'gzip')
+            self.assertTrue(path.endswith('.csv.gz'))
+            self.assert_same(storage.CsvBackend().read(path), expected)
+
+class ConcurrentRunnerTests(TempDataDirMixin, SimpleTestCase):
+    def test_runs_offline_with_stubbed_source(self):
+        def fake_fetch(ticker):
+            time.sleep(0.2)
+            if ticker == 'MISSING':
+                return None
+            if ticker == 'BROKEN':
+                raise ConnectionError("provider down")
+            df = synthetic_ohlcv(400, seed=len(ticker))
+            storage.write_frame(df, ticker, 'raw')
+            return df
+
+        tickers = ['AAA', 'MISSING', 'BB', 'BROKEN', 'CCCC']
+        results = run_concurrent(tickers, fetch=fake_fetch, process=process_file,
+                                 fetch_workers=5, process_workers=0)
+
+        self.assertEqual(results['success'], ['AAA', 'BB', 'CCCC'])
+        self.assertEqual(results['failed'], ['MISSING', 'BROKEN'])
+        self.assertEqual(storage.list_tickers('processed'), ['AAA', 'BB', 'CCCC'])
+        # The five 0.2s downloads overlap instead of adding up.
+        self.assertLess(results['timings']['_wall'], 0.8)
+
+
+    def test_processes_in_spawned_worker_processes(self):
+        def fetch(ticker):
+            if ticker == 'MISSING':
+                return None
+            df = synthetic_ohlcv(400 if ticker != 'SHORT' else 20, seed=len(ticker))
+            storage.write_frame(df, ticker, 'raw')
+            return df
+
+        results = run_concurrent(['AAA', 'MISSING', 'SHORT', 'BBBB'], fetch=fetch, process=process_file,
+                                 fetch_workers=2, process_workers=1)
+
+        self.assertEqual(results['success'], ['AAA', 'BBBB'])
+        self.assertEqual(results['failed'], ['MISSING', 'SHORT'])
+        # The worker wrote into this test's data directory.
+        self.assertEqual(storage.list_tickers('processed'), ['AAA', 'BBBB'])
+        self.assertEqual(results['stats']['AAA']['stages']['write_processed']['rows'],
+                         len(storage.read_frame('AAA', 'processed')))
+
+class BatchedFetchTests(TempDataDirMixin, SimpleTestCase):
+    def test_batches_round_trips_and_isolates_failures(self):
+        provider = FakeProvider(now=pd.Timestamp('2026-01-05', tz='UTC'), missing={'T7'})
+        tickers = [f'T{i}' for i in range(45)]
+
+        results = fetch_batch(tickers, period='1mo', interval='1h', provider=provider, batch_size=20)
+
+        self.assertEqual(provider.calls, 3)
+        self.assertIsNone(results['T7'])
+        self.assertEqual(sum(df is not None for df in results.values()), 44)
+        self.assertEqual(len(storage.list_tickers('raw')), 44)
+        stored = storage.read_frame('T3', 'raw')
+        self.assertEqual(list(stored.columns), ['Close', 'High', 'Low', 'Open', 'Volume'])
+        self.assertEqual(len(stored), len(results['T3']))
+
+
+class DeltaFetchTests(TempDataDirMixin, SimpleTestCase):
+    def fetch(self, provider):
+        return fetch_batch(['AAA', 'BBB'], period='1mo', interval='1h', provider=provider, delta=True)
+
+    def test_refresh_downloads_only_new_bars_and_picks_up_revisions(self):
+        provider = FakeProvider(now=pd.Timestamp('2026-01-05 12:00', tz='UTC'))
+        self.fetch(provider)
+        initial = storage.read_frame('AAA', 'raw')
+
+        provider.now += pd.Timedelta(hours=5)
+        provider.bars_served = 0
+        provider.revisions['AAA'] = {initial.index[-1]: 1.01}
+        results = self.fetch(provider)
+
+        # Three overlap bars, five new ones and the bar in progress per
+        # ticker, in one round trip; the bar in progress is not stored.
+        self.assertEqual(provider.bars_served, 2 * 9)
+        self.assertEqual(len(results['AAA']), 5)
+        expected = FakeProvider(now=provider.now)
+        expected.revisions = provider.revisions
+        expected = expected.download(['AAA'], start=initial.index[0], interval='1h')['AAA'].iloc[:-1]
+        pd.testing.assert_frame_equal(storage.read_frame('AAA', 'raw'), expected,
+                                      check_exact=False, rtol=1e-12, check_freq=False)
+        self.assertEqual(len(storage.read_frame('BBB', 'raw')), len(initial) + 5)
+
+    def test_bar_in_progress_changes_until_it_closes_and_is_not_stored(self):
+        provider = FakeProvider(now=pd.Timestamp('2026-01-05 12:20', tz='UTC'))
+        early = provider.download(['AAA'], period='1mo', interval='1h')['AAA']
+        provider.now += pd.Timedelta(minutes=20)
+        late = provider.download(['AAA'], period='1mo', interval='1h')['AAA']
+        provider.now += pd.Timedelta(minutes=20)
+        closed = provider.download(['AAA'], period='1mo', interval='1h')['AAA']
+
+        bar = pd.Timestamp('2026-01-05 12:00', tz='UTC')
+        pd.testing.assert_frame_equal(early.iloc[:-1], late.iloc[:-1])
+        self.assertNotEqual(early.at[bar, 'Close'], late.at[bar, 'Close'])
+        self.assertLess(early.at[bar, 'Volume'], late.at[bar, 'Volume'])
+        self.assertLess(late.at[bar, 'Volume'], closed.at[bar, 'Volume'])
+
+        provider.now = pd.Timestamp('2026-01-05 12:20', tz='UTC')
+        self.fetch(provider)
+        self.assertEqual(storage.read_frame('AAA', 'raw').index[-1], bar - pd.Timedelta(hours=1))
+
+    def test_stale_ticker_is_fetched_in_its_own_round_trip(self):
+        provider = FakeProvider(now=pd.Timestamp('2026-01-05 12:00', tz='UTC'))
+        self.fetch(provider)
+        stale = storage.read_frame('BBB', 'raw')
+        storage.write_frame(stale.iloc[:-48], 'BBB', 'raw')
+
+        provider.now += pd.Timedelta(hours=5)
+        provider.calls = provider.bars_served = 0
+        results = self.fetch(provider)
+
+        # AAA: 3 overlap + 5 new + 1 in progress; BBB catches up on its own.
+        self.assertEqual(provider.calls, 2)
+        self.assertEqual(provider.bars_served, 9 + 3 + 48 + 5 + 1)
+        self.assertEqual(len(results['AAA']), 5)
+        self.assertEqual(len(results['BBB']), 53)
+
+    def test_gap_longer_than_period_refetches_in_full(self):
+        provider = FakeProvider(now=pd.Timestamp('2026-01-05', tz='UTC'))
+        self.fetch(provider)
+
+        provider.now += pd.Timedelta(days=60)
+        provider.bars_served = 0
+        self.fetch(provider)
+
+        stored = storage.read_frame('AAA', 'raw')
+        self.assertEqual(provider.bars_served, 2 * (len(stored) + 1))
+        self.assertEqual(stored.index[0], provider.now - pd.DateOffset(months=1))
+
+
+class FrameCacheTests(TempDataDirMixin, SimpleTestCase):
+    def test_hits_invalidates_on_write_and_evicts_by_bytes(self):
+        for ticker in ('AAA', 'BBB'):
+            storage.write_frame(synthetic_ohlcv(1_000), ticker, 'processed')
+        cache = FrameCache(max_bytes=10**9)
+
+        first = cache.get('AAA')
+        self.assertIs(cache.get('AAA'), first)
+        storage.write_frame(synthetic_ohlcv(1_001), 'AAA', 'processed')
+        self.assertEqual(len(cache.get('AAA')), 1_001)
+
+        cache.max_bytes = cache.bytes + 1
+        cache.get('BBB')
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual((cache.hits, cache.misses, cache.invalidations), (1, 3, 1))
+
+    def test_concurrent_misses_share_one_load(self):
+        storage.write_frame(synthetic_ohlcv(1_000), 'AAA', 'processed')
+        cache = FrameCache(max_bytes=10**9)
+        read_frame = storage.read_frame
+
+        def slow_read(*args):
+            time.sleep(0.2)
+            return read_frame(*args)
+
+        with mock.patch.object(storage, 'read_frame', side_effect=slow_read) as loader:
+            threads = [threading.Thread(target=cache.get, args=('AAA',)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(cache.coalesced, 7)
+
+
+
+class CompactFrameTests(TempDataDirMixin, SimpleTestCase):
+    def test_compact_layout_matches_float64_within_tolerance(self):
+        df = calculate_features(synthetic_ohlcv(3_000))
+        packed = compact.compact(df)
+
+        self.assertNotIn('Close_Lag_1', packed.columns)
+        self.assertEqual(packed['Close'].dtype, 'float32')
+        self.assertEqual(packed['Signal_Label'].cat.codes.dtype, 'int8')
+        self.assertLess(compact.frame_bytes(packed), 0.45 * compact.frame_bytes(df))
+        self.assertEqual(compact.columns(packed), list(df.columns))
+
+        pd.testing.assert_frame_equal(compact.expand(packed), df, check_exact=False, rtol=1e-6, atol=0)
+        # Lags are rebuilt for any row range, including the first rows whose
+        # source bars were dropped with the warm-up.
+        lags = ['Close_Lag_3', 'Vol_Lag_1', 'Signal_Label']
+        for lo, hi in [(0, 2), (1, 10), (2_990, 3_100)]:
+            pd.testing.assert_frame_equal(compact.expand(packed, lo, hi, lags), df.iloc[lo:hi][lags],
+                                          check_exact=False, rtol=1e-6, atol=0)
+        self.assertEqual(compact.expand(packed, 0, 1)['Close'].iloc[0], round(df['Close'].iloc[0], 4))
+
+    def test_api_serves_compact_cache_like_the_plain_one(self):
+        storage.write_frame(calculate_features(synthetic_ohlcv(1_000)), 'AAA', 'processed')
+        params = {'columns': 'Close,Close_Lag_2,Signal_Label', 'limit': 50, 'orient': 'columns'}
+        plain = self.client.get('/api/v1/data/AAA/', params).json()
+
+        with mock.patch.object(views, 'frame_cache', FrameCache(max_bytes=10**9, compact=True)):
+            packed = self.client.get('/api/v1/data/AAA/', params).json()
+            chart = self.client.get('/api/v1/chart/AAA/', {'interval': '4h', 'columns': 'Close_Lag_1'}).json()
+            stats = self.client.get('/api/v1/cache/').json()
+
+        self.assertEqual(packed['next_cursor'], plain['next_cursor'])
+        self.assertEqual(packed['data']['Signal_Label'], plain['data']['Signal_Label'])
+        for column in ('Close', 'Close_Lag_2'):
+            self.assertTrue(np.allclose(packed['data'][column], plain['data'][column], rtol=1e-6, atol=0))
+        self.assertGreater(chart['count'], 0)
+        self.assertGreater(stats['ticker_bytes']['AAA'], 0)
+
+
+class FeatureStoreTests(TempDataDirMixin, SimpleTestCase):
+    def test_published_features_follow_processed_frames_and_swap_atomically(self):
+        raw = synthetic_ohlcv(600)
+        storage.write_frame(raw.iloc[:500], 'AAA', 'raw')
+        with mock.patch('builtins.print'):
+            process_file('AAA')
+        before = featurestore.MappedFrame(featurestore.feature_path('AAA'))
+        pd.testing.assert_frame_equal(before.rows(), storage.read_frame('AAA', 'processed'), check_freq=False)
+
+        storage.write_frame(raw, 'AAA', 'raw')
+        with mock.patch('builtins.print'):
+            process_file('AAA', incremental=True)
+        after = featurestore.MappedFrame(featurestore.feature_path('AAA'))
+        processed = storage.read_frame('AAA', 'processed')
+        self.assertEqual(len(after), len(before) + 100)
+        pd.testing.assert_frame_equal(after.rows(), processed, check_freq=False)
+        # A mapping opened before the swap keeps reading the old version.
+        pd.testing.assert_frame_equal(before.rows(), processed.iloc[:len(before)], check_freq=False)
+
+        lo = after.index.searchsorted(processed.index[10])
+        hi = after.index.searchsorted(processed.index[20], side='right')
+        pd.testing.assert_frame_equal(after.rows(lo, hi, ['Close', 'Signal_Label']),
+                                      processed.iloc[10:21][['Close', 'Signal_Label']], check_freq=False)
+
+    def test_write_follows_the_given_storage_config(self):
+        config = copy.deepcopy(load_config())
+        config['pipeline']['storage']['versions'] = False
+        df = synthetic_ohlcv(50)
+        path = featurestore.write('AAA', df, config)
+        self.assertEqual(path, os.path.join(storage.DATA_DIR, 'AAA_features.bin'))
+        self.assertEqual(storage.read_manifest()['tickers'], {})
+
+        config['pipeline']['storage']['versions'] = True
+        self.assertEqual(featurestore.write('AAA', df, config), featurestore.feature_path('AAA'))
+        self.assertIn('features', storage.read_manifest()['tickers']['AAA'])
+
+    def test_views_serve_mapped_features_without_parsing(self):
+        storage.write_frame(synthetic_ohlcv(400), 'AAA', 'raw')
+        with mock.patch('builtins.print'):
+            process_file('AAA')
+        processed = storage.read_frame('AAA', 'processed')
+        params = {'start': processed.index[5].isoformat(), 'columns': 'Close,Signal_Label', 'limit': 20}
+
+        with mock.patch.object(views.frame_cache, 'get') as loader:
+            page = self.client.get('/api/v1/data/AAA/', params)
+            chart = self.client.get('/api/v1/chart/AAA/', {'interval': '4h', 'max_points': 10})
+        loader.assert_not_called()
+        rows = page.json()['data']
+        self.assertEqual([r['Close'] for r in rows], processed['Close'].iloc[5:25].tolist())
+        self.assertEqual([r['Signal_Label'] for r in rows], processed['Signal_Label'].iloc[5:25].tolist())
+        self.assertEqual(page.json()['next_cursor'], processed.index[25].isoformat())
+        self.assertEqual(chart.json()['count'], 10)
+        self.assertEqual(page['ETag'], self.client.get('/api/v1/data/AAA/', params)['ETag'])
+
+        # A processed frame newer than the published file is served instead.
+        storage.write_frame(processed.iloc[:50], 'AAA', 'processed')
+        self.assertEqual(self.client.get('/api/v1/data/AAA/').json()['count'], 50)
+
+
+class VersionedStorageTests(TempDataDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(storage.load_config()['pipeline']['storage'], versions=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def versions(self, ticker):
+        return sorted(os.listdir(os.path.join(storage.DATA_DIR, storage.VERSIONS_DIR, ticker)))
+
+    def test_writes_publish_new_versions_and_keep_old_ones_readable(self):
+        df = synthetic_ohlcv(300)
+        storage.write_frame(df.iloc[:100], 'AAA', 'processed')
+        first = storage.frame_path('AAA', 'processed')
+        storage.append_frame(df.iloc[100:200], 'AAA', 'processed')
+        second = storage.frame_path('AAA', 'processed')
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(storage.read_frame('AAA', 'processed')), 200)
+        # A reader that resolved the previous version can still read it.
+        self.assertEqual(len(storage.CsvBackend().read(first)), 100)
+
+        # Writes staged by an open block are invisible to other threads.
+        seen = []
+        with storage.publishing('AAA'):
+            storage.write_frame(df, 'AAA', 'processed')
+            reader = threading.Thread(target=lambda: seen.append(storage.frame_path('AAA', 'processed')))
+            reader.start()
+            reader.join()
+        self.assertEqual(seen, [second])
+        third = storage.frame_path('AAA', 'processed')
+        self.assertEqual(len(storage.read_frame('AAA', 'processed')), 300)
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(len(self.versions('AAA')), 2)
+
+        # A failed block publishes nothing and leaves no files behind.
+        with self.assertRaises(RuntimeError):
+            with storage.publishing('AAA'):
+                storage.write_frame(df.iloc[:10], 'AAA', 'processed')
+                raise RuntimeError("interrupted")
+        self.assertEqual(storage.frame_path('AAA', 'processed'), third)
+        self.assertEqual(len(self.versions('AAA')), 2)
+        self.assertEqual(storage.list_tickers('processed'), ['AAA'])
+
+    def test_versions_default_to_off_for_incremental_refreshes(self):
+        config = copy.deepcopy(load_config())
+        config['pipeline']['storage']['versions'] = None
+        for live_mode in (True, False):
+            config['pipeline']['data']['live_mode'] = live_mode
+            self.assertEqual(storage.versions_enabled(config), not live_mode)
+
+    def test_previous_version_of_each_kind_survives_other_publishes(self):
+        df = synthetic_ohlcv(100)
+        storage.write_frame(df, 'AAA', 'processed')
+        previous = storage.frame_path('AAA', 'processed')
+        storage.write_frame(df, 'AAA', 'processed')
+        current = storage.frame_path('AAA', 'processed')
+        for _ in range(3):
+            storage.write_frame(df, 'AAA', 'raw')
+
+        self.assertTrue(os.path.exists(previous))
+        self.assertEqual(len(self.versions('AAA')), 4)
+        storage.write_frame(df, 'AAA', 'processed')
+        self.assertFalse(os.path.exists(previous))
+        self.assertTrue(os.path.exists(current))
+
+    def test_processed_and_features_share_a_version_used_as_etag(self):
+        raw = synthetic_ohlcv(400)
+        storage.write_frame(raw.iloc[:300], 'AAA', 'raw')
+        with mock.patch('builtins.print'):
+            process_file('AAA')
+        entry = storage.read_manifest()['tickers']['AAA']
+        version = os.path.dirname(entry['processed'])
+        self.assertEqual(os.path.dirname(entry['features']), version)
+
+        url = '/api/v1/data/AAA/'
+        first = self.client.get(url)
+        self.assertEqual(first['ETag'], f'"{int(os.path.basename(version)):x}-0"')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        storage.write_frame(raw, 'AAA', 'raw')
+        with mock.patch('builtins.print'):
+            process_file('AAA', incremental=True)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['count'], len(storage.read_frame('AAA', 'processed')))
+        self.assertEqual(changed.json()['count'], first.json()['count'] + 100)
+
+class MarketSummaryTests(TempDataDirMixin, SimpleTestCase):
+    def test_snapshot_reports_last_bar_and_change(self):
+        for ticker in ('AAA', 'BBB'):
+            storage.write_frame(synthetic_ohlcv(400), ticker, 'raw')
+            process_file(ticker)
+        processed = storage.read_frame('AAA', 'processed')
+
+        write_summary()
+        with mock.patch.object(storage, 'read_frame') as loader:
+            snapshot = read_summary()
+        loader.assert_not_called()
+
+        entry = snapshot['summary'][0]
+        self.assertEqual([e['ticker'] for e in snapshot['summary']], ['AAA', 'BBB'])
+        self.assertEqual(pd.Timestamp(entry['date']), processed.index[-1])
+        self.assertEqual(entry['last_volatility'], processed['Volatility'].iloc[-1])
+        self.assertEqual(entry['signal_label'], processed['Signal_Label'].iloc[-1])
+        self.assertAlmostEqual(entry['change'], processed['Close'].iloc[-1] - processed['Close'].iloc[-2])
+
+
+class ConditionalGetTests(TempDataDirMixin, SimpleTestCase):
+    url = '/api/v1/data/AAA/'
+
+    def test_unchanged_data_costs_no_frame_load(self):
+        storage.write_frame(synthetic_ohlcv(300), 'AAA', 'processed')
+        first = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+
+        with mock.patch.object(views.frame_cache, 'get') as loader, \
+                mock.patch.object(storage, 'read_frame') as reader:
+            by_etag = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            by_date = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual((by_etag.status_code, by_date.status_code), (304, 304))
+        loader.assert_not_called()
+        reader.assert_not_called()
+
+        storage.write_frame(synthetic_ohlcv(301), 'AAA', 'processed')
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['count'], 301)
+
+
+class HistoryQueryTests(TempDataDirMixin, SimpleTestCase):
+    url = '/api/v1/data/AAA/'
+
+    def test_range_projection_and_cursor_pages(self):
+        storage.write_frame(synthetic_ohlcv(1_000), 'AAA', 'processed')
+        df = storage.read_frame('AAA', 'processed')
+        start, end = df.index[100], df.index[349]
+
+        rows, cursor = [], None
+        while True:
+            params = {'start': start.isoformat(), 'end': end.isoformat(), 'columns': 'Close',
+                      'orient': 'columns', 'limit': 100}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get(self.url, params).json()
+            self.assertEqual(list(body['data']), ['Datetime', 'Close'])
+            rows += body['data']['Close']
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(rows, df['Close'].iloc[100:350].tolist())
+        self.assertEqual(self.client.get(self.url, {'columns': 'Nope'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'yesterday-ish'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'NaT'}).status_code, 400)
+
+        # Empty bounds are no bounds.
+        for params in ({'start': ''}, {'end': ''}, {'start': '', 'end': '', 'since': '', 'cursor': ''}):
+            self.assertEqual(self.client.get(self.url, params).json()['count'], len(df))
+        self.assertEqual(self.client.get('/api/v1/chart/AAA/', {'start': '', 'end': ''}).json()['count'], len(df))
+        export = self.client.get('/api/v1/export/AAA/', {'start': '', 'end': ''})
+        self.assertEqual(len(b''.join(export.streaming_content).splitlines()), len(df))
+
+
+class ChartResamplingTests(TempDataDirMixin, SimpleTestCase):
+    def test_resamples_ohlcv_and_decimates_to_budget(self):
+        storage.write_frame(synthetic_ohlcv(24 * 30), 'AAA', 'processed')
+        hourly = storage.read_frame('AAA', 'processed')
+        day = hourly.loc[hourly.index.normalize() == hourly.index[0].normalize()]
+
+        daily = self.client.get('/api/v1/chart/AAA/', {'interval': '1d'}).json()['data']
+        self.assertEqual(len(daily['Close']), 30)
+        self.assertEqual([daily[c][0] for c in ('Open', 'High', 'Low', 'Close', 'Volume')],
+                         [day['Open'].iloc[0], day['High'].max(), day['Low'].min(),
+                          day['Close'].iloc[-1], day['Volume'].sum()])
+
+        body = self.client.get('/api/v1/chart/AAA/', {'max_points': 100, 'columns': 'Close'}).json()
+        self.assertEqual(body['count'], 100)
+        self.assertEqual(list(body['data']), ['Datetime', 'Close'])
+        self.assertEqual(body['data']['Close'][0], hourly['Close'].iloc[0])
+        self.assertEqual(body['data']['Close'][-1], hourly['Close'].iloc[-1])
+        self.assertEqual(self.client.get('/api/v1/chart/AAA/', {'interval': '3m'}).status_code, 400)
+
+
+class StreamingExportTests(TempDataDirMixin, SimpleTestCase):
+    def export_peak(self, rows, **params):
+        storage.write_frame(synthetic_ohlcv(rows), 'AAA', 'processed')
+        tracemalloc.start()
+        try:
+            response = self.client.get('/api/v1/export/AAA/', params)
+            body = sum(len(chunk) for chunk in response.streaming_content)
+            return tracemalloc.get_traced_memory()[1], body
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_stays_bounded_as_history_grows(self):
+        with mock.patch.object(storage, 'ROW_GROUP_SIZE', 500):
+            for output in ('ndjson', 'arrow'):
+                self.export_peak(500, output=output)  # first-use allocations
+                small_peak, small_body = self.export_peak(2_000, output=output)
+                large_peak, large_body = self.export_peak(20_000, output=output)
+                self.assertGreater(large_body, 9 * small_body)
+                self.assertLess(large_peak, 3 * small_peak)
+
+    def test_ndjson_round_trips_selected_range(self):
+        storage.write_frame(synthetic_ohlcv(3_000), 'AAA', 'processed')
+        df = storage.read_frame('AAA', 'processed', columns=['Close'])
+        start, end = df.index[1_500], df.index[2_499]
+
+        with mock.patch.object(storage, 'ROW_GROUP_SIZE', 700):
+            response = self.client.get('/api/v1/export/AAA/', {
+                'columns': 'Close', 'start': start.isoformat(), 'end': end.isoformat()})
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        exported = [json.loads(line) for line in lines]
+        self.assertEqual(len(exported), 1_000)
+        # Full float64 precision, and the same records as the JSON endpoint.
+        self.assertEqual([row['Close'] for row in exported], df['Close'].iloc[1_500:2_500].tolist())
+        page = self.client.get('/api/v1/data/AAA/', {'columns': 'Close', 'start': start.isoformat(), 'limit': 5})
+        self.assertEqual(exported[:5], page.json()['data'])
+
+
+class BulkDataTests(TempDataDirMixin, SimpleTestCase):
+    def test_per_ticker_queries_in_one_response(self):
+        for ticker in ('AAA', 'BBB'):
+            storage.write_frame(synthetic_ohlcv(24 * 10), ticker, 'processed')
+        bbb = storage.read_frame('BBB', 'processed')
+
+        response = self.client.post('/api/v1/bulk/', {
+            'tickers': {
+                'AAA': {'interval': '1d', 'columns': ['Close']},
+                'BBB': {'start': bbb.index[-5].isoformat(), 'columns': 'Close,Volume'},
+                'CCC': {},
+                '../AAA': {},
+                'BBB/../../AAA': {},
+            },
+            'include': ['tickers'],
+        }, content_type='application/json').json()
+
+        self.assertEqual(response['tickers'], ['AAA', 'BBB'])
+        self.assertEqual(response['data']['AAA']['count'], 10)
+        self.assertEqual(response['data']['BBB']['data']['Close'], bbb['Close'].iloc[-5:].tolist())
+        self.assertEqual(list(response['data']['BBB']['data']), ['Datetime', 'Close', 'Volume'])
+        self.assertIn('error', response['data']['CCC'])
+        for ticker in ('../AAA', 'BBB/../../AAA'):
+            self.assertEqual(response['data'][ticker], {'error': f"Invalid ticker '{ticker}'."})
+        self.assertTrue(all(storage.valid_ticker(t) for t in ('AAPL', 'BTC-USD', 'BRK.B', '^GSPC', 'EURUSD=X')))
+
+
+class DeltaSyncTests(TempDataDirMixin, SimpleTestCase):
+    def test_since_returns_only_newer_rows_and_reopens_last_bin(self):
+        bars = synthetic_ohlcv(24 * 3 + 12)
+        storage.write_frame(bars.iloc[:-6], 'AAA', 'processed')
+        stored = storage.read_frame('AAA', 'processed')
+        last = stored.index[-1].isoformat()
+
+        self.assertEqual(self.client.get('/api/v1/data/AAA/', {'since': last}).json()['count'], 0)
+        daily = self.client.get('/api/v1/chart/AAA/', {'interval': '1d'}).json()['data']
+
+        storage.append_frame(bars.iloc[-6:], 'AAA', 'processed')
+        delta = self.client.get('/api/v1/data/AAA/', {'since': last, 'orient': 'columns'}).json()
+        self.assertEqual(delta['count'], 6)
+        self.assertGreater(pd.Timestamp(delta['data']['Datetime'][0]), pd.Timestamp(last))
+
+        reopened = self.client.get('/api/v1/chart/AAA/', {'interval': '1d', 'since': daily['Datetime'][-1]}).json()
+        self.assertEqual(reopened['data']['Datetime'], daily['Datetime'][-1:])
+        self.assertEqual(reopened['data']['Volume'][0], daily['Volume'][-1] + int(bars['Volume'].iloc[-6:].sum()))
+
+
+
+class LiveDataTests(TempDataDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        views.frame_cache.clear()
+        storage.write_frame(synthetic_ohlcv(400), 'AAA', 'raw')
+        with mock.patch('builtins.print'):
+            process_file('AAA')
+        self.last = storage.read_frame('AAA', 'processed').iloc[-1]
+
+    def assert_latest(self, response):
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(pd.Timestamp(body['timestamp']), self.last.name)
+        self.assertEqual(body['price'], self.last['Close'])
+        self.assertEqual(body['signal_label'], self.last['Signal_Label'])
+
+    def test_serves_latest_record_without_reading_the_frame(self):
+        with mock.patch.object(storage, 'read_frame') as reads, \
+                mock.patch.object(views.frame_cache, 'get') as loads:
+            response = self.client.get('/api/v1/live/AAA/')
+        reads.assert_not_called()
+        loads.assert_not_called()
+        self.assert_latest(response)
+
+    def test_falls_back_to_a_tail_read_without_latest_record(self):
+        os.remove(storage.latest_path('AAA'))
+        with mock.patch.object(storage, 'read_frame', wraps=storage.read_frame) as reads:
+            response = self.client.get('/api/v1/live/AAA/')
+        reads.assert_called_once_with('AAA', 'processed', None, slice(-1, None))
+        self.assert_latest(response)
+        self.assertEqual(self.client.get('/api/v1/live/MISSING/').status_code, 404)
+
+class LiveStreamTests(TempDataDirMixin, SimpleTestCase):
+    def drain(self, subscription):
+        received = []
+        while (item := subscription.get(timeout=0.5)) is not None:
+            received.append(item[1])
+        return received
+
+    def test_simulated_pipeline_publishes_bars_to_subscribers(self):
+        broker = events.Broker(poll_interval=0.05)
+        subscription = broker.subscribe(['SIM'])
+        simulate(['SIM', 'OTHER'], steps=3, delay=0, provider=FakeProvider(now=pd.Timestamp('2026-01-05', tz='UTC')))
+
+        received = self.drain(subscription)
+        bars = [e for e in received if e['type'] == 'bar']
+        self.assertEqual({e['ticker'] for e in received}, {'SIM'})
+        self.assertEqual(len(bars), 4)
+        self.assertEqual(bars[-1]['data'], storage.read_latest('SIM'))
+
+    def test_hundreds_of_subscribers_with_bounded_buffers(self):
+        broker = events.Broker(buffer_size=8)
+        subscriptions = [broker.subscribe(['AAA'] if i % 2 else ['BBB']) for i in range(300)]
+        for i in range(20):
+            broker.dispatch(i, {'type': 'bar', 'ticker': 'AAA', 'data': {'i': i}})
+
+        for i, subscription in enumerate(subscriptions):
+            self.assertEqual(len(subscription.buffer), 8 if i % 2 else 0)
+            self.assertEqual(subscription.dropped, 12 if i % 2 else 0)
+        self.assertEqual(subscriptions[1].get(0)[1]['data'], {'i': 12})
+
+    def test_subscribers_receive_every_event_across_a_log_rotation(self):
+        # The tailer thread is parked so the polls below control timing.
+        broker = events.Broker(buffer_size=64, poll_interval=3600)
+        subscription = broker.subscribe()
+        with mock.patch.object(events, 'EVENTS_MAX_BYTES', 300):
+            for i in range(12):
+                events.publish('bar', 'AAA', {'i': i})
+                if i % 3 == 2:
+                    broker.poll()
+            broker.poll()
+
+        self.assertTrue(os.path.exists(events.events_path() + '.1'))
+        self.assertEqual([e['data']['i'] for _, e in subscription.buffer], list(range(12)))
+
+    def test_stream_endpoint_sends_server_sent_events(self):
+        with mock.patch.object(views, 'event_broker', events.Broker(poll_interval=0.05)):
+            response = self.client.get('/api/v1/stream/', {'tickers': 'AAA'}, HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = iter(response.streaming_content)
+            self.assertEqual(next(stream), b': connected\n\n')
+
+            events.publish('bar', 'BBB', {'Close': 1.0})
+            events.publish('bar', 'AAA', {'Close': 2.0})
+            frame = next(stream).decode()
+            response.close()
+
+        self.assertIn('event: bar\n', frame)
+        self.assertEqual(json.loads(frame.split('data: ', 1)[1])['data'], {'Close': 2.0})
+        self.assertFalse(views.event_broker.subscribers)
+
+    def test_threaded_server_streams_to_concurrent_clients(self):
+        # Each open stream holds a server thread, as it does under gunicorn's
+        # gthread workers; a request made meanwhile must still be served.
+        patcher = mock.patch.object(WSGIRequestHandler, 'log_message')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        server = ThreadedWSGIServer(('127.0.0.1', 0), WSGIRequestHandler)
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        port = server.server_address[1]
+
+        with mock.patch.object(views, 'event_broker', events.Broker(poll_interval=0.05)):
+            streams = []
+            for _ in range(40):
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                conn.request('GET', '/api/v1/stream/?tickers=AAA', headers={'Accept': 'text/event-stream'})
+                response = conn.getresponse()
+                self.assertEqual(response.readline(), b': connected\n')
+                streams.append((conn, response))
+
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            conn.request('GET', '/api/v1/tickers/')
+            self.assertEqual(conn.getresponse().status, 200)
+            conn.close()
+
+            events.publish('bar', 'AAA', {'Close': 1.0})
+            for conn, response in streams:
+                while not (line := response.readline()).startswith(b'data: '):
+                    pass
+                self.assertEqual(json.loads(line[6:])['data'], {'Close': 1.0})
+                conn.close()
+
+
+class BacktestTests(TempDataDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        for seed, ticker in enumerate(['AAA', 'BBB']):
+            # BBB starts later, so the panel has gaps to align.
+            df = calculate_features(synthetic_ohlcv(800 - 100 * seed, seed=seed))
+            storage.write_frame(df, ticker, 'processed')
+        self.panel = backtest.load_panel()
+        self.settings = backtest.backtest_settings()
+
+    def test_matches_bar_by_bar_reference(self):
+        settings = dict(self.settings, hold_bars=1, cost_bps=10)
+        df = storage.read_frame('AAA', 'processed')
+        equity, previous = 1.0, 0.0
+        for i in range(len(df)):
+            position = settings['positions'][df['Signal_Label'].iloc[i]]
+            ret = df['Close'].iloc[i] / df['Close'].iloc[i - 1] - 1 if i else 0.0
+            equity *= 1 + previous * ret - abs(position - previous) * 10 / 1e4
+            previous = position
+
+        result = backtest.run_backtest(self.panel, settings)
+        self.assertAlmostEqual(result.loc['AAA', 'total_return'], equity - 1, places=12)
+
+    def test_drawdown_is_measured_from_starting_equity(self):
+        net = np.array([[-0.1, -0.1, 0.05], [0.1, -0.2, 0.0]])
+        result = backtest.metrics(net, np.zeros_like(net), np.ones_like(net, dtype=bool))
+        np.testing.assert_allclose(result['max_drawdown'], [0.9 * 0.9 - 1, 1.1 * 0.8 / 1.1 - 1])
+
+    def test_sweep_agrees_with_direct_backtest(self):
+        grid = {'STRONG BUY': [2.5, 3], 'BUY': [1, 1.5], 'SELL': [-1, -2]}
+        table = backtest.sweep(self.panel, self.settings, grid)
+        self.assertEqual(len(table), 8)
+        for _, row in table.iterrows():
+            labels = [(op, row[label], label) for op, _, label in self.settings['labels']]
+            expected = backtest.run_backtest(self.panel, dict(self.settings, labels=labels)).loc['PORTFOLIO']
+            for key in ('total_return', 'max_drawdown', 'hit_rate', 'turnover', 'exposure'):
+                self.assertAlmostEqual(row[key], expected[key], places=12)
+
+
+class IndicatorSweepTests(SimpleTestCase):
+    def test_sweep_columns_match_calculate_features(self):
+        raw = synthetic_ohlcv(2_000)
+        config = load_config()
+        grid = {
+            'SMA': {'windows': [20, 35, 200]},
+            'RSI': {'windows': [9, 14]},
+            'MACD': {'fast': [12, 16], 'slow': [26], 'signal': [5, 9]},
+            'BollingerBands': {'windows': [20, 30], 'std_dev': [2, 2.5]},
+            'Volatility': {'windows': [30]},
+        }
+        # Small chunks so windows straddle chunk boundaries.
+        sweep = sweeps.sweep_features(raw, grid, chunk_rows=256)
+
+        def features(name, **params):
+            variant = copy.deepcopy(config)
+            for spec in variant['pipeline']['features']['technical_indicators']:
+                if spec['name'] == name:
+                    spec.update(params)
+            return calculate_features(raw, variant)
+
+        def check(column, df, key):
+            pd.testing.assert_series_equal(sweep[column][key].loc[df.index], df[column],
+                                           check_names=False, check_exact=False, rtol=1e-9, atol=1e-9)
+
+        for w in grid['SMA']['windows']:
+            check('SMA', features('SMA', windows=[20, 50, w]).rename(columns={f'SMA_{w}': 'SMA'}), w)
+        for w in grid['RSI']['windows']:
+            check('RSI', features('RSI', window=w), w)
+        for fast in grid['MACD']['fast']:
+            for signal in grid['MACD']['signal']:
+                df = features('MACD', fast=fast, signal=signal)
+                check('MACD', df, (fast, 26))
+                check('MACD_Signal', df, (fast, 26, signal))
+        for w in grid['BollingerBands']['windows']:
+            for k in grid['BollingerBands']['std_dev']:
+                df = features('BollingerBands', window=w, std_dev=k)
+                check('BB_Middle', df, w)
+                check('BB_Std', df, w)
+                check('BB_Upper', df, (w, k))
+                check('BB_Lower', df, (w, k))
+        check('Volatility', features('Volatility', window=30), 30)
+
+    def test_gaps_propagate_like_pandas_rolling(self):
+        close = synthetic_ohlcv(600)['Close']
+        close.iloc[[100, 101, 350]] = float('nan')
+        means, stds = sweeps.rolling_moments(close.to_numpy(), [5, 50], chunk_rows=128)
+        for j, w in enumerate([5, 50]):
+            rolling = close.rolling(w)
+            pd.testing.assert_series_equal(pd.Series(means[:, j], index=close.index), rolling.mean(),
+                                           check_names=False, rtol=1e-9)
+            pd.testing.assert_series_equal(pd.Series(stds[:, j], index=close.index), rolling.std(),
+                                           check_names=False, rtol=1e-9)
+
+
+class PanelEngineTests(TempDataDirMixin, SimpleTestCase):
+    def test_panel_matches_per_file_processing(self):
+        # 24/7 and trading-hours symbols, one starting later and one with a
+        # missing close inside its history.
+        frames = synthetic_universe(4, 600)
+        frames['SYM0002'] = frames['SYM0002'].iloc[150:]
+        frames['SYM0003'].iloc[300, frames['SYM0003'].columns.get_loc('Close')] = float('nan')
+        for ticker, df in frames.items():
+            storage.write_frame(df, ticker, 'raw')
+
+        expected = {}
+        for ticker in frames:
+            self.assertTrue(process_file(ticker))
+            expected[ticker] = (storage.read_frame(ticker, 'processed'), incremental.load_state(ticker, load_config()))
+
+        results = panel.process_panel(list(frames), batch_size=3)
+        self.assertEqual(results['success'], list(frames))
+        for ticker, (df, state) in expected.items():
+            pd.testing.assert_frame_equal(storage.read_frame(ticker, 'processed'), df)
+            self.assertEqual(incremental.load_state(ticker, load_config()), state)
+
+
+class InstrumentationTests(TempDataDirMixin, SimpleTestCase):
+    def test_run_report_counts_stages_rows_and_bytes(self):
+        def fake_fetch(ticker):
+            df = synthetic_ohlcv(400, seed=len(ticker))
+            storage.write_frame(df, ticker, 'raw')
+            return df
+
+        results = run_concurrent(['AAA', 'BB'], fetch=fake_fetch, process=process_file,
+                                 fetch_workers=2, process_workers=0)
+        run = report.build_report(results, 'concurrent', pd.Timestamp.now(tz='UTC'))
+        stages = run['stages']
+        self.assertEqual(stages['write_raw']['rows'], 800)
+        self.assertEqual(stages['read_raw']['rows'], 800)
+        self.assertEqual(stages['read_raw']['bytes'], stages['write_raw']['bytes'])
+        self.assertEqual(stages['write_processed']['calls'], 2)
+        self.assertGreater(stages['write_processed']['bytes'], 0)
+        for name in ('features', 'signals', 'publish'):
+            self.assertGreater(stages[name]['seconds'], 0)
+        self.assertIn('rolling_mean(Close, 200)', run['indicators'])
+        self.assertEqual(set(run['tickers']), {'AAA', 'BB'})
+
+        # Outside collect() stages are not recorded anywhere.
+        with metrics.stage('features'):
+            pass
+        self.assertEqual(metrics.collect(lambda: None)[2], metrics.new_stats())
+
+    def test_metrics_endpoint_exports_prometheus_text(self):
+        storage.write_frame(synthetic_ohlcv(300), 'AAA', 'processed')
+        self.client.get('/api/v1/data/AAA/')
+        self.client.get('/api/v1/data/AAA/')
+        report.write_report({
+            "started_at": "2026-01-05T00:00:00+00:00", "finished_at": "2026-01-05T00:00:05+00:00",
+            "mode": "serial", "wall_seconds": 5.0, "success": 2, "failed": ["ZZZ"],
+            "stages": {"features": {"seconds": 1.5, "calls": 2, "rows": 800, "bytes": 0}},
+            "indicators": {"rolling_mean(Close, 20)": 0.25}, "tickers": {},
+        })
+
+        response = self.client.get('/api/v1/metrics/', HTTP_ACCEPT='text/plain')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertRegex(text, r'market_http_request_duration_seconds_bucket'
+                               r'\{view="financial-data",method="GET",status="200",le="\+Inf"\} \d+')
+        self.assertIn('# TYPE market_http_request_duration_seconds histogram', text)
+        self.assertRegex(text, r'market_frame_cache_hits_total [1-9]')
+        self.assertIn('market_pipeline_stage_seconds{stage="features"} 1.5', text)
+        self.assertIn('market_pipeline_last_run_tickers{status="failed"} 1', text)
+        self.assertIn('market_pipeline_indicator_seconds{indicator="rolling_mean(Close, 20)"} 0.25', text)
+
+
+class SchedulerTests(TempDataDirMixin, SimpleTestCase):
+    def scheduler(self, tickers, now, **kwargs):
+        config = copy.deepcopy(load_config())
+        config['pipeline']['data']['period'] = '1mo'
+        provider = FakeProvider(now=pd.Timestamp(now, tz='UTC'), **kwargs)
+        clock = FakeClock(provider.now, [provider])
+        scheduler = Scheduler(tickers, config, provider, clock, random.Random(0))
+        refreshes = []
+        run_once = scheduler.run_once
+
+        def recorded(now):
+            results = run_once(now)
+            if results:
+                refreshes.extend((now, t, t in results['success']) for t in results['success'] + results['failed'])
+            return results
+
+        scheduler.run_once = recorded
+        return scheduler, refreshes
+
+    def test_equities_follow_market_hours_and_crypto_runs_around_the_clock(self):
+        # Sunday 15:00 in New York until Monday 12:00.
+        scheduler, refreshes = self.scheduler(['EQ', 'BTC-USD'], '2026-01-11 20:00')
+        with mock.patch('builtins.print'):
+            scheduler.run(until=pd.Timestamp('2026-01-12 17:00', tz='UTC'))
+
+        equity = [now for now, ticker, _ in refreshes if ticker == 'EQ']
+        self.assertEqual(equity[0], pd.Timestamp('2026-01-11 20:00', tz='UTC'))
+        # The first Monday bar (14:00-15:00 UTC) is fetched once it closes.
+        self.assertGreaterEqual(equity[1], pd.Timestamp('2026-01-12 15:02', tz='UTC'))
+        self.assertEqual(len(equity), 3)
+        self.assertTrue(all(scheduler.hours.is_open(now) for now in equity[1:]))
+
+        crypto = [now for now, ticker, _ in refreshes if ticker == 'BTC-USD']
+        self.assertEqual(len(crypto), 21)
+        for previous, now in zip(crypto[1:], crypto[2:]):
+            self.assertLess(abs((now - previous).total_seconds() - 3600), 60)
+        self.assertTrue(all(ok for _, _, ok in refreshes))
+        self.assertEqual(scheduler.last_bar['BTC-USD'], pd.Timestamp('2026-01-12 15:00', tz='UTC'))
+
+    def test_bars_in_progress_do_not_force_full_rewrites(self):
+        # FakeProvider's newest bar keeps changing until it closes.
+        scheduler, refreshes = self.scheduler(['BTC-USD'], '2026-01-10 12:10')
+        with mock.patch('builtins.print'):
+            scheduler.run(until=pd.Timestamp('2026-01-10 12:11', tz='UTC'))
+        processed = len(storage.read_frame('BTC-USD', 'processed'))
+
+        with mock.patch.object(storage, 'write_frame', wraps=storage.write_frame) as writes, \
+                mock.patch('builtins.print'):
+            scheduler.run(until=pd.Timestamp('2026-01-10 17:10', tz='UTC'))
+        self.assertEqual(len(refreshes), 6)
+        # Every refresh appended its closed bar: no raw rewrite, no recompute.
+        writes.assert_not_called()
+        self.assertEqual(len(storage.read_frame('BTC-USD', 'processed')), processed + 5)
+
+    def test_only_stale_tickers_are_fetched_and_failures_back_off(self):
+        scheduler, refreshes = self.scheduler(['BTC-USD'], '2026-01-10 12:10')
+        fetch_batch(['BTC-USD'], provider=scheduler.provider, config=scheduler.config)
+        calls = scheduler.provider.calls
+
+        # Fresh data: nothing is fetched before the next bar is due.
+        with mock.patch('builtins.print'):
+            scheduler.run(until=pd.Timestamp('2026-01-10 13:00', tz='UTC'))
+        self.assertEqual(scheduler.provider.calls, calls)
+
+        scheduler.provider.missing.add('BTC-USD')
+        with mock.patch('builtins.print'):
+            scheduler.run(until=pd.Timestamp('2026-01-10 13:20', tz='UTC'))
+        failures = [now for now, _, ok in refreshes if not ok]
+        gaps = [(b - a).total_seconds() for a, b in zip(failures, failures[1:])]
+        self.assertGreaterEqual(len(gaps), 4)
+        for i, gap in enumerate(gaps):
+            self.assertGreaterEqual(gap, 30 * 2 ** i)
+            self.assertLessEqual(gap, 30 * 2 ** i + 30)
+
+        scheduler.provider.missing.clear()
+        scheduler.clock.sleep = lambda seconds: scheduler.stop()
+        with mock.patch('builtins.print'):
+            scheduler.run()
+        self.assertTrue(refreshes[-1][2])
+        self.assertEqual(scheduler.failures, {})
+        # The 13:00 bar is still in progress.
+        self.assertEqual(scheduler.last_bar['BTC-USD'], pd.Timestamp('2026-01-10 12:00', tz='UTC'))
@@ -0,0 +1,70 @@
+"""
+Synthetic data and reference implementations shared by the test suite and
+benchmark.py.
+"""
+import numpy as np
+import pandas as pd
+
+def synthetic_ohlcv(rows, seed=0, start="2020-01-01", freq="h"):
+    """
+    Builds a random-walk OHLCV frame shaped like a `{ticker}_raw.csv` file.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    spread = np.abs(rng.normal(0, 0.005, rows)) * close
+    open_ = close * (1 + rng.normal(0, 0.002, rows))
+    index = pd.date_range(start, periods=rows, freq=freq, tz="UTC", name="Datetime")
+    return pd.DataFrame({
+        "Close": close,
+        "High": np.maximum(close, open_) + spread,
+        "Low": np.minimum(close, open_) - spread,
+        "Open": open_,
+        "Volume": rng.integers(1_000, 10_000_000, rows),
+    }, index=index)
+
+def synthetic_universe(symbols, rows):
+    """
+    Raw frames for half 24/7 symbols and half trading-hours symbols (weekday
+    14:00-20:00 UTC bars), so the aligned panel has per-symbol gaps.
+    """
+    frames = {}
+    for i in range(symbols):
+        if i % 2:
+            df = synthetic_ohlcv(rows * 5, seed=i)
+            hours = df.index.hour
+            df = df[(df.index.dayofweek < 5) & (hours >= 14) & (hours <= 20)].iloc[:rows]
+        else:
+            df = synthetic_ohlcv(rows, seed=i)
+        frames[f"SYM{i:04d}"] = df
+    return frames
+
+def legacy_signals(df):
+    """
+    The original row-wise signal engine, kept as the reference implementation.
+    """
+    def get_signal(row):
+        score = 0
+        if row['RSI'] < 30: score += 2
+        elif row['RSI'] > 70: score -= 2
+        elif row['RSI'] < 45: score += 0.5
+        elif row['RSI'] > 55: score -= 0.5
+        if row['MACD'] > row['MACD_Signal']: score += 1.5
+        else: score -= 1.5
+        if row['Close'] > row['SMA_50']: score += 1
+        else: score -= 1
+        if row['SMA_20'] > row['SMA_50']: score += 1
+        else: score -= 1
+        if row['Close'] < row['BB_Lower']: score += 2
+        elif row['Close'] > row['BB_Upper']: score -= 2
+        return score
+
+    def get_label(score):
+        if score >= 3: return "STRONG BUY"
+        elif score >= 1: return "BUY"
+        elif score <= -3: return "STRONG SELL"
+        elif score <= -1: return "SELL"
+        else: return "NEUTRAL"
+
+    df['Signal_Score'] = df.apply(get_signal, axis=1)
+    df['Signal_Label'] = df['Signal_Score'].apply(get_label)
+    return df
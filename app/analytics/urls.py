@@ -1,9 +1,15 @@
 from django.urls import path
-from .views import TickerListView, FinancialDataView, MarketSummaryView, LiveDataView
+from .views import TickerListView, FinancialDataView, ChartDataView, ExportView, BulkDataView, MarketSummaryView, LiveDataView, StreamView, CacheStatsView, MetricsView
 
 urlpatterns = [
     path('tickers/', TickerListView.as_view(), name='ticker-list'),
     path('data/<str:ticker>/', FinancialDataView.as_view(), name='financial-data'),
+    path('chart/<str:ticker>/', ChartDataView.as_view(), name='chart-data'),
+    path('export/<str:ticker>/', ExportView.as_view(), name='export'),
     path('live/<str:ticker>/', LiveDataView.as_view(), name='live-data'),
+    path('bulk/', BulkDataView.as_view(), name='bulk-data'),
+    path('stream/', StreamView.as_view(), name='stream'),
     path('summary/', MarketSummaryView.as_view(), name='market-summary'),
+    path('cache/', CacheStatsView.as_view(), name='cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,81 +1,247 @@
+import datetime
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
-import pandas as pd
-import os
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Data', 'data')
+from app.analytics import events, export, featurestore, metrics, queries, report, storage, summary
+from app.analytics.cache import FrameCache
+
+# Shared by all views in this worker process.
+frame_cache = FrameCache(max_bytes=settings.FRAME_CACHE_MAX_BYTES, compact=settings.FRAME_CACHE_COMPACT)
+event_broker = events.Broker(buffer_size=settings.SSE_BUFFER_SIZE)
+feature_store = featurestore.MappedStore()
+
+metrics.REGISTRY.register(metrics.stats_collector(
+    'market_frame_cache', frame_cache.stats,
+    counters=('hits', 'misses', 'evictions', 'invalidations', 'coalesced')))
+metrics.REGISTRY.register(lambda: [(
+    'market_frame_cache_ticker_bytes', 'gauge', 'Bytes of cached frames per ticker',
+    [({'ticker': ticker}, nbytes) for ticker, nbytes in sorted(frame_cache.ticker_bytes().items())])])
+metrics.REGISTRY.register(metrics.stats_collector(
+    'market_sse', lambda: {'subscribers': len(event_broker.subscribers)}))
+metrics.REGISTRY.register(metrics.stats_collector('market_feature_store', feature_store.stats, counters=('opens',)))
+metrics.REGISTRY.register(report.report_metrics)
+
+def versioned_by(path_func):
+    """
+    Conditional GET for a view whose response depends only on one file:
+    ETag and Last-Modified come from the file's version (the manifest
+    version for versioned files, else mtime and size), so a matching
+    If-None-Match/If-Modified-Since gets a 304 before any data is loaded.
+    `path_func(request, *args, **kwargs)` returns the file path.
+    """
+    def version(request, *args, **kwargs):
+        try:
+            return storage.path_version(path_func(request, *args, **kwargs))
+        except FileNotFoundError:
+            return None
+
+    def etag(request, *args, **kwargs):
+        v = version(request, *args, **kwargs)
+        return None if v is None else f'"{v[0]:x}-{v[1]:x}"'
+
+    def last_modified(request, *args, **kwargs):
+        v = version(request, *args, **kwargs)
+        return None if v is None else datetime.datetime.fromtimestamp(v[0] / 1e9, datetime.timezone.utc)
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified), name='get')
+
+def processed_path(request, ticker):
+    return feature_store.path(ticker) or storage.frame_path(ticker, 'processed')
+
+def processed_frame(ticker):
+    """
+    The ticker's processed features: the memory-mapped feature file when
+    one is published and current, otherwise the parsed frame from this
+    worker's cache. Raises FileNotFoundError if neither exists.
+    """
+    mapped = feature_store.get(ticker)
+    return mapped if mapped is not None else frame_cache.get(ticker, 'processed')
+
+def live_path(request, ticker):
+    path = storage.latest_path(ticker)
+    return path if os.path.exists(path) else processed_path(request, ticker)
 
 class TickerListView(APIView):
     """
     Returns a list of available tickers that have processed data.
     """
     def get(self, request):
-        if not os.path.exists(DATA_DIR):
-            return Response({"tickers": []})
-            
-        files = [f for f in os.listdir(DATA_DIR) if f.endswith('_processed.csv')]
-        tickers = [f.replace('_processed.csv', '') for f in files]
-        return Response({"tickers": tickers})
+        return Response({"tickers": storage.list_tickers('processed')})
 
+@versioned_by(processed_path)
 class FinancialDataView(APIView):
     """
     Returns processed financial data for a specific ticker.
+
+    Query parameters: `start`/`end` (ISO timestamps, inclusive), `since`
+    (only rows newer than this timestamp), `columns` (comma-separated),
+    `limit` and `cursor` (the previous page's `next_cursor`), and `orient`
+    ('records', the default, or the more compact 'columns').
     """
     def get(self, request, ticker):
-        file_path = os.path.join(DATA_DIR, f"{ticker}_processed.csv")
-        
-        if not os.path.exists(file_path):
+        try:
+            df = processed_frame(ticker)
+        except FileNotFoundError:
             return Response({"error": f"Data for {ticker} not found."}, status=404)
-            
-        df = pd.read_csv(file_path)
-        # Convert dataframe to JSON
-        data = df.to_dict(orient='records')
+
+        params = request.query_params
+        orient = params.get('orient', 'records')
+        try:
+            if orient not in queries.ORIENTS:
+                raise queries.QueryError(f"orient must be one of: {', '.join(queries.ORIENTS)}")
+            page, next_cursor = queries.select_range(
+                df,
+                start=queries.time_param(params, 'start'),
+                end=queries.time_param(params, 'end'),
+                columns=queries.parse_columns(params.get('columns'), queries.columns_of(df)),
+                limit=queries.parse_limit(params.get('limit')),
+                cursor=queries.time_param(params, 'cursor'),
+                since=queries.time_param(params, 'since'),
+            )
+        except queries.QueryError as e:
+            return Response({"error": str(e)}, status=400)
+
+        return Response({
+            "ticker": ticker,
+            "count": len(page),
+            "next_cursor": next_cursor,
+            "data": queries.ORIENTS[orient](page)
+        })
+
+@versioned_by(processed_path)
+class ChartDataView(APIView):
+    """
+    Returns chart-ready history for a ticker in columnar form.
+
+    Query parameters: `start`/`end`, `since` and `columns` as for the data
+    endpoint, `interval` (1h, 4h, 1d or 1w) to resample bars, and
+    `max_points` to decimate the result with LTTB on `y` (default Close).
+    """
+    def get(self, request, ticker):
+        try:
+            df = processed_frame(ticker)
+        except FileNotFoundError:
+            return Response({"error": f"Data for {ticker} not found."}, status=404)
+
+        interval = request.query_params.get('interval')
+        try:
+            df = queries.chart_frame(df, request.query_params)
+        except queries.QueryError as e:
+            return Response({"error": str(e)}, status=400)
+
         return Response({
             "ticker": ticker,
-            "count": len(data),
-            "data": data
+            "interval": interval,
+            "count": len(df),
+            "data": queries.to_columns(df)
         })
 
+@versioned_by(processed_path)
+class ExportView(APIView):
+    """
+    Streams a ticker's processed history straight from storage as NDJSON
+    (`output=ndjson`, the default) or Arrow IPC record batches
+    (`output=arrow`), one chunk at a time. Accepts `start`, `end` and
+    `columns` like the data endpoint. (`format` is taken by DRF's content
+    negotiation.)
+    """
+    def get(self, request, ticker):
+        params = request.query_params
+        fmt = params.get('output', 'ndjson')
+        if fmt not in export.FORMATS:
+            return Response({"error": f"output must be one of: {', '.join(export.FORMATS)}"}, status=400)
+        if not storage.exists(ticker, 'processed'):
+            return Response({"error": f"Data for {ticker} not found."}, status=404)
+        try:
+            header = storage.read_frame(ticker, 'processed', rows=slice(-1, None))
+            columns = queries.parse_columns(params.get('columns'), header.columns)
+            for value in (queries.time_param(params, 'start'), queries.time_param(params, 'end')):
+                if value is not None:
+                    queries.parse_time(value)
+        except queries.QueryError as e:
+            return Response({"error": str(e)}, status=400)
+
+        chunks = export.iter_range(storage.iter_frame(ticker, 'processed', columns),
+                                   queries.time_param(params, 'start'), queries.time_param(params, 'end'))
+        encode, content_type = export.FORMATS[fmt]
+        return StreamingHttpResponse(encode(chunks), content_type=content_type)
+
+class BulkDataView(APIView):
+    """
+    Returns data for several tickers in one response.
+
+    POST body: {"tickers": {"AAPL": {...chart query...}, ...},
+    "include": ["tickers", "summary"]}. Each ticker takes the chart
+    endpoint's parameters (start, end, since, columns, interval, max_points,
+    y);
+    a ticker that fails, or is not a valid symbol, gets an "error" entry
+    instead of failing the call.
+    """
+    def post(self, request):
+        body = request.data
+        requested = body.get('tickers') or {}
+        include = body.get('include') or []
+        if isinstance(requested, list):
+            requested = {ticker: {} for ticker in requested}
+        if not isinstance(requested, dict) or not all(isinstance(p, dict) for p in requested.values()):
+            return Response({"error": "tickers must be a list or an object of per-ticker queries"}, status=400)
+
+        data = {}
+        for ticker, params in requested.items():
+            if not storage.valid_ticker(ticker):
+                data[ticker] = {"error": f"Invalid ticker '{ticker}'."}
+                continue
+            try:
+                df = queries.chart_frame(processed_frame(ticker), params)
+            except FileNotFoundError:
+                data[ticker] = {"error": f"Data for {ticker} not found."}
+                continue
+            except queries.QueryError as e:
+                data[ticker] = {"error": str(e)}
+                continue
+            data[ticker] = {"interval": params.get('interval'), "count": len(df), "data": queries.to_columns(df)}
+
+        response = {"data": data}
+        if 'tickers' in include:
+            response['tickers'] = storage.list_tickers('processed')
+        if 'summary' in include:
+            response['summary'] = summary.load_summary()['summary']
+        return Response(response)
+
+@versioned_by(lambda request: summary.summary_path())
 class MarketSummaryView(APIView):
     """
     Returns a brief summary of all available tickers.
+
+    Served from the snapshot written at the end of each pipeline run; it is
+    only built from the processed files if no snapshot exists yet.
     """
     def get(self, request):
-        if not os.path.exists(DATA_DIR):
-            return Response({"summary": []})
-            
-        files = [f for f in os.listdir(DATA_DIR) if f.endswith('_processed.csv')]
-        summary = []
-        
-        for f in files:
-            ticker = f.replace('_processed.csv', '')
-            df = pd.read_csv(os.path.join(DATA_DIR, f))
-            if not df.empty:
-                last_row = df.iloc[-1]
-                summary.append({
-                    "ticker": ticker,
-                    "last_close": last_row['Close'],
-                    "last_rsi": last_row.get('RSI', 'N/A'),
-                    "date": str(df.index[-1])
-                })
-                
-        return Response({"summary": summary})
+        return Response(summary.load_summary())
 
+@versioned_by(live_path)
 class LiveDataView(APIView):
     """
     Returns the latest available data point for a ticker (Simulation of Live Data).
+
+    Served from the latest-bar record the pipeline writes after each run,
+    falling back to a tail read of the processed file, so cost does not
+    grow with history length.
     """
     def get(self, request, ticker):
-        file_path = os.path.join(DATA_DIR, f"{ticker}_processed.csv")
-        
-        if not os.path.exists(file_path):
-            return Response({"error": f"Data for {ticker} not found."}, status=404)
-            
         try:
-            # Efficiently read just the last few rows
-            df = pd.read_csv(file_path)
-            if not df.empty:
-                latest = df.iloc[-1].to_dict()
+            latest = storage.read_latest(ticker)
+            if latest is None:
+                df = frame_cache.get(ticker, 'processed', rows=slice(-1, None))
+                latest = storage.latest_record(df) if not df.empty else None
+            if latest is not None:
                 return Response({
                     "ticker": ticker,
                     "timestamp": latest.get('Date', latest.get('Datetime', 'N/A')),
@@ -88,7 +254,68 @@ class LiveDataView(APIView):
                     "signal_label": latest.get('Signal_Label', 'NEUTRAL'),
                     "signal_score": latest.get('Signal_Score', 0)
                 })
+        except FileNotFoundError:
+            return Response({"error": f"Data for {ticker} not found."}, status=404)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
             
         return Response({"error": "No data available"}, status=404)
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets `Accept: text/event-stream` (sent by EventSource) pass content
+    negotiation; the stream itself is written by StreamingHttpResponse.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+class StreamView(APIView):
+    """
+    Streams new bars and signal changes as Server-Sent Events.
+
+    `tickers` (comma-separated) limits the stream; by default every ticker
+    is included. Events come from the log the pipeline publishes to. An
+    open stream occupies a server thread, so production runs threaded
+    workers (`make serve`).
+    """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request):
+        tickers = [t.strip() for t in request.query_params.get('tickers', '').split(',') if t.strip()]
+        response = StreamingHttpResponse(events.sse_stream(event_broker, tickers or None),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class CacheStatsView(APIView):
+    """
+    Returns hit/miss/eviction counters of this worker's frame cache, the
+    bytes it holds per ticker and its mapped feature files.
+    """
+    def get(self, request):
+        return Response({**frame_cache.stats(), "ticker_bytes": frame_cache.ticker_bytes(),
+                         "feature_store": feature_store.stats()})
+
+class PrometheusRenderer(BaseRenderer):
+    """
+    Lets `Accept: text/plain` scrapes pass content negotiation.
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+class MetricsView(APIView):
+    """
+    Prometheus metrics: this worker's request latency histograms, frame
+    cache and stream counters, and the last pipeline run's report.
+    """
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request):
+        return HttpResponse(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,36 @@
+import argparse
+
+import pandas as pd
+
+from app.analytics.backtest import backtest_settings, load_panel, run_backtest, sweep
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest Signal_Label positions over the processed universe.")
+    parser.add_argument("--tickers", nargs="+", help="Defaults to every ticker with processed data")
+    parser.add_argument("--cost-bps", type=float, help="Overrides pipeline.backtest.cost_bps")
+    parser.add_argument("--hold-bars", type=int, help="Overrides pipeline.backtest.hold_bars")
+    parser.add_argument("--sweep", action="store_true", help="Sweep label thresholds over pipeline.backtest.sweep")
+    parser.add_argument("--top", type=int, default=10, help="Sweep results to show")
+    args = parser.parse_args()
+
+    settings = backtest_settings()
+    if args.cost_bps is not None:
+        settings['cost_bps'] = args.cost_bps
+    if args.hold_bars is not None:
+        settings['hold_bars'] = args.hold_bars
+
+    panel = load_panel(args.tickers)
+    print(f"\nBacktesting {len(panel['tickers'])} assets over {len(panel['index'])} bars "
+          f"({panel['index'][0]} to {panel['index'][-1]}) | cost {settings['cost_bps']} bps | "
+          f"hold {settings['hold_bars']} bars")
+
+    with pd.option_context('display.width', 160, 'display.float_format', '{:.4f}'.format):
+        if args.sweep:
+            results = sweep(panel, settings)
+            print(f"\nTop {args.top} of {len(results)} threshold combinations:")
+            print(results.head(args.top).to_string(index=False))
+        else:
+            print(run_backtest(panel, settings).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Micro-benchmarks for the market intelligence pipeline.
+
+Usage:
+    python benchmark.py signals --rows 10000 100000 1000000
+    python benchmark.py fetch --symbols 300 --batch-size 50 --latency 0.05
+    python benchmark.py history --rows 50000
+    python benchmark.py chart --rows 1000000 --max-points 2000
+    python benchmark.py backtest --bars 5000 --assets 50
+    python benchmark.py sweep --rows 100000
+    python benchmark.py panel --symbols 500 --rows 2000 --format parquet
+    python benchmark.py memory --rows 100000
+    python benchmark.py store --rows 100000 --workers 8
+"""
+import argparse
+import copy
+import itertools
+import os
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.analytics import backtest, compact, featurestore, incremental, panel, processor, storage, sweeps
+from app.analytics.data_fetcher import fetch_batch
+from app.analytics.processor import calculate_features, load_config, process_file
+from app.analytics.providers import FakeProvider
+from app.analytics.resample import INTERVALS, decimate, resample_ohlcv
+from app.analytics.signals import apply_signals
+from app.analytics.testing import legacy_signals, synthetic_ohlcv, synthetic_universe
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_signals(rows_list):
+    spec = load_config()['pipeline']['signals']
+    print(f"{'rows':>10} {'row-wise (s)':>14} {'vectorized (s)':>16} {'speedup':>9}")
+    for rows in rows_list:
+        features = calculate_features(synthetic_ohlcv(rows + 250)).drop(
+            columns=['Signal_Score', 'Signal_Label']).iloc[:rows]
+
+        legacy, legacy_time = timed(legacy_signals, features.copy())
+        vectorized, vector_time = timed(apply_signals, features.copy(), spec)
+
+        pd.testing.assert_series_equal(vectorized['Signal_Score'], legacy['Signal_Score'], check_exact=True)
+        pd.testing.assert_series_equal(vectorized['Signal_Label'], legacy['Signal_Label'], check_exact=True)
+        print(f"{rows:>10} {legacy_time:>14.3f} {vector_time:>16.4f} {legacy_time / vector_time:>8.0f}x")
+
+
+def bench_fetch(symbols, batch_size, latency):
+    tickers = [f"SYM{i:04d}" for i in range(symbols)]
+    now = pd.Timestamp("2026-01-05", tz="UTC")
+    print(f"{'mode':>14} {'round trips':>12} {'bars served':>12} {'seconds':>9}")
+    # Raw files go to a scratch directory, never to Data/data.
+    with mock.patch.object(storage, "DATA_DIR", tempfile.mkdtemp()):
+        provider = None
+        for mode, size, delta in [("per-ticker", 1, False), ("batched", batch_size, False),
+                                  ("delta refresh", batch_size, True)]:
+            if provider is None or not delta:
+                provider = FakeProvider(now=now, latency=latency)
+            else:
+                provider.now += pd.Timedelta(hours=1)
+                provider.calls = provider.bars_served = 0
+            _, seconds = timed(fetch_batch, tickers, "6mo", "1h", provider, size, delta=delta)
+            print(f"{mode:>14} {provider.calls:>12} {provider.bars_served:>12} {seconds:>9.2f}")
+
+
+def bench_history(rows):
+    """
+    Full-history record payload vs ranged, projected and columnar queries.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Config.base.base")
+    import django
+    django.setup()
+    from django.test import Client
+
+    client = Client()
+    with mock.patch.object(storage, "DATA_DIR", tempfile.mkdtemp()):
+        df = calculate_features(synthetic_ohlcv(rows))
+        storage.write_frame(df, "BENCH", "processed")
+        week = (df.index[-1] - pd.Timedelta(days=7)).isoformat()
+        queries = [
+            ("full history", {}),
+            ("full, columnar", {"orient": "columns"}),
+            ("last week Close,RSI", {"start": week, "columns": "Close,RSI"}),
+            ("  + columnar", {"start": week, "columns": "Close,RSI", "orient": "columns"}),
+            ("page of 500", {"limit": 500, "orient": "columns"}),
+        ]
+        client.get("/api/v1/data/BENCH/")  # warm the frame cache
+        print(f"{'query':>20} {'rows':>8} {'bytes':>12} {'ms':>9}")
+        for name, params in queries:
+            response, seconds = timed(client.get, "/api/v1/data/BENCH/", params)
+            print(f"{name:>20} {response.json()['count']:>8} {len(response.content):>12} {seconds * 1000:>9.1f}")
+
+
+def bench_chart(rows, max_points):
+    df = synthetic_ohlcv(rows, freq="min")
+    print(f"{'step':>16} {'rows out':>10} {'seconds':>9}")
+    for interval in INTERVALS:
+        out, seconds = timed(resample_ohlcv, df, interval)
+        print(f"{'resample ' + interval:>16} {len(out):>10} {seconds:>9.3f}")
+    out, seconds = timed(decimate, df, max_points)
+    print(f"{'lttb':>16} {len(out):>10} {seconds:>9.3f}")
+
+
+def bench_backtest(bars, assets):
+    """
+    Threshold sweep over the configured grid on a synthetic panel whose
+    scores take the same discrete values as the signal rules produce.
+    """
+    rng = np.random.default_rng(0)
+    panel = {
+        "returns": rng.normal(0, 0.01, (bars, assets)),
+        "scores": rng.integers(-15, 16, (bars, assets)) / 2,
+        "active": np.ones((bars, assets), dtype=bool),
+    }
+    settings = backtest.backtest_settings()
+    combos = int(np.prod([len(v) for v in settings['sweep'].values()]))
+    _, single = timed(backtest.run_backtest, dict(panel, tickers=list(range(assets))), settings)
+    _, seconds = timed(backtest.sweep, panel, settings)
+    print(f"{bars} bars x {assets} assets: one backtest {single * 1000:.1f} ms | "
+          f"{combos} combinations {seconds:.2f} s ({seconds / combos * 1000:.2f} ms each)")
+
+
+def sweep_configs(config):
+    """
+    One config per parameter combination in `pipeline.feature_sweep`, each
+    changing a single indicator: what tuning by re-running calculate_features
+    means. SMA windows are added to the configured ones, which the signal
+    rules need.
+    """
+    specs = {spec['name']: spec for spec in config['pipeline']['features']['technical_indicators']}
+    for name, grid in config['pipeline']['feature_sweep'].items():
+        for values in itertools.product(*grid.values()):
+            params = dict(zip(grid, values))
+            if name == 'MACD' and params['fast'] >= params['slow']:
+                continue
+            if name == 'SMA':
+                params['windows'] = sorted(set(specs[name]['windows']) | {params['windows']})
+            elif 'windows' in params:
+                params['window'] = params.pop('windows')
+            variant = copy.deepcopy(config)
+            for spec in variant['pipeline']['features']['technical_indicators']:
+                if spec['name'] == name:
+                    spec.update(params)
+            yield variant
+
+
+def bench_sweep(rows):
+    df = synthetic_ohlcv(rows)
+    config = load_config()
+    variants = list(sweep_configs(config))
+    start = time.perf_counter()
+    for variant in variants:
+        calculate_features(df, variant)
+    rerun = time.perf_counter() - start
+    outputs, seconds = timed(sweeps.sweep_features, df, config=config)
+    columns = sum(frame.shape[1] for frame in outputs.values())
+    print(f"{rows} bars: {len(variants)} calculate_features runs {rerun:.2f} s | "
+          f"sweep ({columns} columns) {seconds:.2f} s | {rerun / seconds:.0f}x")
+
+
+def bench_panel(symbols, rows, fmt):
+    """
+    Symbol-bars per second for per-file processing vs panel mode, compute
+    only and end to end (raw reads, processed/state/latest writes) in the
+    given storage format.
+    """
+    frames = synthetic_universe(symbols, rows)
+    bars = sum(len(df) for df in frames.values())
+    config = copy.deepcopy(load_config())
+    config['pipeline']['storage'] = {'format': fmt, 'compression': None}
+
+    _, per_file = timed(lambda: [calculate_features(df, config) for df in frames.values()])
+    _, panelled = timed(lambda: panel.compute_panel(panel.align(frames), config))
+    print(f"{symbols} symbols, {bars} bars")
+    print(f"{'':>22} {'seconds':>9} {'symbol-bars/s':>15}")
+    print(f"{'compute per file':>22} {per_file:>9.2f} {bars / per_file:>15,.0f}")
+    print(f"{'compute panel':>22} {panelled:>9.2f} {bars / panelled:>15,.0f}")
+
+    data_dir = tempfile.mkdtemp()
+    with mock.patch.object(storage, "DATA_DIR", data_dir), mock.patch.object(incremental, "DATA_DIR", data_dir), \
+            mock.patch("app.analytics.events.publish"), mock.patch.object(processor, "load_config", lambda: config):
+        for ticker, df in frames.items():
+            storage.write_frame(df, ticker, "raw", config)
+        with mock.patch("builtins.print"):
+            _, per_file = timed(lambda: [process_file(t) for t in frames])
+            _, panelled = timed(panel.process_panel, list(frames), config)
+    print(f"end to end, {fmt} storage:")
+    print(f"{'end to end per file':>22} {per_file:>9.2f} {bars / per_file:>15,.0f}")
+    print(f"{'end to end panel':>22} {panelled:>9.2f} {bars / panelled:>15,.0f}")
+
+
+def bench_memory(rows):
+    """
+    In-memory bytes per bar of a processed frame, float64 vs compact, and
+    the cost of compacting and of expanding pages back.
+    """
+    df = calculate_features(synthetic_ohlcv(rows))
+    packed, compact_seconds = timed(compact.compact, df)
+    print(f"{len(df)} bars, {len(df.columns)} columns ({len(packed.columns)} stored compact)")
+    print(f"{'':>10} {'MiB':>8} {'bytes/bar':>10}")
+    for name, frame in (("float64", df), ("compact", packed)):
+        nbytes = compact.frame_bytes(frame)
+        print(f"{name:>10} {nbytes / 2**20:>8.2f} {nbytes / len(frame):>10.1f}")
+    _, full = timed(compact.expand, packed)
+    _, page = timed(compact.expand, packed, len(df) - 500, len(df))
+    print(f"compact {compact_seconds * 1000:.1f} ms | expand all {full * 1000:.1f} ms"
+          f" | expand page of 500 {page * 1000:.2f} ms")
+
+
+def bench_store(rows, workers):
+    """
+    Cold start and heap per API worker: parsing the processed file into a
+    frame vs mapping the published feature file, plus one page query.
+    """
+    with mock.patch.object(storage, "DATA_DIR", tempfile.mkdtemp()):
+        df = calculate_features(synthetic_ohlcv(rows))
+        storage.write_frame(df, "BENCH", "processed")
+        featurestore.write("BENCH", df)
+        path = featurestore.feature_path("BENCH")
+        loaders = {
+            "parse": (lambda: storage.read_frame("BENCH", "processed"),
+                      lambda frame: frame.iloc[len(frame) - 500:]),
+            "mmap": (lambda: featurestore.MappedFrame(path),
+                     lambda frame: frame.rows(len(frame) - 500)),
+        }
+        print(f"{len(df)} bars, {os.path.getsize(path) / 2**20:.1f} MiB feature file, {workers} workers")
+        print(f"{'':>6} {'open ms':>9} {'page ms':>9} {'heap MiB/worker':>16} {'heap MiB total':>15}")
+        for name, (load, page) in loaders.items():
+            frame, seconds = timed(load)
+            _, page_seconds = timed(page, frame)
+            del frame
+            tracemalloc.start()
+            frame = load()
+            heap = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f"{name:>6} {seconds * 1000:>9.1f} {page_seconds * 1000:>9.2f} {heap / 2**20:>16.2f}"
+                  f" {heap * workers / 2**20:>15.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    signals = sub.add_parser("signals", help="Row-wise vs vectorized signal scoring")
+    signals.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+
+    fetch = sub.add_parser("fetch", help="Per-ticker vs batched downloads against the fake provider")
+    fetch.add_argument("--symbols", type=int, default=300)
+    fetch.add_argument("--batch-size", type=int, default=50)
+    fetch.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per round trip")
+
+    history = sub.add_parser("history", help="Payload size and latency of history queries")
+    history.add_argument("--rows", type=int, default=50_000)
+
+    chart = sub.add_parser("chart", help="OHLCV resampling and LTTB decimation")
+    chart.add_argument("--rows", type=int, default=1_000_000)
+    chart.add_argument("--max-points", type=int, default=2_000)
+
+    bt = sub.add_parser("backtest", help="Backtest threshold sweep throughput")
+    bt.add_argument("--bars", type=int, default=5_000)
+    bt.add_argument("--assets", type=int, default=50)
+
+    sw = sub.add_parser("sweep", help="Indicator parameter sweep vs re-running calculate_features")
+    sw.add_argument("--rows", type=int, default=100_000)
+
+    pn = sub.add_parser("panel", help="Panel-mode vs per-file feature engineering throughput")
+    pn.add_argument("--symbols", type=int, default=500)
+    pn.add_argument("--rows", type=int, default=2_000)
+    pn.add_argument("--format", default="csv", choices=sorted(storage.BACKENDS))
+
+    mem = sub.add_parser("memory", help="Bytes per bar of processed frames, float64 vs compact")
+    mem.add_argument("--rows", type=int, default=100_000)
+
+    st = sub.add_parser("store", help="Per-worker cost of parsed frames vs the memory-mapped feature store")
+    st.add_argument("--rows", type=int, default=100_000)
+    st.add_argument("--workers", type=int, default=8)
+
+    args = parser.parse_args()
+    if args.benchmark == "signals":
+        bench_signals(args.rows)
+    elif args.benchmark == "fetch":
+        bench_fetch(args.symbols, args.batch_size, args.latency)
+    elif args.benchmark == "history":
+        bench_history(args.rows)
+    elif args.benchmark == "chart":
+        bench_chart(args.rows, args.max_points)
+    elif args.benchmark == "backtest":
+        bench_backtest(args.bars, args.assets)
+    elif args.benchmark == "sweep":
+        bench_sweep(args.rows)
+    elif args.benchmark == "panel":
+        bench_panel(args.symbols, args.rows, args.format)
+    elif args.benchmark == "memory":
+        bench_memory(args.rows)
+    elif args.benchmark == "store":
+        bench_store(args.rows, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
+import argparse
+import signal
 import sys
 import os
 import yaml
 import time 
-from app.analytics.data_fetcher import fetch_data
+from functools import partial
+import pandas as pd
+from app.analytics import metrics, storage
+from app.analytics.data_fetcher import fetch_batch, fetch_data
+from app.analytics.panel import process_panel
 from app.analytics.processor import process_file
+from app.analytics.report import build_report, write_report
+from app.analytics.runner import print_timings, run_concurrent
+from app.analytics.scheduler import Scheduler
+from app.analytics.summary import write_summary
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config', 'pipeline_config.yaml')
 
@@ -11,26 +21,65 @@ def load_config():  # Load configuration from YAML file
     with open(CONFIG_PATH, "r") as f:
         return yaml.safe_load(f)
 
-def run_pipeline():
+def run_pipeline(serial=False, panel=False):
     """
     Executes the advanced finance data pipeline.
+
+    Tickers are fetched and processed concurrently per `pipeline.concurrency`
+    unless `serial` is set. With `panel`, all tickers are fetched in batches
+    and then processed together in panel mode (always a full recompute).
+    Each run writes a JSON report of stage timings and counts.
     """
     print("\nStarting Market Intelligence Pipeline...")
+    started_at = pd.Timestamp.now(tz='UTC')
     config = load_config()
     tickers = config['pipeline']['tickers']
     
     print(f"Configuration: {len(tickers)} Assets | Interval: {config['pipeline']['data']['interval']}")
     
-    results = {'success': [], 'failed': []}
+    # In live mode only bars newer than the last run are recomputed.
+    incremental = config['pipeline']['data'].get('live_mode', False)
+    
+    if panel:
+        start = time.perf_counter()
+        frames, fetch_seconds, fetch_stats = metrics.collect(fetch_batch, tickers)
+        results, _, panel_stats = metrics.collect(process_panel, [t for t in tickers if frames.get(t) is not None],
+                                                  config)
+        results['failed'] = [t for t in tickers if t not in results['success']]
+        results['timings'] = {
+            **{t: {'fetch': fetch_seconds / len(tickers), **results['timings'].get(t, {})} for t in tickers},
+            '_wall': time.perf_counter() - start,
+        }
+        results['stats'] = {'_fetch': fetch_stats, '_panel': panel_stats}
+        return finish(results, 'panel', started_at)
+
+    if not serial:
+        concurrency = config['pipeline'].get('concurrency', {})
+        results = run_concurrent(
+            tickers,
+            fetch_many=fetch_batch,
+            batch_size=config['pipeline']['data'].get('batch_size', 20),
+            process=partial(process_file, incremental=incremental),
+            fetch_workers=concurrency.get('fetch_workers', 4),
+            process_workers=concurrency.get('process_workers'),
+        )
+        return finish(results, 'concurrent', started_at)
+
+    results = {'success': [], 'failed': [], 'timings': {}, 'stats': {}}
+    start = time.perf_counter()
     
     for ticker in tickers:
         print(f"\n🔹 Processing {ticker}...")
+        stages = results['timings'][ticker] = {}
         try:
             # 1. Fetch
-            df = fetch_data(ticker)
+            df, stages['fetch'], fetch_stats = metrics.collect(fetch_data, ticker)
+            results['stats'][ticker] = fetch_stats
             if df is not None:
                 # 2. Process
-                if process_file(ticker):
+                ok, stages['process'], process_stats = metrics.collect(process_file, ticker, incremental)
+                metrics.merge(fetch_stats, process_stats)
+                if ok:
                     results['success'].append(ticker)
                 else:
                     results['failed'].append(ticker)
@@ -41,6 +90,41 @@ def run_pipeline():
             print(f"Critical failure on {ticker}: {e}")
             results['failed'].append(ticker)
             
+    results['timings']['_wall'] = time.perf_counter() - start
+    return finish(results, 'serial', started_at)
+
+def finish(results, mode, started_at):
+    """
+    Writes the market summary and the run report, then prints the outcome.
+    """
+    write_summary()
+    path = write_report(build_report(results, mode, started_at))
+    print_timings(results['timings'])
+    report(results)
+    print(f"Run report: {path}")
+    return results
+
+def run_daemon():
+    """
+    Keeps refreshing stale tickers on the `pipeline.schedule` timetable
+    (incrementally when `live_mode` is set) until SIGINT/SIGTERM.
+    """
+    scheduler = Scheduler()
+    signal.signal(signal.SIGINT, scheduler.stop)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    mode = "incremental" if scheduler.incremental else "full recompute"
+    print(f"\nStarting pipeline daemon: {len(scheduler.tickers)} Assets | Interval: {scheduler.freq} | {mode}")
+    scheduler.run()
+    print("Pipeline daemon stopped.")
+
+def profile_ticker(ticker):
+    """
+    Fetches and processes one ticker under cProfile (saved next to the data).
+    """
+    path = os.path.join(storage.DATA_DIR, f"profile_{ticker}.prof")
+    return metrics.profile(lambda: fetch_data(ticker) is not None and process_file(ticker), path=path)
+
+def report(results):
     print("\nPipeline Execution Completed")
     print(f"Success: {len(results['success'])} | Failed: {len(results['failed'])}")
     
@@ -48,4 +132,15 @@ def run_pipeline():
         print(f"Failed Assets: {', '.join(results['failed'])}")
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="Fetch and process all configured tickers.")
+    parser.add_argument("--serial", action="store_true", help="Process tickers one after another")
+    parser.add_argument("--panel", action="store_true", help="Process all tickers together in panel mode")
+    parser.add_argument("--profile", metavar="TICKER", help="Profile fetching and processing a single ticker")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and refresh tickers as new bars are due")
+    args = parser.parse_args()
+    if args.profile:
+        profile_ticker(args.profile)
+    elif args.daemon:
+        run_daemon()
+    else:
+        run_pipeline(serial=args.serial, panel=args.panel)
@@ -2,10 +2,14 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
+import json
 import requests
+import time
 from datetime import datetime
 
 API_BASE_URL = "http://localhost:8000/api/v1"
+CHART_MAX_POINTS = 1500
+HISTORY_TTL = 300  # seconds before a cached history is reloaded in full
 
 st.set_page_config(
     page_title="Market Analysis Terminal",
@@ -120,34 +124,142 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- DATA LAYER ---
-# @st.cache_data(ttl=60) # Disabled for debugging live updates
-def fetch_tickers():
+@st.cache_resource
+def get_session():
+    # One keep-alive connection pool for the whole app, reused across reruns.
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+def history_cache():
+    # {(ticker, interval): {"frame", "loaded_at"}} kept for this browser session.
+    return st.session_state.setdefault("history_cache", {})
+
+def chart_query(ticker, interval):
+    """
+    A delta query (`since` the last cached bar) while the cached history is
+    fresh, otherwise a full, server-decimated reload.
+    """
+    cached = history_cache().get((ticker, interval))
+    if (cached is not None and not cached["frame"].empty and time.time() - cached["loaded_at"] < HISTORY_TTL
+            and len(cached["frame"]) < 2 * CHART_MAX_POINTS):
+        return {"interval": interval, "since": cached["frame"]["Datetime"].iloc[-1]}
+    # The server resamples and decimates to what the charts can display.
+    return {"interval": interval, "max_points": CHART_MAX_POINTS}
+
+def merge_history(ticker, interval, query, data):
+    """
+    Applies a bulk-call result to the cache and returns a copy of the frame.
+    A delta replaces cached rows from its first timestamp on, since the last
+    resampled bin may have been partial.
+    """
+    key = (ticker, interval)
+    delta = pd.DataFrame(data)
+    if "since" in query:
+        frame = history_cache()[key]["frame"]
+        if not delta.empty:
+            frame = pd.concat([frame[frame["Datetime"] < delta["Datetime"].iloc[0]], delta], ignore_index=True)
+            history_cache()[key]["frame"] = frame
+    else:
+        frame = delta
+        history_cache()[key] = {"frame": frame, "loaded_at": time.time()}
+    return frame.copy()
+
+def fetch_bulk(queries, include=()):
     try:
-        response = requests.get(f"{API_BASE_URL}/tickers/", timeout=3)
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        return response.json().get('tickers', [])
+        response = get_session().post(f"{API_BASE_URL}/bulk/",
+                                      json={"tickers": queries, "include": list(include)}, timeout=3)
+        response.raise_for_status()
+        return response.json()
     except (requests.exceptions.RequestException, ValueError):  # Catch connection, timeout, and json errors
         return None
 
-# @st.cache_data(ttl=60)
+# Filled once per script run by load_page(); Streamlit re-executes this
+# module on every rerun, so it never holds stale data.
+_page = {}
+
+def load_page():
+    """
+    Fetches everything the current view needs in a single bulk round trip:
+    the ticker list, the market summary and the active asset's chart data.
+    """
+    if "result" not in _page:
+        queries = {}
+        if st.session_state.get("view_mode") == "Asset Analysis" and st.session_state.get("selected_ticker"):
+            ticker = st.session_state.selected_ticker
+            queries[ticker] = chart_query(ticker, st.session_state.get("chart_interval", "1h"))
+        _page["result"] = fetch_bulk(queries, include=("tickers", "summary"))
+        _page["queries"] = queries
+    return _page["result"]
+
+def fetch_tickers():
+    page = load_page()
+    return None if page is None else page.get('tickers', [])
+
 def fetch_market_summary():
-    try:
-        response = requests.get(f"{API_BASE_URL}/summary/", timeout=3)
-        response.raise_for_status()
-        return response.json().get('summary', [])
-    except (requests.exceptions.RequestException, ValueError):
+    page = load_page()
+    return None if page is None else page.get('summary', [])
+
+def fetch_data(ticker, interval="1h"):
+    page = load_page()
+    query = _page["queries"].get(ticker)
+    if page is not None and query is not None and query["interval"] == interval:
+        entry = page["data"][ticker]
+    else:
+        # The selection changed after the page was loaded; fetch just this one.
+        query = chart_query(ticker, interval)
+        result = fetch_bulk({ticker: query})
+        entry = None if result is None else result["data"].get(ticker)
+    if entry is None or "error" in entry:
         return None
+    return merge_history(ticker, interval, query, entry.get('data', []))
 
-def fetch_data(ticker):
-    try:
-        response = requests.get(f"{API_BASE_URL}/data/{ticker}/", timeout=3)
+def iter_events(ticker):
+    """
+    Yields (event type, payload) pairs from the API's Server-Sent Events
+    stream; the server sends a keep-alive comment at least every 15s.
+    """
+    with get_session().get(f"{API_BASE_URL}/stream/", params={"tickers": ticker}, stream=True,
+                           headers={"Accept": "text/event-stream"}, timeout=(3, 60)) as response:
         response.raise_for_status()
-        return pd.DataFrame(response.json().get('data', []))
-    except (requests.exceptions.RequestException, ValueError):
-        return None
+        event_type, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                if data:
+                    yield event_type, json.loads("\n".join(data))
+                event_type, data = "message", []
+            elif line.startswith("event:"):
+                event_type = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
 
 # --- COMPONENTS ---
 
+def live_panel(ticker, placeholder):
+    """
+    Renders pushed bars into placeholder until the next rerun. Must run
+    last: it blocks the script while the stream is open.
+    """
+    placeholder.caption("LIVE: waiting for the next bar...")
+    try:
+        for event_type, event in iter_events(ticker):
+            if event_type == "bar":
+                bar = event["data"]
+                placeholder.markdown(f"""
+                <div class="fin-card">
+                    <div class="metric-label">LIVE · {bar.get('Datetime', bar.get('Date', ''))}</div>
+                    <div class="metric-value">${bar['Close']:,.2f}</div>
+                    <span>RSI {bar.get('RSI', 0):.1f} · {bar.get('Signal_Label', 'NEUTRAL')}</span>
+                </div>
+                """, unsafe_allow_html=True)
+            elif event_type == "signal":
+                st.toast(f"{ticker}: {event['data']['from']} → {event['data']['to']}")
+            elif event_type == "dropped":
+                # We fell behind; reload the page state instead of replaying.
+                st.rerun()
+    except requests.exceptions.RequestException:
+        placeholder.warning("Live stream disconnected.")
+
 def card_metric(label, value, delta=None, prefix="", suffix="", col=None):
     delta_html = ""
     if delta is not None:
@@ -229,11 +341,14 @@ def main():
         if st.session_state.view_mode == "Asset Analysis":
             idx = tickers.index(st.session_state.selected_ticker) if st.session_state.selected_ticker in tickers else 0
             st.session_state.selected_ticker = st.selectbox("ACTIVE ASSET", tickers, index=idx)
+            st.session_state.chart_interval = st.selectbox("RESOLUTION", ["1h", "4h", "1d", "1w"])
+            st.session_state.live = st.toggle("LIVE STREAM", value=st.session_state.get("live", False))
         
         button_col1, button_col2 = st.columns(2)
         with button_col1:
             if st.button("🔄 Refresh", use_container_width=True):
                 st.cache_data.clear()
+                history_cache().clear()
                 st.rerun()
         with button_col2:
             if st.button("🚀 Pipeline", use_container_width=True):
@@ -286,7 +401,7 @@ def main():
                         <hr style="border-color:#222; margin: 10px 0;">
                         <div style="display:flex; justify-content:space-between; font-size: 0.8rem; color: #888;">
                             <span>RSI: <strong style="color:#fff">{item['last_rsi']:.1f}</strong></span>
-                            <span>VOL: <strong style="color:#fff">{item.get('last_volatility', 'N/A')}</strong></span>
+                            <span>VOL: <strong style="color:#fff">{f"{item['last_volatility']:.2f}" if item.get('last_volatility') is not None else 'N/A'}</strong></span>
                         </div>
                     </div>
                 """, unsafe_allow_html=True)
@@ -305,7 +420,7 @@ def main():
                 st.rerun()
         
         # Fetch Data
-        df = fetch_data(ticker)
+        df = fetch_data(ticker, st.session_state.get("chart_interval", "1h"))
         
         if df is not None and not df.empty:
             # Preprocessing
@@ -331,6 +446,7 @@ def main():
             vol_val = latest.get('Volatility', 0)
             card_metric("Volatility", f"{vol_val:.4f}", None, col=m4)
             
+            live_slot = st.empty()
             st.markdown("###")
             
             # Charts
@@ -358,6 +474,9 @@ def main():
             
             with tab2:
                 st.dataframe(df.sort_values('Datetime', ascending=False), use_container_width=True)
+
+            if st.session_state.get("live"):
+                live_panel(ticker, live_slot)
         else:
             st.warning(f"No data available for {ticker}")
 